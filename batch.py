@@ -0,0 +1,323 @@
+"""
+Headless bulk operations on the storage directory, for scripts and pipelines.
+
+Every line written to stdout is one JSON object:
+  {"event": "start", "op": ..., "total": N}
+  {"event": "progress", "item": ..., "done_bytes": ..., "total_bytes": ..., "done_files": ..., "total_files": ...}
+  {"event": "done", "item": ..., ...}
+  {"event": "error", "item": ..., "error": ...}
+  {"event": "summary", "op": ..., "ok": N, "failed": N, "seconds": ...}
+The exit status is 0 when every item succeeded and 1 otherwise.
+
+Examples:
+  python batch.py create --from names.txt
+  python batch.py create-album Photos --all
+  python batch.py --jobs 8 import exports/*.zip
+  python batch.py export --all --out backups/
+  python batch.py export --all --out backups/tuesday --base backups/monday
+  python batch.py import --chain monday/alice.zip tuesday/alice.zip
+  python batch.py export-album Photos --all --zip --out backups/
+  python batch.py ingest alice Photos ~/Pictures/trip
+  python batch.py delete bob carol
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+# Progress lines per item are limited to one per this many seconds
+PROGRESS_INTERVAL = 0.5
+
+
+class JsonLines:
+    """Thread-safe JSON-lines writer."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+        self._last_progress = {}
+
+    def emit(self, event, **fields):
+        line = json.dumps({"event": event, **fields}, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def progress_for(self, item):
+        """Return a transfer progress callback that reports item, throttled."""
+        def progress(done_bytes, total_bytes, done_files, total_files):
+            now = time.monotonic()
+            with self._lock:
+                if done_bytes < total_bytes and now - self._last_progress.get(item, 0) < PROGRESS_INTERVAL:
+                    return
+                self._last_progress[item] = now
+            self.emit("progress", item=item, done_bytes=done_bytes, total_bytes=total_bytes,
+                      done_files=done_files, total_files=total_files)
+        return progress
+
+
+def read_items(path):
+    """Read one item per line from path ("-" for stdin), skipping blanks and # comments."""
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [line.strip() for line in stream if line.strip() and not line.lstrip().startswith("#")]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def run_jobs(out, op, items, job, jobs, cancel_event):
+    """
+    Run job(item) for every item on jobs threads and report each result.
+    job returns a dict of extra fields for the "done" line. Returns the
+    number of failed items.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    out.emit("start", op=op, total=len(items))
+    started = time.monotonic()
+    failed = 0
+    lock = threading.Lock()
+
+    def run(item):
+        nonlocal failed
+        if cancel_event.is_set():
+            out.emit("error", item=item, error="cancelled")
+            with lock:
+                failed += 1
+            return
+        try:
+            result = job(item) or {}
+            out.emit("done", item=item, **result)
+        except Exception as e:
+            out.emit("error", item=item, error=f"{type(e).__name__}: {e}")
+            with lock:
+                failed += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        try:
+            for future in [executor.submit(run, item) for item in items]:
+                future.result()
+        except KeyboardInterrupt:
+            cancel_event.set()  # running exports and imports stop at their next chunk
+            raise
+    out.emit("summary", op=op, ok=len(items) - failed, failed=failed,
+             seconds=round(time.monotonic() - started, 3))
+    return failed
+
+
+def profile_targets(args, storage_directory):
+    from utils.storage import list_subfolders
+
+    if args.all:
+        return sorted(list_subfolders(storage_directory))
+    targets = list(args.profiles)
+    if args.from_file:
+        targets += read_items(args.from_file)
+    return targets
+
+
+def main(argv=None):
+    import argparse
+    from utils.settings import load_settings
+
+    parser = argparse.ArgumentParser(
+        prog="python batch.py", description="Bulk profile and album operations with JSON-lines progress on stdout."
+    )
+    parser.add_argument("--storage", default=None, help="storage directory (defaults to settings.json)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="items processed in parallel")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_targets(sub, what="profiles"):
+        sub.add_argument("profiles", nargs="*", help=what)
+        sub.add_argument("--from", dest="from_file", help="read more, one per line, from a file ('-' for stdin)")
+        sub.add_argument("--all", action="store_true", help="every profile in the storage directory")
+
+    sub = commands.add_parser("create", help="create profiles")
+    sub.add_argument("profiles", nargs="*", help="profile names")
+    sub.add_argument("--from", dest="from_file",
+                     help="one profile per line: a name, or a JSON object with \"name\" and profile fields")
+
+    sub = commands.add_parser("create-album", help="create an album in profiles")
+    sub.add_argument("album")
+    add_targets(sub)
+
+    sub = commands.add_parser("import", help="import profile zips")
+    sub.add_argument("zips", nargs="*")
+    sub.add_argument("--from", dest="from_file", help="read zip paths, one per line ('-' for stdin)")
+    sub.add_argument("--chain", action="store_true",
+                     help="the zips are one profile: a full export and incremental exports made after it")
+    sub.add_argument("--name", help="folder name for a --chain import (defaults to the full export's name)")
+
+    sub = commands.add_parser("export", help="export profiles as zips")
+    add_targets(sub)
+    sub.add_argument("--out", required=True, help="folder for the <profile>.zip files")
+    sub.add_argument("--base", help="folder of earlier exports; write only what changed since <profile>.zip "
+                                    "(or <profile>.manifest.json) there")
+    sub.add_argument("--manifests", action="store_true",
+                     help="also write <profile>.manifest.json, usable as a later --base without the zips")
+
+    sub = commands.add_parser("export-album", help="export an album from profiles")
+    sub.add_argument("album")
+    add_targets(sub)
+    sub.add_argument("--out", required=True, help="folder for the <profile>/<album> copies or zips")
+    sub.add_argument("--zip", action="store_true", help="write <profile>-<album>.zip files instead of folders")
+
+    sub = commands.add_parser("ingest", help="copy files and folders into an album")
+    sub.add_argument("profile")
+    sub.add_argument("album")
+    sub.add_argument("sources", nargs="+", help="files or folders to copy")
+
+    sub = commands.add_parser("delete", help="delete profiles")
+    add_targets(sub)
+
+    sub = commands.add_parser("delete-album", help="delete an album from profiles")
+    sub.add_argument("album")
+    add_targets(sub)
+
+    args = parser.parse_args(argv)
+    settings = load_settings()
+    from utils.instrumentation import configure
+    configure(settings)
+    storage_directory = args.storage or settings.get("storage_directory", "storage/")
+    out = JsonLines()
+    cancel_event = threading.Event()
+
+    from utils import storage, files
+
+    if args.command == "create":
+        entries = list(args.profiles) + (read_items(args.from_file) if args.from_file else [])
+        initial = {}
+        names = []
+        for entry in entries:
+            if entry.startswith("{"):
+                data = json.loads(entry)
+                name = data.pop("name")
+                initial[name] = data
+                names.append(name)
+            else:
+                names.append(entry)
+
+        def job(name):
+            if os.path.exists(os.path.join(storage_directory, name)):
+                raise FileExistsError(f"Profile '{name}' already exists.")
+            return {"path": storage.create_storage_folder(storage_directory, name, initial.get(name))}
+        failed = run_jobs(out, "create", names, job, args.jobs, cancel_event)
+
+    elif args.command == "create-album":
+        def job(profile):
+            if not os.path.isdir(os.path.join(storage_directory, profile)):
+                raise FileNotFoundError(f"Profile '{profile}' not found.")
+            return {"path": files.create_album_upload_folder(storage_directory, profile, args.album)}
+        failed = run_jobs(out, "create-album", profile_targets(args, storage_directory), job, args.jobs, cancel_event)
+
+    elif args.command == "import":
+        from utils.profile_transfer import import_profile
+        from utils.zip_import import DEFAULT_WORKERS
+
+        zips = list(args.zips) + (read_items(args.from_file) if args.from_file else [])
+        if args.chain:
+            from utils.profile_transfer import order_chain
+
+            def job(item):
+                dest = import_profile(storage_directory, order_chain(zips), args.name,
+                                      progress=out.progress_for(item), cancel_event=cancel_event,
+                                      workers=DEFAULT_WORKERS)
+                return {"path": dest}
+            # The whole chain is one item, reported under the full export's path
+            failed = run_jobs(out, "import", zips[:1], job, 1, cancel_event)
+        else:
+            # Share the cores between the archives being imported at once
+            workers = max(1, DEFAULT_WORKERS // max(1, min(args.jobs, len(zips) or 1)))
+
+            def job(zip_path):
+                dest = import_profile(storage_directory, zip_path, progress=out.progress_for(zip_path),
+                                      cancel_event=cancel_event, workers=workers)
+                return {"path": dest}
+            failed = run_jobs(out, "import", zips, job, args.jobs, cancel_event)
+
+    elif args.command == "export":
+        from utils.profile_transfer import export_profile
+        from utils.zip_export import DEFAULT_WORKERS
+
+        targets = profile_targets(args, storage_directory)
+        os.makedirs(args.out, exist_ok=True)
+        workers = max(1, int(settings.get("export_workers") or DEFAULT_WORKERS) // max(1, min(args.jobs, len(targets) or 1)))
+
+        def base_for(profile):
+            if not args.base:
+                return None
+            for name in (f"{profile}.zip", f"{profile}.manifest.json"):
+                if os.path.isfile(os.path.join(args.base, name)):
+                    return os.path.join(args.base, name)
+            return None  # new since the base: export in full
+
+        def job(profile):
+            export_path = os.path.join(args.out, f"{profile}.zip")
+            base = base_for(profile)
+            manifest_path = os.path.join(args.out, f"{profile}.manifest.json") if args.manifests else None
+            export_profile(storage_directory, profile, export_path, progress=out.progress_for(profile),
+                           cancel_event=cancel_event, workers=workers, base=base, manifest_path=manifest_path)
+            return {"path": export_path, "bytes": os.path.getsize(export_path), "base": base}
+        failed = run_jobs(out, "export", targets, job, args.jobs, cancel_event)
+
+    elif args.command == "export-album":
+        from utils.file_export import export_album
+        from utils.zip_export import DEFAULT_WORKERS
+
+        targets = profile_targets(args, storage_directory)
+        os.makedirs(args.out, exist_ok=True)
+        workers = max(1, int(settings.get("export_workers") or DEFAULT_WORKERS) // max(1, min(args.jobs, len(targets) or 1)))
+        album_name = os.path.basename(os.path.normpath(args.album))
+
+        def job(profile):
+            if args.zip:
+                export_path = os.path.join(args.out, f"{profile}-{album_name}.zip")
+            else:
+                export_path = os.path.join(args.out, profile, album_name)
+                os.makedirs(os.path.dirname(export_path), exist_ok=True)
+            export_album(storage_directory, profile, args.album, export_path, as_zip=args.zip,
+                         progress=out.progress_for(profile), cancel_event=cancel_event, workers=workers)
+            return {"path": export_path}
+        failed = run_jobs(out, "export-album", targets, job, args.jobs, cancel_event)
+
+    elif args.command == "ingest":
+        if not os.path.isdir(os.path.join(storage_directory, args.profile)):
+            out.emit("error", item=args.profile, error="Profile not found.")
+            return 1
+        files.create_album_upload_folder(storage_directory, args.profile, args.album)
+        item = f"{args.profile}/{args.album}"
+        out.emit("start", op="ingest", total=len(args.sources))
+        started = time.monotonic()
+        try:
+            failures = files.ingest_files(
+                storage_directory, args.profile, args.album, args.sources,
+                dedup=bool(settings.get("dedup_storage", False)), workers=args.jobs,
+                progress=out.progress_for(item), cancel_event=cancel_event
+            )
+        except KeyboardInterrupt:
+            cancel_event.set()
+            raise
+        for src, error in failures:
+            out.emit("error", item=src, error=str(error))
+        failed = len(failures)
+        out.emit("summary", op="ingest", failed=failed, seconds=round(time.monotonic() - started, 3))
+
+    elif args.command == "delete":
+        def job(profile):
+            if not storage.delete_storage_folder(storage_directory, profile):
+                raise FileNotFoundError(f"Profile '{profile}' not found.")
+        failed = run_jobs(out, "delete", profile_targets(args, storage_directory), job, args.jobs, cancel_event)
+
+    else:
+        def job(profile):
+            if not files.delete_album_upload_folder(storage_directory, profile, args.album):
+                raise FileNotFoundError(f"Album '{args.album}' not found in '{profile}'.")
+        failed = run_jobs(out, "delete-album", profile_targets(args, storage_directory), job, args.jobs, cancel_event)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
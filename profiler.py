@@ -1,11 +1,54 @@
-import tkinter as tk
-from utils.settings import load_settings
-from utils.gui import DocumenterApp
+import sys
+import time
+from contextlib import nullcontext
+
+START = time.perf_counter()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Codex profile documenter.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print a breakdown of startup time and imports")
+    args = parser.parse_args(argv)
+
+    profiler = None
+    if args.profile_startup:
+        from utils.startup_profile import StartupProfiler
+        profiler = StartupProfiler(START)
+        profiler.install()
+
+    def phase(name):
+        return profiler.phase(name) if profiler else nullcontext()
+
+    with phase("import tkinter"):
+        import tkinter as tk
+    with phase("load settings"):
+        from utils.settings import load_settings
+        settings = load_settings()
+        from utils.instrumentation import configure
+        configure(settings)
+    with phase("import gui"):
+        from utils.gui import DocumenterApp
+    with phase("create root window"):
+        root = tk.Tk()
+    with phase("build main window"):
+        app = DocumenterApp(root, settings)
+
+    if profiler:
+        root.bind("<Map>", lambda e: profiler.mark("window mapped") if e.widget is root else None, add="+")
+
+        def finish():
+            # Scheduled after the app's initial scan, so this runs once it is done
+            profiler.mark("initial scan done")
+            profiler.uninstall()
+            profiler.report()
+        root.after(0, lambda: root.after_idle(finish))
+
+    root.mainloop()
+    return 0
+
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    settings = load_settings()
-    app = DocumenterApp(root, settings)
-    
-    
-    root.mainloop()
\ No newline at end of file
+    sys.exit(main())
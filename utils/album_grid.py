@@ -0,0 +1,366 @@
+import tkinter as tk
+from bisect import bisect_right
+from collections import OrderedDict
+from utils.progress_dialog import format_bytes
+
+TILE_SIZE = 100
+TILE_WIDTH = TILE_SIZE + 10
+TILE_HEIGHT = TILE_SIZE + 40
+HEADER_HEIGHT = 30
+TEXT_ROW_HEIGHT = 22
+DEFAULT_MAX_IMAGES = 300
+
+
+def shorten_name(name, limit=25):
+    return name[:limit] + ("..." if len(name) > limit else "")
+
+
+class AlbumGrid(tk.Frame):
+    """
+    Scrollable, virtualized album view. Only the rows inside the viewport get
+    widgets; tiles that scroll out of view are recycled for the rows that
+    scroll in. Thumbnails are kept in a bounded LRU pool of PhotoImages and
+    (re)requested from the thumbnail loader when a tile becomes visible.
+
+    Entries are dicts with "name", "kind" ("folder", "image", "video" or
+    "other"), "path" and the AlbumEntry record as "info". Folders may carry
+    a short "detail" text (their size) drawn on the folder icon.
+    """
+
+    def __init__(self, master, loader=None, on_open=None, max_images=DEFAULT_MAX_IMAGES, **kwargs):
+        super().__init__(master, **kwargs)
+        self.loader = loader
+        self.on_open = on_open
+        self.max_images = max_images
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, yscrollincrement=20)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.bind("<Configure>", lambda e: self._relayout())
+        self._bind_wheel(self.canvas)
+
+        self.entries = []
+        self.rows = []      # (kind, payload): ("tiles", [idx, ...]), ("header", text), ("text", idx)
+        self.row_tops = []
+        self.columns = 0
+
+        self._tiles = {}        # entry idx -> tile frame
+        self._free_tiles = []
+        self._texts = {}        # entry idx -> text label
+        self._free_texts = []
+        self._header = None
+        self._images = OrderedDict()  # path -> PhotoImage
+        self._pending = {}            # path -> future
+        self._placeholder = tk.PhotoImage(width=TILE_SIZE, height=TILE_SIZE)
+        self._render_job = None
+        self._rerequest_job = None
+        if loader is not None:
+            loader.add_cancel_listener(self._loader_cancelled)
+
+    # --- Data -------------------------------------------------------------
+
+    def set_entries(self, entries):
+        """Replace the displayed entries and scroll back to the top."""
+        for idx in list(self._tiles):
+            self._recycle_tile(idx)
+        for idx in list(self._texts):
+            self._recycle_text(idx)
+        self._cancel_pending()
+        self.entries = list(entries)
+        self.columns = 0
+        self.canvas.yview_moveto(0)
+        self._relayout()
+
+    def update_entries(self, entries, changed=()):
+        """
+        Swap in an updated entry list, e.g. after a few files were added or
+        removed, keeping the scroll position and the pooled thumbnails.
+        Thumbnails of the paths in changed are dropped and decoded again.
+        """
+        for idx in list(self._tiles):
+            self._recycle_tile(idx)
+        for idx in list(self._texts):
+            self._recycle_text(idx)
+        for path in changed:
+            self._images.pop(path, None)
+            future = self._pending.pop(path, None)
+            if future is not None:
+                future.cancel()
+        self.entries = list(entries)
+        self.columns = 0
+        self._relayout()
+
+    def clear_images(self):
+        """Forget every pooled thumbnail, e.g. after files changed on disk."""
+        self._images.clear()
+        for idx, tile in self._tiles.items():
+            self._draw_tile(tile, self.entries[idx])
+
+    def destroy(self):
+        if self.loader is not None:
+            self.loader.remove_cancel_listener(self._loader_cancelled)
+        if self._rerequest_job is not None:
+            self.after_cancel(self._rerequest_job)
+        self._cancel_pending()
+        super().destroy()
+
+    # --- Layout -----------------------------------------------------------
+
+    def _relayout(self):
+        width = max(self.canvas.winfo_width(), TILE_WIDTH)
+        columns = max(1, width // TILE_WIDTH)
+        if columns != self.columns:
+            self.columns = columns
+            self._build_rows()
+            for idx in list(self._tiles):
+                self._recycle_tile(idx)
+            for idx in list(self._texts):
+                self._recycle_text(idx)
+        self._render()
+
+    def _build_rows(self):
+        tiles = [i for i, e in enumerate(self.entries) if e["kind"] != "other"]
+        others = [i for i, e in enumerate(self.entries) if e["kind"] == "other"]
+        self.rows = []
+        for start in range(0, len(tiles), self.columns):
+            self.rows.append(("tiles", tiles[start:start + self.columns]))
+        if others:
+            self.rows.append(("header", "Other Files:"))
+            self.rows.extend(("text", i) for i in others)
+        self.row_tops = []
+        y = 0
+        for kind, _ in self.rows:
+            self.row_tops.append(y)
+            y += {"tiles": TILE_HEIGHT, "header": HEADER_HEIGHT, "text": TEXT_ROW_HEIGHT}[kind]
+        self.canvas.configure(scrollregion=(0, 0, self.columns * TILE_WIDTH, y))
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._render_job is None:
+            self._render_job = self.after_idle(self._render)
+
+    def _visible_rows(self):
+        if not self.rows:
+            return range(0)
+        top = self.canvas.canvasy(0)
+        bottom = top + max(self.canvas.winfo_height(), 1)
+        first = max(0, bisect_right(self.row_tops, top) - 1)
+        last = min(len(self.rows), bisect_right(self.row_tops, bottom) + 1)
+        return range(first, last)
+
+    def _render(self):
+        self._render_job = None
+        visible_tiles = {}
+        visible_texts = {}
+        header_row = None
+        for row in self._visible_rows():
+            kind, payload = self.rows[row]
+            y = self.row_tops[row]
+            if kind == "tiles":
+                for col, idx in enumerate(payload):
+                    visible_tiles[idx] = (col * TILE_WIDTH, y)
+            elif kind == "text":
+                visible_texts[payload] = y
+            else:
+                header_row = y
+
+        for idx in [i for i in self._tiles if i not in visible_tiles]:
+            self._recycle_tile(idx)
+        for idx in [i for i in self._texts if i not in visible_texts]:
+            self._recycle_text(idx)
+
+        for idx, (x, y) in visible_tiles.items():
+            tile = self._tiles.get(idx)
+            if tile is None:
+                tile = self._acquire_tile()
+                self._tiles[idx] = tile
+                tile.entry_index = idx
+                self._draw_tile(tile, self.entries[idx])
+            self.canvas.coords(tile.window_id, x, y)
+            self.canvas.itemconfigure(tile.window_id, state="normal")
+
+        for idx, y in visible_texts.items():
+            label = self._texts.get(idx)
+            if label is None:
+                label = self._acquire_text()
+                self._texts[idx] = label
+                label.entry_index = idx
+                info = self.entries[idx]["info"]
+                label.config(text=f"{info.name} ({info.type}, {format_bytes(info.size)})")
+            self.canvas.coords(label.window_id, 5, y)
+            self.canvas.itemconfigure(label.window_id, state="normal")
+
+        if header_row is not None:
+            if self._header is None:
+                self._header = tk.Label(self.canvas, text="Other Files:")
+                self._header.window_id = self.canvas.create_window(5, 0, window=self._header, anchor="nw")
+                self._bind_wheel(self._header)
+            self.canvas.coords(self._header.window_id, 5, header_row + 8)
+            self.canvas.itemconfigure(self._header.window_id, state="normal")
+        elif self._header is not None:
+            self.canvas.itemconfigure(self._header.window_id, state="hidden")
+
+    # --- Widget pools -----------------------------------------------------
+
+    def _acquire_tile(self):
+        if self._free_tiles:
+            return self._free_tiles.pop()
+        tile = tk.Frame(self.canvas)
+        tile.icon = tk.Canvas(tile, width=TILE_SIZE, height=TILE_SIZE, highlightthickness=0, cursor="hand2")
+        tile.icon.pack(padx=5, pady=(5, 2))
+        tile.name_label = tk.Label(tile, cursor="hand2")
+        tile.name_label.pack()
+        tile.window_id = self.canvas.create_window(0, 0, window=tile, anchor="nw")
+        for widget in (tile, tile.icon, tile.name_label):
+            widget.bind("<Button-1>", lambda e, t=tile: self._open(t.entry_index))
+            self._bind_wheel(widget)
+        return tile
+
+    def _recycle_tile(self, idx):
+        tile = self._tiles.pop(idx)
+        self.canvas.itemconfigure(tile.window_id, state="hidden")
+        tile.icon.delete("all")
+        entry = self.entries[idx] if idx < len(self.entries) else None
+        if entry is not None:
+            future = self._pending.pop(entry["path"], None)
+            if future is not None:
+                future.cancel()
+        tile.entry_index = None
+        self._free_tiles.append(tile)
+
+    def _acquire_text(self):
+        if self._free_texts:
+            return self._free_texts.pop()
+        label = tk.Label(self.canvas, fg="blue", cursor="hand2", anchor="w")
+        label.window_id = self.canvas.create_window(0, 0, window=label, anchor="nw")
+        label.bind("<Button-1>", lambda e, l=label: self._open(l.entry_index))
+        self._bind_wheel(label)
+        return label
+
+    def _recycle_text(self, idx):
+        label = self._texts.pop(idx)
+        self.canvas.itemconfigure(label.window_id, state="hidden")
+        label.entry_index = None
+        self._free_texts.append(label)
+
+    # --- Tile drawing -----------------------------------------------------
+
+    def _draw_tile(self, tile, entry):
+        icon = tile.icon
+        icon.delete("all")
+        tile.name_label.config(text=shorten_name(entry["name"]))
+        kind = entry["kind"]
+        if kind == "folder":
+            icon.config(bg="#f0dc8c")
+            icon.create_rectangle(10, 40, 90, 90, fill="#e2c76c", outline="#b89d4a")
+            icon.create_rectangle(20, 25, 70, 50, fill="#f6e7a1", outline="#b89d4a")
+            if entry.get("detail"):
+                icon.create_text(TILE_SIZE // 2, 67, text=entry["detail"], justify="center", font=("TkDefaultFont", 8))
+        elif kind == "video":
+            icon.config(bg="black")
+            photo = self._images.get(entry["path"])
+            if photo is not None:
+                self._images.move_to_end(entry["path"])
+                icon.create_image(TILE_SIZE // 2, TILE_SIZE // 2, image=photo)
+                self._draw_play_badge(icon)
+            else:
+                # Plain play icon until (or unless) a poster frame arrives
+                icon.create_polygon([35, 25, 35, 75, 75, 50], fill="white")
+                self._request_thumbnail(entry)
+        else:
+            icon.config(bg="#dddddd")
+            photo = self._images.get(entry["path"])
+            if photo is not None:
+                self._images.move_to_end(entry["path"])
+                icon.create_image(TILE_SIZE // 2, TILE_SIZE // 2, image=photo)
+            else:
+                icon.create_image(TILE_SIZE // 2, TILE_SIZE // 2, image=self._placeholder)
+                self._request_thumbnail(entry)
+
+    @staticmethod
+    def _draw_play_badge(icon):
+        icon.create_oval(TILE_SIZE - 30, TILE_SIZE - 30, TILE_SIZE - 6, TILE_SIZE - 6, fill="black", outline="white")
+        icon.create_polygon([TILE_SIZE - 22, TILE_SIZE - 24, TILE_SIZE - 22, TILE_SIZE - 12, TILE_SIZE - 12, TILE_SIZE - 18], fill="white")
+
+    def _request_thumbnail(self, entry):
+        path = entry["path"]
+        if self.loader is None or path in self._pending:
+            return
+        is_video = entry["kind"] == "video"
+        callback = lambda img, error, p=path, n=entry["name"]: self._thumbnail_ready(p, n, img, error, is_video)
+        if is_video:
+            self._pending[path] = self.loader.request_poster_frame(path, callback)
+        else:
+            self._pending[path] = self.loader.request(path, callback)
+
+    def _thumbnail_ready(self, path, name, img, error, is_video=False):
+        self._pending.pop(path, None)
+        tile = self._tile_for_path(path)
+        if error is not None:
+            if tile is not None and not is_video:  # videos keep their play icon
+                tile.icon.delete("all")
+                tile.icon.create_text(TILE_SIZE // 2, TILE_SIZE // 2, text=f"Error loading\n{shorten_name(name, 12)}", justify="center")
+            return
+        from PIL import ImageTk
+        self._images[path] = ImageTk.PhotoImage(img)
+        self._trim_images()
+        if tile is not None:
+            tile.icon.delete("all")
+            tile.icon.create_image(TILE_SIZE // 2, TILE_SIZE // 2, image=self._images[path])
+            if is_video:
+                self._draw_play_badge(tile.icon)
+
+    def _tile_for_path(self, path):
+        for idx, tile in self._tiles.items():
+            if self.entries[idx]["path"] == path:
+                return tile
+        return None
+
+    def _trim_images(self):
+        if len(self._images) <= self.max_images:
+            return
+        visible = {self.entries[idx]["path"] for idx in self._tiles}
+        for path in list(self._images):
+            if len(self._images) <= self.max_images:
+                break
+            if path not in visible:
+                del self._images[path]
+
+    def _cancel_pending(self):
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    def _loader_cancelled(self):
+        # The loader dropped our requests, so they no longer block new ones.
+        # Tiles still on screen ask again once the caller is done, which
+        # costs nothing if it goes on to show another album
+        self._pending.clear()
+        if self._rerequest_job is None:
+            self._rerequest_job = self.after_idle(self._rerequest_visible)
+
+    def _rerequest_visible(self):
+        self._rerequest_job = None
+        for idx in list(self._tiles):
+            entry = self.entries[idx]
+            if entry["kind"] != "folder" and entry["path"] not in self._images:
+                self._request_thumbnail(entry)
+
+    # --- Events -----------------------------------------------------------
+
+    def _open(self, idx):
+        if idx is not None and self.on_open is not None:
+            self.on_open(self.entries[idx])
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-3, "units"))
+        widget.bind("<Button-5>", lambda e: self.canvas.yview_scroll(3, "units"))
+
+    def _on_wheel(self, event):
+        step = -1 if event.delta > 0 else 1
+        if abs(event.delta) >= 120:
+            step *= abs(event.delta) // 120
+        self.canvas.yview_scroll(step * 3, "units")
@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+
+# Directory mtimes this close to the scan time may still change within the same
+# timestamp tick (coarse filesystem clocks), so such listings are not trusted.
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+
+class AlbumEntry:
+    """One file or sub-folder of an album, as returned by list_album_entries."""
+
+    __slots__ = ("name", "type", "size", "mtime", "is_folder")
+
+    def __init__(self, name, type, size, mtime, is_folder):
+        self.name = name
+        self.type = type
+        self.size = size
+        self.mtime = mtime
+        self.is_folder = is_folder
+
+    @classmethod
+    def from_dir_entry(cls, entry):
+        if entry.is_dir():
+            return cls(entry.name, "folder", None, entry.stat().st_mtime, True)
+        st = entry.stat()
+        return cls(entry.name, os.path.splitext(entry.name)[1][1:], st.st_size, st.st_mtime, False)
+
+    @classmethod
+    def from_path(cls, path):
+        """Stat path into an AlbumEntry; None if it is gone or not a file or folder."""
+        name = os.path.basename(path)
+        if os.path.isdir(path):
+            return cls(name, "folder", None, os.path.getmtime(path), True)
+        if os.path.isfile(path):
+            st = os.stat(path)
+            return cls(name, os.path.splitext(name)[1][1:], st.st_size, st.st_mtime, False)
+        return None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "type": self.type,
+            "size": self.size,
+            "is_folder": self.is_folder
+        }
+
+    def __repr__(self):
+        return f"AlbumEntry({self.name!r}, type={self.type!r}, size={self.size!r})"
+
+
+class AlbumIndex:
+    """
+    Per-directory listing cache keyed on the directory's mtime. An unchanged
+    directory costs one stat; a changed one is re-listed with scandir and
+    every entry is stat'ed again, since a file replaced under a known name
+    changes the directory's mtime but not its own name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listings = {}  # abs path -> (dir mtime_ns, scan time ns, {name: AlbumEntry})
+
+    def list(self, dir_path):
+        key = os.path.abspath(dir_path)
+        try:
+            dir_mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            self.invalidate(key)
+            return []
+
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached is not None:
+            cached_mtime, scanned_at, entries = cached
+            if cached_mtime == dir_mtime and scanned_at - dir_mtime > RACY_WINDOW_NS:
+                return self._sorted(entries)
+
+        scanned_at = time.time_ns()
+        entries = {}
+        with os.scandir(key) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_file() or entry.is_dir():
+                        entries[entry.name] = AlbumEntry.from_dir_entry(entry)
+                except OSError:
+                    continue  # removed while listing
+        with self._lock:
+            self._listings[key] = (dir_mtime, scanned_at, entries)
+        return self._sorted(entries)
+
+    def refresh_entry(self, dir_path, name):
+        """
+        Re-stat a single entry after the app added, overwrote or removed it.
+        The directory's new mtime is recorded with the entry, so the next
+        list() does not read the whole directory again (unless the change is
+        too recent to trust, see RACY_WINDOW_NS).
+        """
+        key = os.path.abspath(dir_path)
+        scanned_at = time.time_ns()
+        try:
+            dir_mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            self.invalidate(key)
+            return
+        entry = AlbumEntry.from_path(os.path.join(key, name))
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is None:
+                return
+            entries = cached[2]
+            if entry is not None:
+                entries[name] = entry
+            else:
+                entries.pop(name, None)
+            self._listings[key] = (dir_mtime, scanned_at, entries)
+
+    def invalidate(self, dir_path=None):
+        """Forget the listing of dir_path and everything below it (or all listings)."""
+        with self._lock:
+            if dir_path is None:
+                self._listings.clear()
+                return
+            key = os.path.abspath(dir_path)
+            prefix = key + os.sep
+            for path in [p for p in self._listings if p == key or p.startswith(prefix)]:
+                del self._listings[path]
+
+    @staticmethod
+    def _sorted(entries):
+        return sorted(entries.values(), key=lambda e: e.name.lower())
+
+
+album_index = AlbumIndex()
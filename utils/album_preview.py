@@ -1,6 +1,11 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from utils.files import remove_file
+from utils import video_player
 
 try:
     from PIL import Image, ImageTk
@@ -8,33 +13,157 @@ except ImportError:
     Image = None
     ImageTk = None
 
+RESIZE_SETTLE_MS = 200
+FAST_RESIZE_MS = 30
+DEFAULT_PREFETCH = 2
+DEFAULT_PREVIEW_CACHE_BYTES = 512 * 1024 * 1024
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".wmv", ".webm")
+# Modes Image.reduce() supports that preview images commonly come in
+REDUCE_MODES = ("L", "LA", "La", "RGB", "RGBA", "RGBa", "RGBX", "CMYK", "YCbCr", "I", "F")
+
+
+def _reducible(img):
+    """
+    Return img in a mode Image.reduce() can average: palette images become
+    RGB(A) (averaging palette indices would mix unrelated colours), bilevel
+    images become L, and other modes reduce() rejects become RGB.
+    """
+    if img.mode in ("P", "PA"):
+        return img.convert("RGBA" if img.mode == "PA" or "transparency" in img.info else "RGB")
+    if img.mode == "1":
+        return img.convert("L")
+    if img.mode not in REDUCE_MODES:
+        return img.convert("RGB")
+    return img
+
+
+def load_preview_image(file_path, max_size):
+    """
+    Decode an image for on-screen display. JPEGs are decoded with draft(),
+    letting the decoder scale by 1/2, 1/4 or 1/8 while still covering
+    max_size; other formats are reduced by an integer factor after decoding.
+    """
+    img = Image.open(file_path)
+    if img.format == "JPEG":
+        img.draft("RGB", max_size)
+    img.load()
+    factor = min(img.width // max(1, max_size[0]), img.height // max(1, max_size[1]))
+    if factor >= 2:
+        source = img
+        img = _reducible(source).reduce(factor)
+        source.close()  # releases the file of formats that keep it open, e.g. GIF
+    return img
+
+
+class PreviewCache:
+    """
+    Decoded preview images shared by all preview windows, keyed on path,
+    mtime and size and capped by the memory their pixels take. Least
+    recently used images are dropped first.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_PREVIEW_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._images = OrderedDict()  # key -> (image, bytes)
+        self._total = 0
+        self._pending = {}  # key -> future of a prefetch in progress
+        self._executor = None
+
+    @staticmethod
+    def _key(file_path):
+        st = os.stat(file_path)
+        return (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+
+    def _put(self, key, img):
+        size = img.width * img.height * len(img.getbands())
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = (img, size)
+            self._total += size
+            while self._total > self.max_bytes and len(self._images) > 1:
+                _, (_, dropped) = self._images.popitem(last=False)
+                self._total -= dropped
+
+    def load(self, file_path, max_size):
+        """Return the decoded image, waiting for a running prefetch rather than decoding twice."""
+        key = self._key(file_path)
+        with self._lock:
+            cached = self._images.get(key)
+            if cached is not None:
+                self._images.move_to_end(key)
+                return cached[0]
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                pass  # decode again below to surface the error to the caller
+        img = load_preview_image(file_path, max_size)
+        self._put(key, img)
+        return img
+
+    def prefetch(self, file_paths, max_size):
+        """Decode file_paths on a background thread so navigating to them is instant."""
+        for file_path in file_paths:
+            try:
+                key = self._key(file_path)
+            except OSError:
+                continue
+            with self._lock:
+                if key in self._images or key in self._pending:
+                    continue
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview-prefetch")
+                self._pending[key] = self._executor.submit(self._prefetch_one, key, file_path, max_size)
+
+    def _prefetch_one(self, key, file_path, max_size):
+        try:
+            img = load_preview_image(file_path, max_size)
+            self._put(key, img)
+            return img
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+
+preview_cache = PreviewCache()
+
+
+def is_previewable_image(file_path):
+    return os.path.splitext(file_path)[1].lower() in IMAGE_EXTS and Image is not None and ImageTk is not None
+
+
 class AlbumPreview(tk.Toplevel):
-    def __init__(self, master, file_path):
+    def __init__(self, master, file_path, storage_directory=None, file_list=None, prefetch=DEFAULT_PREFETCH):
         super().__init__(master)
-        self.title(f"Preview: {os.path.basename(file_path)}")
         self.geometry("800x800")  # Set preview window to 800x800
-        self.file_path = file_path
+        self.storage_directory = storage_directory
+        # Ordered album files for next/previous navigation
+        self.file_list = list(file_list) if file_list else [file_path]
+        if file_path not in self.file_list:
+            self.file_list.insert(0, file_path)
+        self.prefetch_count = prefetch
 
         self.preview_frame = tk.Frame(self)
         self.preview_frame.pack(fill="both", expand=True)
 
-        ext = os.path.splitext(file_path)[1].lower()
-        self.is_image = ext in (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp") and Image and ImageTk
-        self.is_video = ext in (".mp4", ".avi", ".mov", ".wmv", ".webm")
-
         self.display_widget = None
+        self.video_controls = None
         self.photo = None  # Keep reference to avoid garbage collection
+        self.source_image = None  # Decoded once, kept while this file is shown
+        self.rendered_size = None
+        self.rendered_resample = None
+        self.resize_job = None
+        self.fast_resize_job = None
 
         # Ensure video stops when window is closed
         self.protocol("WM_DELETE_WINDOW", self.on_close)
-
-        if self.is_image:
-            self.display_image()
-            self.bind("<Configure>", self.on_resize)
-        elif self.is_video:
-            self.display_video_vlc()
-        else:
-            self.display_file_info()
+        self.bind("<Configure>", self.on_resize)
+        self.bind("<Left>", lambda e: self.show_relative(-1))
+        self.bind("<Right>", lambda e: self.show_relative(1))
 
         # --- Horizontal bar above export button ---
         bar = tk.Frame(self, height=2, bg="gray")
@@ -46,12 +175,92 @@ class AlbumPreview(tk.Toplevel):
         delete_btn = tk.Button(self, text="Delete", command=self.delete_file)
         delete_btn.pack(side="bottom", pady=(0, 5))
 
-    def display_image(self):
-        # Remove previous widget if any
-        if self.display_widget:
-            self.display_widget.destroy()
+        if self.storage_directory:
+            tk.Button(self, text="Find Similar", command=self.find_similar).pack(side="bottom", pady=(0, 5))
+
+        if len(self.file_list) > 1:
+            nav = tk.Frame(self)
+            nav.pack(side="bottom", pady=(5, 0))
+            tk.Button(nav, text="< Prev", command=lambda: self.show_relative(-1)).pack(side="left", padx=5)
+            self.position_label = tk.Label(nav)
+            self.position_label.pack(side="left", padx=5)
+            tk.Button(nav, text="Next >", command=lambda: self.show_relative(1)).pack(side="left", padx=5)
+        else:
+            self.position_label = None
+
+        self.show_file(file_path)
+        self.focus_set()
+
+    def show_file(self, file_path):
+        """Show file_path in this window, tearing down whatever was shown before."""
+        self.clear_display()
+        self.file_path = file_path
+        self.index = self.file_list.index(file_path)
+        self.title(f"Preview: {os.path.basename(file_path)}")
+        if self.position_label is not None:
+            self.position_label.config(text=f"{self.index + 1} / {len(self.file_list)}")
+
+        ext = os.path.splitext(file_path)[1].lower()
+        self.is_image = is_previewable_image(file_path)
+        self.is_video = ext in VIDEO_EXTS
+
+        if self.is_image:
+            self.display_image()
+        elif self.is_video:
+            self.display_video_vlc()
+        else:
+            self.display_file_info()
+        self.prefetch_neighbors()
+
+    def show_relative(self, step):
+        index = self.index + step
+        if 0 <= index < len(self.file_list):
+            self.show_file(self.file_list[index])
+
+    def prefetch_neighbors(self):
+        if not self.prefetch_count or len(self.file_list) < 2:
+            return
+        neighbors = []
+        for distance in range(1, self.prefetch_count + 1):
+            for index in (self.index + distance, self.index - distance):
+                if 0 <= index < len(self.file_list) and is_previewable_image(self.file_list[index]):
+                    neighbors.append(self.file_list[index])
+        preview_cache.prefetch(neighbors, self.screen_size())
+
+    def screen_size(self):
+        return (self.winfo_screenwidth(), self.winfo_screenheight())
+
+    def clear_display(self):
+        """Stop any video and remove the current file's widgets."""
+        self.release_player()
+        for job in (self.resize_job, self.fast_resize_job):
+            if job is not None:
+                self.after_cancel(job)
+        self.resize_job = self.fast_resize_job = None
+        for widget in self.preview_frame.winfo_children():
+            widget.destroy()
+        if self.video_controls is not None:
+            self.video_controls.destroy()
+            self.video_controls = None
+        self.display_widget = None
+        self.photo = None
+        self.source_image = None
+        self.rendered_size = None
+        self.rendered_resample = None
+
+    def release_player(self):
+        if hasattr(self, "player"):
+            video_player.release_player(self.player)
+            del self.player
+        if hasattr(self, "media"):
+            self.media.release()
+            del self.media
+
+    def display_image(self, resample=None):
         try:
-            img = Image.open(self.file_path)
+            if self.source_image is None:
+                self.source_image = preview_cache.load(self.file_path, self.screen_size())
+            img = self.source_image
             # Calculate size based on current preview_frame size minus space for the bottom bar/buttons
             self.update_idletasks()
             w = self.preview_frame.winfo_width()
@@ -69,24 +278,50 @@ class AlbumPreview(tk.Toplevel):
             else:
                 new_h = h
                 new_w = int(h * img_ratio)
-            img = img.resize((new_w, new_h), Image.LANCZOS)
-            self.photo = ImageTk.PhotoImage(img)
-            label = tk.Label(self.preview_frame, image=self.photo, bg="black")
-            label.pack(expand=True, fill="both")
-            self.display_widget = label
+            new_size = (max(1, new_w), max(1, new_h))
+            resample = Image.LANCZOS if resample is None else resample
+            if new_size == self.rendered_size and resample == self.rendered_resample:
+                return
+            self.photo = ImageTk.PhotoImage(img.resize(new_size, resample))
+            self.rendered_size = new_size
+            self.rendered_resample = resample
+            if self.display_widget is None:
+                self.display_widget = tk.Label(self.preview_frame, bg="black")
+                self.display_widget.pack(expand=True, fill="both")
+            # Reuse the label; only its image changes
+            self.display_widget.config(image=self.photo)
         except Exception as e:
             tk.Label(self.preview_frame, text=f"Error loading image: {e}").pack()
 
     def on_resize(self, event):
-        if self.is_image and event.widget == self:
-            self.display_image()
+        if not (self.is_image and event.widget == self):
+            return
+        # While the window is being dragged, redraw with a cheap filter at a
+        # limited rate; render once with LANCZOS after the size settles
+        if self.resize_job is not None:
+            self.after_cancel(self.resize_job)
+        self.resize_job = self.after(RESIZE_SETTLE_MS, self.finish_resize)
+        if self.fast_resize_job is None:
+            self.fast_resize_job = self.after(FAST_RESIZE_MS, self.fast_resize)
+
+    def fast_resize(self):
+        self.fast_resize_job = None
+        self.display_image(Image.BILINEAR)
+
+    def finish_resize(self):
+        self.resize_job = None
+        self.display_image(Image.LANCZOS)
+
+    def destroy(self):
+        self.clear_display()
+        super().destroy()
 
     def display_video_vlc(self):
         try:
-            import vlc  # pip install python-vlc
+            video_player.get_instance()
         except ImportError:
             self.display_video_placeholder()
-            tk.Label(self, text="python-vlc not installed.\nRun: pip install python-vlc").pack()
+            tk.Label(self.preview_frame, text="python-vlc not installed.\nRun: pip install python-vlc").pack()
             return
 
         if self.display_widget:
@@ -96,23 +331,20 @@ class AlbumPreview(tk.Toplevel):
         self.vlc_panel.pack(fill="both", expand=True)
         self.display_widget = self.vlc_panel
 
-        self.instance = vlc.Instance('--no-video-title-show', '--avcodec-hw=none')
-        self.player = self.instance.media_player_new()
-        self.media = self.instance.media_new(self.file_path)
+        # The libvlc instance is shared and players are pooled, so only the
+        # first video pays for VLC's startup
+        self.player = video_player.acquire_player()
+        self.media = video_player.get_instance().media_new(self.file_path)
         self.player.set_media(self.media)
 
         self.update_idletasks()
         # Set the video output window
-        if os.name == "nt":
-            self.player.set_hwnd(self.vlc_panel.winfo_id())
-        elif os.name == "posix":
-            self.player.set_xwindow(self.vlc_panel.winfo_id())
-        elif os.name == "darwin":
-            self.player.set_nsobject(self.vlc_panel.winfo_id())
+        video_player.attach_window(self.player, self.vlc_panel.winfo_id())
 
         # --- Video Controls ---
         controls = tk.Frame(self)
         controls.pack(side="bottom", fill="x", pady=(0, 5))
+        self.video_controls = controls
 
         play_btn = tk.Button(controls, text="Play", command=self.play_video)
         play_btn.pack(side="left", padx=5)
@@ -181,29 +413,80 @@ class AlbumPreview(tk.Toplevel):
             title="Export File",
             initialfile=os.path.basename(self.file_path)
         )
-        if export_path:
+        if not export_path:
+            return
+        # Copy in the background; a large video would otherwise freeze the window
+        from utils.file_export import export_file
+        from utils.zip_export import ExportCancelled
+        from utils.progress_dialog import ProgressDialog
+
+        file_path = self.file_path
+        dialog = ProgressDialog(self, f"Exporting {os.path.basename(file_path)}")
+
+        def do_export():
             try:
-                import shutil
-                shutil.copy2(self.file_path, export_path)
-                messagebox.showinfo("Export", f"File exported to {export_path}")
+                export_file(file_path, export_path, progress=dialog.report_transfer, cancel_event=dialog.cancel_event)
+                self.after(0, dialog.close)
+                self.after(0, lambda: messagebox.showinfo("Export", f"File exported to {export_path}"))
+            except ExportCancelled:
+                self.after(0, dialog.close)
             except Exception as e:
-                messagebox.showerror("Export Error", f"Failed to export file: {e}")
+                msg = str(e)
+                self.after(0, dialog.close)
+                self.after(0, lambda: messagebox.showerror("Export Error", f"Failed to export file: {msg}"))
+        threading.Thread(target=do_export, daemon=True).start()
+
+    def find_similar(self):
+        """Open the images that look like this one (resized or recompressed copies) in a new preview."""
+        from utils.phash import get_perceptual_index, is_hashable
+
+        if not is_hashable(self.file_path):
+            messagebox.showinfo("Find Similar", "Similar files can only be found for images.")
+            return
+        file_path = self.file_path
+        storage_directory = self.storage_directory
+
+        def search():
+            try:
+                index = get_perceptual_index(storage_directory)
+                # Bring this file's profile up to date; other profiles are
+                # matched with the hashes already stored for them
+                rel_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(storage_directory))
+                profile = rel_path.split(os.sep)[0]
+                if profile != os.pardir:
+                    index.sync([profile])
+                matches = [path for _, path in index.near_duplicates(file_path)]
+                self.after(0, lambda: self.show_similar(file_path, matches))
+            except Exception as e:
+                msg = str(e)
+                self.after(0, lambda: messagebox.showerror("Find Similar", f"Failed to search: {msg}"))
+        threading.Thread(target=search, daemon=True).start()
+
+    def show_similar(self, file_path, matches):
+        if not matches:
+            messagebox.showinfo("Find Similar", "No similar images found.")
+            return
+        AlbumPreview(self.master, file_path, self.storage_directory, file_list=[file_path] + matches,
+                     prefetch=self.prefetch_count)
 
     def delete_file(self):
         confirm = messagebox.askyesno("Delete File", f"Are you sure you want to delete '{os.path.basename(self.file_path)}'?")
         if confirm:
             try:
-                os.remove(self.file_path)
+                if self.storage_directory:
+                    remove_file(self.storage_directory, self.file_path)
+                else:
+                    os.remove(self.file_path)
                 messagebox.showinfo("Deleted", f"File '{os.path.basename(self.file_path)}' deleted.")
-                self.destroy()
+                self.file_list.remove(self.file_path)
+                if self.file_list:
+                    # Carry on with the file that took this one's place
+                    self.show_file(self.file_list[min(self.index, len(self.file_list) - 1)])
+                else:
+                    self.destroy()
             except Exception as e:
                 messagebox.showerror("Delete Error", f"Failed to delete file: {e}")
 
     def on_close(self):
-        # Stop video if playing before closing
-        if hasattr(self, "player"):
-            try:
-                self.player.stop()
-            except Exception:
-                pass
+        # destroy() stops the video if one is playing
         self.destroy()
\ No newline at end of file
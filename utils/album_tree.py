@@ -0,0 +1,326 @@
+import os
+import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from utils.album_index import album_index
+
+# A profile's own data is not counted as album content
+PROFILE_DATA_FILE = "data.json"
+
+_trees = {}
+_trees_lock = threading.Lock()
+
+
+class DirStats:
+    """
+    File count, bytes and a per-type breakdown ({type: [count, bytes]}) of a
+    directory tree. Also used for differences, whose values may be negative.
+    """
+
+    __slots__ = ("files", "bytes", "types")
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.types = {}
+
+    def add_file(self, type, size, sign=1):
+        type = type.lower()
+        self.files += sign
+        self.bytes += sign * size
+        counts = self.types.setdefault(type, [0, 0])
+        counts[0] += sign
+        counts[1] += sign * size
+        if counts == [0, 0]:
+            del self.types[type]
+
+    def add(self, other, sign=1):
+        self.files += sign * other.files
+        self.bytes += sign * other.bytes
+        for type, (count, size) in other.types.items():
+            counts = self.types.setdefault(type, [0, 0])
+            counts[0] += sign * count
+            counts[1] += sign * size
+            if counts == [0, 0]:
+                del self.types[type]
+
+    def copy(self):
+        stats = DirStats()
+        stats.add(self)
+        return stats
+
+    def to_dict(self):
+        return {"files": self.files, "bytes": self.bytes, "types": {t: list(c) for t, c in self.types.items()}}
+
+    def __repr__(self):
+        return f"DirStats(files={self.files}, bytes={self.bytes})"
+
+
+class _Node:
+    __slots__ = ("mtime_ns", "files", "own", "children", "total")
+
+    def __init__(self, mtime_ns, files, children):
+        self.mtime_ns = mtime_ns
+        self.files = files        # name -> (type, size) of the files directly inside
+        self.children = children  # names of the sub-folders
+        self.own = DirStats()
+        for type, size in files.values():
+            self.own.add_file(type, size)
+        self.total = None         # own plus every sub-folder's total; None until computed
+
+
+class AlbumTree:
+    """
+    Tree model of the album folders under a storage directory with a cached
+    rollup (file count, bytes, per-type breakdown) per directory. A
+    directory's own files come from album_index, so computing a rollup lists
+    each folder once; afterwards a lookup costs one stat of that folder.
+    Uploads and deletes update the affected folder and apply the difference
+    to every cached folder above it instead of recounting the tree. Changes
+    made by other programs deep below a cached folder are picked up through
+    invalidate() (the storage watcher calls it) or refresh().
+
+    The first count of a large tree holds the tree for a while, so
+    file_changed(), invalidate() and refresh() never wait for it: they are
+    queued and applied by whichever thread holds the tree next, before any
+    query reads it.
+    """
+
+    def __init__(self, storage_directory):
+        self.storage_directory = storage_directory
+        self.root = os.path.abspath(storage_directory)
+        self._lock = threading.RLock()
+        self._nodes = {}  # abs dir path -> _Node
+        self._pending = deque()  # (method, args) queued by the maintenance calls
+
+    def _post(self, method, *args):
+        self._pending.append((method, args))
+        self._drain()
+
+    def _drain(self):
+        # Whoever appends tries the lock afterwards and whoever releases it
+        # checks the queue afterwards, so no queued change is left behind
+        while self._pending and self._lock.acquire(blocking=False):
+            try:
+                self._apply_pending()
+            finally:
+                self._lock.release()
+
+    def _apply_pending(self):
+        while self._pending:
+            method, args = self._pending.popleft()
+            method(*args)
+
+    @contextmanager
+    def _locked(self):
+        try:
+            with self._lock:
+                self._apply_pending()
+                yield
+        finally:
+            self._drain()
+
+    def _ancestors(self, key):
+        """Yield the cached directories above key, nearest first, up to the storage directory."""
+        parent = os.path.dirname(key)
+        while parent.startswith(self.root + os.sep):
+            node = self._nodes.get(parent)
+            if node is not None:
+                yield parent, node
+            parent = os.path.dirname(parent)
+
+    def _node(self, key):
+        """Return the directory's node, re-listing it if it changed since it was cached."""
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+        except OSError:
+            self._drop(key)
+            return None
+        node = self._nodes.get(key)
+        if node is not None and node.mtime_ns == mtime_ns:
+            return node
+        files, children = {}, []
+        is_profile = os.path.dirname(key) == self.root
+        for entry in album_index.list(key):
+            if entry.is_folder:
+                children.append(entry.name)
+            elif not (is_profile and entry.name == PROFILE_DATA_FILE):
+                files[entry.name] = (entry.type, entry.size)
+        if node is not None:
+            # Sub-folders that are gone no longer count anywhere
+            for name in set(node.children) - set(children):
+                self._drop(os.path.join(key, name))
+        node = self._nodes[key] = _Node(mtime_ns, files, children)
+        self._unsettle(key)
+        return node
+
+    def _propagate(self, key, stats):
+        for _, ancestor in self._ancestors(key):
+            if ancestor.total is not None:
+                ancestor.total.add(stats)
+
+    def _unsettle(self, key):
+        """Make the folders above key recount their totals on their next lookup."""
+        for _, ancestor in self._ancestors(key):
+            ancestor.total = None
+
+    def _total(self, key):
+        node = self._node(key)
+        if node is None:
+            return DirStats()
+        if node.total is None:
+            total = node.own.copy()
+            for name in node.children:
+                total.add(self._total(os.path.join(key, name)))
+            node.total = total
+        return node.total
+
+    def _drop(self, key):
+        prefix = key + os.sep
+        for path in [p for p in self._nodes if p == key or p.startswith(prefix)]:
+            del self._nodes[path]
+        self._unsettle(key)
+
+    # --- Queries ----------------------------------------------------------
+
+    def stats(self, dir_path):
+        """Return the DirStats of everything below dir_path (a profile, album or album sub-folder)."""
+        with self._locked():
+            return self._total(os.path.abspath(dir_path)).copy()
+
+    def children(self, dir_path):
+        """Return [(name, DirStats)] for the sub-folders of dir_path, for drilling down."""
+        key = os.path.abspath(dir_path)
+        with self._locked():
+            node = self._node(key)
+            if node is None:
+                return []
+            return [(name, self._total(os.path.join(key, name)).copy())
+                    for name in sorted(node.children, key=str.lower)]
+
+    # --- Maintenance ------------------------------------------------------
+
+    def file_changed(self, file_path):
+        """Account for a file that was added, overwritten or removed, without re-listing its folder."""
+        self._post(self._file_changed, os.path.abspath(file_path))
+
+    def invalidate(self, dir_path):
+        """Forget a folder that was created, removed or changed by someone else; it is counted again on demand."""
+        self._post(self._invalidate, os.path.abspath(dir_path))
+
+    def refresh(self):
+        self._post(self._nodes.clear)
+
+    def _file_changed(self, file_path):
+        key, name = os.path.split(file_path)
+        node = self._nodes.get(key)
+        if node is None:
+            # A folder not counted yet, e.g. created by this upload: its parent must list it
+            self._invalidate(key)
+            return
+        try:
+            st = os.stat(file_path)
+            new = (os.path.splitext(name)[1][1:], st.st_size)
+        except OSError:
+            new = None
+        old = node.files.get(name)
+        delta = DirStats()
+        if old is not None:
+            delta.add_file(old[0], old[1], -1)
+            del node.files[name]
+        if new is not None:
+            delta.add_file(new[0], new[1])
+            node.files[name] = new
+        node.own.add(delta)
+        if node.total is not None:
+            node.total.add(delta)
+        self._propagate(key, delta)
+        try:
+            node.mtime_ns = os.stat(key).st_mtime_ns
+        except OSError:
+            self._drop(key)
+
+    def _invalidate(self, key):
+        self._drop(key)
+        # The parent re-lists itself on its next lookup
+        parent = self._nodes.get(os.path.dirname(key))
+        if parent is not None:
+            parent.mtime_ns = None
+
+
+def get_album_tree(storage_directory):
+    """Return the shared album tree for storage_directory."""
+    key = os.path.abspath(storage_directory)
+    with _trees_lock:
+        tree = _trees.get(key)
+        if tree is None:
+            tree = _trees[key] = AlbumTree(storage_directory)
+        return tree
+
+
+# --- Hooks used by utils.files --------------------------------------------
+
+def _loaded_tree(storage_directory):
+    with _trees_lock:
+        return _trees.get(os.path.abspath(storage_directory))
+
+
+def record_file(storage_directory, file_path):
+    tree = _loaded_tree(storage_directory)
+    if tree is not None:
+        tree.file_changed(file_path)
+
+
+def forget_tree(storage_directory, dir_path):
+    tree = _loaded_tree(storage_directory)
+    if tree is not None:
+        tree.invalidate(dir_path)
+
+
+def format_stats(stats, sep=", "):
+    from utils.progress_dialog import format_bytes
+
+    return f"{stats.files} file{'' if stats.files == 1 else 's'}{sep}{format_bytes(stats.bytes)}"
+
+
+def format_types(stats, limit=None):
+    """Return e.g. "jpg 120, mp4 8, pdf 2", largest types by bytes first."""
+    types = sorted(stats.types.items(), key=lambda item: (-item[1][1], item[0]))
+    text = ", ".join(f"{type or '?'} {count}" for type, (count, _) in types[:limit])
+    if limit is not None and len(types) > limit:
+        text += ", ..."
+    return text
+
+
+def main(argv=None):
+    import argparse
+    from utils.settings import load_settings
+
+    parser = argparse.ArgumentParser(prog="python -m utils.album_tree", description="Show album sizes.")
+    parser.add_argument("profile")
+    parser.add_argument("album", nargs="?", default="", help="start below this album (e.g. album1/subfolder1)")
+    parser.add_argument("--storage", default=None, help="storage directory (defaults to settings.json)")
+    parser.add_argument("--depth", type=int, default=None, help="levels of sub-folders to show")
+    args = parser.parse_args(argv)
+    storage_directory = args.storage or load_settings().get("storage_directory", "storage/")
+    start = os.path.join(storage_directory, args.profile, args.album)
+    if not os.path.isdir(start):
+        print(f"'{start}' not found.", file=sys.stderr)
+        return 1
+    tree = get_album_tree(storage_directory)
+
+    def show(path, name, stats, depth):
+        types = format_types(stats)
+        print(f"{'  ' * depth}{name}  {format_stats(stats)}" + (f"  ({types})" if types else ""))
+        if args.depth is None or depth < args.depth:
+            for child, child_stats in tree.children(path):
+                show(os.path.join(path, child), child, child_stats, depth + 1)
+
+    show(start, os.path.join(args.profile, args.album).rstrip(os.sep), tree.stats(start), 0)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
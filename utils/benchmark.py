@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Share of generated files per kind, and their default sizes in KB
+FILE_MIX = (("image", 0.6), ("video", 0.1), ("doc", 0.3))
+DEFAULT_SIZES_KB = {"image": 200, "video": 4096, "doc": 64}
+IMAGE_TEMPLATES = 8
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process and its finished children, in KB."""
+    if resource is None:
+        return None
+    scale = 1 if sys.platform != "darwin" else 1024  # macOS reports bytes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    return max(own, children)
+
+
+def _random_bytes(rng, n):
+    return rng.getrandbits(n * 8).to_bytes(n, "little") if n else b""
+
+
+def _image_templates(rng, size_kb):
+    """
+    Real JPEGs of roughly size_kb (noise compresses badly, so the pixel count
+    sets the size), so thumbnailing does real decoding work. Falls back to
+    random bytes when Pillow is missing.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return [_random_bytes(rng, size_kb * 1024) for _ in range(IMAGE_TEMPLATES)]
+    import io
+    templates = []
+    side = max(16, int((size_kb * 1024 / 1.5) ** 0.5))
+    for _ in range(IMAGE_TEMPLATES):
+        img = Image.frombytes("RGB", (side, side), _random_bytes(rng, side * side * 3))
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=85)
+        templates.append(buf.getvalue())
+    return templates
+
+
+def _doc_bytes(rng, size_kb):
+    # Text-like content, so export exercises deflate
+    words = [rng.choice(("alpha", "beta", "gamma", "delta", "profile", "album", "note")) for _ in range(512)]
+    chunk = (" ".join(words) + "\n").encode()
+    return (chunk * (size_kb * 1024 // len(chunk) + 1))[:size_kb * 1024]
+
+
+def generate_tree(storage_directory, profiles, albums, files, sizes_kb=None, seed=0):
+    """
+    Create profiles x albums x files synthetic album files (mixed images,
+    videos and documents) plus a data.json per profile. Returns
+    (file count, total bytes).
+    """
+    from utils.storage import DEFAULT_DATA
+
+    rng = random.Random(seed)
+    sizes_kb = {**DEFAULT_SIZES_KB, **(sizes_kb or {})}
+    images = _image_templates(rng, sizes_kb["image"])
+    video = _random_bytes(rng, sizes_kb["video"] * 1024)
+    doc = _doc_bytes(rng, sizes_kb["doc"])
+    kinds = [kind for kind, _ in FILE_MIX]
+    weights = [weight for _, weight in FILE_MIX]
+    count = total = 0
+    for p in range(profiles):
+        profile = f"profile{p:05d}"
+        profile_path = os.path.join(storage_directory, profile)
+        os.makedirs(profile_path, exist_ok=True)
+        data = {**DEFAULT_DATA, "displayname": profile, "realname": f"Person {p}", "phone_number": f"555-{p:04d}"}
+        with open(os.path.join(profile_path, "data.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        for a in range(albums):
+            album_path = os.path.join(profile_path, f"album{a:03d}")
+            os.makedirs(album_path, exist_ok=True)
+            for i in range(files):
+                kind = rng.choices(kinds, weights)[0]
+                if kind == "image":
+                    name, content = f"img{i:05d}.jpg", images[i % len(images)]
+                elif kind == "video":
+                    name, content = f"vid{i:05d}.mp4", video
+                else:
+                    name, content = f"doc{i:05d}.txt", doc
+                with open(os.path.join(album_path, name), "wb") as f:
+                    f.write(content)
+                count += 1
+                total += len(content)
+    # Directory listings are cached on mtime but not trusted while it is very
+    # recent; back-date the new tree so warm runs measure the cached path
+    old = time.time() - 60
+    for root, dirs, _ in os.walk(storage_directory):
+        for d in dirs:
+            os.utime(os.path.join(root, d), (old, old))
+    os.utime(storage_directory, (old, old))
+    return count, total
+
+
+class Benchmark:
+    """Times operations and collects results as plain dicts."""
+
+    def __init__(self):
+        self.results = []
+
+    def measure(self, name, phase, func, items=None, nbytes=None):
+        """Run func once and record its duration, throughput and peak RSS."""
+        started = time.perf_counter()
+        returned = func()
+        seconds = time.perf_counter() - started
+        if callable(items):
+            items = items(returned)
+        result = {"name": name, "phase": phase, "seconds": round(seconds, 6), "items": items}
+        if items:
+            result["items_per_second"] = round(items / seconds, 2) if seconds else None
+        if nbytes:
+            result["bytes"] = nbytes
+            result["mb_per_second"] = round(nbytes / 1024 / 1024 / seconds, 2) if seconds else None
+        result["peak_rss_kb"] = peak_rss_kb()
+        self.results.append(result)
+        self.print_result(result)
+        return returned
+
+    @staticmethod
+    def print_result(result):
+        rate = ""
+        if result.get("mb_per_second") is not None:
+            rate = f"{result['mb_per_second']:10.1f} MB/s"
+        elif result.get("items_per_second") is not None:
+            rate = f"{result['items_per_second']:10.1f} /s  "
+        rss = result["peak_rss_kb"]
+        print(f"{result['name']:<24} {result['phase']:<5} {result['seconds']:10.4f} s {rate:>16}"
+              f"  peak RSS {rss // 1024 if rss else '?'} MB", file=sys.stderr)
+
+
+def drop_os_caches():
+    """Ask the kernel to drop the page cache (Linux, root only). Returns True on success."""
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def run(storage_directory, bench, sample_profiles=3, drop_caches=False):
+    """
+    Time the storage, files, transfer and thumbnail layers over
+    storage_directory, each once cold and once warm. "Cold" clears the app's
+    own caches (and the OS page cache when drop_caches is set and allowed);
+    "warm" repeats the operation straight away.
+    """
+    from utils import storage, files
+    from utils.album_index import album_index
+    from utils.folder_scanner import folder_listing
+    from utils.profile_transfer import export_profile, import_profile
+    from utils.thumbnails import get_thumbnail_cache
+
+    def cold():
+        folder_listing.invalidate()
+        album_index.invalidate()
+        if drop_caches:
+            drop_os_caches()
+
+    cold()
+    profiles = bench.measure("list_subfolders", "cold", lambda: storage.list_subfolders(storage_directory), len)
+    bench.measure("list_subfolders", "warm", lambda: storage.list_subfolders(storage_directory), len)
+    profiles = sorted(profiles)
+    albums = [(p, a) for p in profiles for a in sorted(files.list_album_upload_folders(storage_directory, p))]
+
+    def album_infos():
+        return sum(len(json.loads(files.get_album_files_info(storage_directory, p, a))) for p, a in albums)
+
+    cold()
+    bench.measure("get_album_files_info", "cold", album_infos, lambda n: n)
+    bench.measure("get_album_files_info", "warm", album_infos, lambda n: n)
+
+    sample = profiles[:sample_profiles]
+    images = []
+    for p in sample:
+        for root, _, names in os.walk(os.path.join(storage_directory, p)):
+            images += [os.path.join(root, n) for n in names if n.endswith(".jpg")]
+    cache = get_thumbnail_cache(storage_directory)
+    cache.clear()
+
+    def thumbnail_all():
+        for path in images:
+            cache.get_or_create(path)
+        return len(images)
+
+    if images:
+        cold()
+        image_bytes = sum(os.path.getsize(p) for p in images)
+        bench.measure("thumbnails", "cold", thumbnail_all, len(images), image_bytes)
+        bench.measure("thumbnails", "warm", thumbnail_all, len(images), image_bytes)
+
+    out_dir = tempfile.mkdtemp(prefix="bench-export-")
+    try:
+        profile_bytes = 0
+        for p in sample:
+            for root, _, names in os.walk(os.path.join(storage_directory, p)):
+                profile_bytes += sum(os.path.getsize(os.path.join(root, n)) for n in names)
+
+        def export_all():
+            for p in sample:
+                export_profile(storage_directory, p, os.path.join(out_dir, f"{p}.zip"))
+            return len(sample)
+
+        cold()
+        bench.measure("export_profile", "cold", export_all, len(sample), profile_bytes)
+        bench.measure("export_profile", "warm", export_all, len(sample), profile_bytes)
+
+        def import_all(suffix):
+            def go():
+                for p in sample:
+                    import_profile(storage_directory, os.path.join(out_dir, f"{p}.zip"), f".bench-{p}-{suffix}")
+                return len(sample)
+            return go
+
+        cold()
+        bench.measure("import_profile", "cold", import_all("cold"), len(sample), profile_bytes)
+        bench.measure("import_profile", "warm", import_all("warm"), len(sample), profile_bytes)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        for name in os.listdir(storage_directory):
+            if name.startswith(".bench-"):
+                shutil.rmtree(os.path.join(storage_directory, name), ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, results):
+    """Print the change in duration of every result against an earlier results file."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = {(r["name"], r["phase"]): r for r in json.load(f)["results"]}
+    for result in results:
+        before = old.get((result["name"], result["phase"]))
+        if before and before["seconds"]:
+            change = (result["seconds"] - before["seconds"]) / before["seconds"] * 100
+            print(f"{result['name']:<24} {result['phase']:<5} {before['seconds']:10.4f} s -> "
+                  f"{result['seconds']:10.4f} s  ({change:+.1f}%)", file=sys.stderr)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.benchmark",
+        description="Benchmark the storage, files, transfer and thumbnail layers on a synthetic storage tree."
+    )
+    parser.add_argument("--profiles", type=int, default=50)
+    parser.add_argument("--albums", type=int, default=3, help="albums per profile")
+    parser.add_argument("--files", type=int, default=40, help="files per album")
+    parser.add_argument("--image-kb", type=int, default=DEFAULT_SIZES_KB["image"])
+    parser.add_argument("--video-kb", type=int, default=DEFAULT_SIZES_KB["video"])
+    parser.add_argument("--doc-kb", type=int, default=DEFAULT_SIZES_KB["doc"])
+    parser.add_argument("--sample", type=int, default=3, help="profiles used for thumbnail, export and import runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--storage", default=None, help="benchmark an existing tree instead of generating one")
+    parser.add_argument("--keep", action="store_true", help="keep the generated tree")
+    parser.add_argument("--drop-caches", action="store_true", help="drop the OS page cache before cold runs (root only)")
+    parser.add_argument("--output", "-o", default="benchmark-results.json", help="results file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    bench = Benchmark()
+    generated = args.storage is None
+    storage_directory = args.storage or tempfile.mkdtemp(prefix="bench-storage-")
+    tree = {"storage": storage_directory}
+    try:
+        if generated:
+            sizes = {"image": args.image_kb, "video": args.video_kb, "doc": args.doc_kb}
+            count, total = bench.measure(
+                "generate_tree", "-", lambda: generate_tree(storage_directory, args.profiles, args.albums, args.files,
+                                                            sizes, args.seed),
+                lambda r: r[0]
+            )
+            tree.update(profiles=args.profiles, albums=args.albums, files=args.files, sizes_kb=sizes,
+                        file_count=count, total_bytes=total, seed=args.seed)
+        run(storage_directory, bench, args.sample, args.drop_caches)
+    finally:
+        if generated and not args.keep:
+            shutil.rmtree(storage_directory, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "tree": tree,
+        "results": bench.results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(args.compare, bench.results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
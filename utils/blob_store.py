@@ -0,0 +1,238 @@
+import os
+import sys
+import shutil
+import hashlib
+import threading
+from utils.fast_copy import copy_file
+
+BLOB_FOLDER = ".blobs"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed store under <storage_directory>/.blobs. Album entries
+    are hardlinks to a blob named after its SHA-256, so identical files share
+    their data. The filesystem link count is the reference count: a blob
+    whose only remaining link is the one in the store is unreferenced and is
+    removed by unlink() or gc(). Linked files share one inode, so album files
+    must be replaced rather than edited in place.
+    """
+
+    def __init__(self, storage_directory):
+        self.storage_directory = storage_directory
+        self.root = os.path.join(storage_directory, BLOB_FOLDER)
+        self._lock = threading.Lock()
+        self._by_inode = None  # (st_dev, st_ino) -> blob path
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def _inode_index(self):
+        if self._by_inode is None:
+            self._by_inode = {}
+            for path in self.iter_blobs():
+                st = os.stat(path)
+                self._by_inode[(st.st_dev, st.st_ino)] = path
+        return self._by_inode
+
+    def iter_blobs(self):
+        if not os.path.isdir(self.root):
+            return
+        for bucket in os.scandir(self.root):
+            if bucket.is_dir():
+                for entry in os.scandir(bucket.path):
+                    if entry.is_file() and not entry.name.endswith(".tmp"):
+                        yield entry.path
+
+    def _store(self, src_path, sha256):
+        """Make sure a blob for sha256 exists, copying src_path in if needed."""
+        blob = self.blob_path(sha256)
+        if os.path.exists(blob):
+            return blob
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp_path = f"{blob}.{threading.get_ident()}.tmp"
+        copy_file(src_path, tmp_path)
+        try:
+            # Never replace a blob another thread stored meanwhile: album
+            # entries may already link to its inode
+            os.link(tmp_path, blob)
+        except FileExistsError:
+            pass
+        except OSError:
+            # No hardlinks on this filesystem, so nothing links to the blob either
+            if not os.path.exists(blob):
+                os.replace(tmp_path, blob)
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        st = os.stat(blob)
+        with self._lock:
+            self._inode_index()[(st.st_dev, st.st_ino)] = blob
+        return blob
+
+    def link_into(self, src_path, dest_path, sha256=None):
+        """
+        Place src_path's content at dest_path as a link to its blob and return
+        the SHA-256. Falls back to a plain copy where hardlinks are unsupported.
+        An existing dest_path is replaced atomically, and the blob it linked
+        to is released only afterwards.
+        """
+        sha256 = sha256 or sha256_file(src_path)
+        try:
+            dest_st = os.stat(dest_path)
+        except OSError:
+            dest_st = None
+        if dest_st is not None:
+            try:
+                blob_st = os.stat(self.blob_path(sha256))
+            except OSError:
+                blob_st = None
+            if blob_st is not None and (blob_st.st_dev, blob_st.st_ino) == (dest_st.st_dev, dest_st.st_ino):
+                return sha256  # already a link to this content
+        old_blob = self._blob_for(dest_st) if dest_st is not None and dest_st.st_nlink > 1 else None
+
+        tmp_path = f"{dest_path}.{threading.get_ident()}.tmp"
+        for attempt in range(3):
+            blob = self._store(src_path, sha256)
+            try:
+                os.link(blob, tmp_path)
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+                # Released by another thread in the meantime; store it again
+            except OSError:
+                shutil.copy2(blob, tmp_path)
+                self.release_blob(blob)
+                break
+        try:
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        if old_blob is not None:
+            self.release_blob(old_blob)
+        return sha256
+
+    def adopt(self, path):
+        """Replace an existing album file with a link to its blob. Returns bytes saved."""
+        st = os.stat(path)
+        if st.st_nlink > 1 and (st.st_dev, st.st_ino) in self._inode_index():
+            return 0
+        sha256 = sha256_file(path)
+        existed = os.path.exists(self.blob_path(sha256))
+        tmp_path = path + ".dedup.tmp"
+        blob = self._store(path, sha256)
+        try:
+            os.link(blob, tmp_path)
+        except OSError:
+            self.release_blob(blob)
+            return 0
+        os.replace(tmp_path, path)
+        return st.st_size if existed else 0
+
+    def _blob_for(self, st):
+        with self._lock:
+            return self._inode_index().get((st.st_dev, st.st_ino))
+
+    def release_blob(self, blob):
+        """Delete blob if nothing links to it any more."""
+        try:
+            st = os.stat(blob)
+        except OSError:
+            return False
+        if st.st_nlink > 1:
+            return False
+        with self._lock:
+            self._inode_index().pop((st.st_dev, st.st_ino), None)
+        os.remove(blob)
+        return True
+
+    def unlink(self, path):
+        """Remove one album entry and free its blob if this was the last reference."""
+        st = os.stat(path)
+        blob = self._blob_for(st) if st.st_nlink > 1 else None
+        os.remove(path)
+        if blob:
+            self.release_blob(blob)
+
+    def unlink_tree(self, dir_path):
+        """Remove a folder of album entries, freeing blobs that become unreferenced."""
+        blobs = set()
+        for root, dirs, files in os.walk(dir_path):
+            for file in files:
+                st = os.stat(os.path.join(root, file))
+                if st.st_nlink > 1:
+                    blob = self._blob_for(st)
+                    if blob:
+                        blobs.add(blob)
+        shutil.rmtree(dir_path)
+        for blob in blobs:
+            self.release_blob(blob)
+
+    def gc(self):
+        """Remove every blob that is no longer referenced. Returns the number freed."""
+        return sum(1 for blob in list(self.iter_blobs()) if self.release_blob(blob))
+
+
+def get_blob_store(storage_directory, create=False):
+    """Return the blob store for storage_directory, or None if none exists and create is False."""
+    key = os.path.abspath(storage_directory)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if not create and not os.path.isdir(os.path.join(storage_directory, BLOB_FOLDER)):
+                return None
+            store = _stores[key] = BlobStore(storage_directory)
+        return store
+
+
+def main(argv=None):
+    import argparse
+    from utils.settings import load_settings
+
+    parser = argparse.ArgumentParser(prog="python -m utils.blob_store", description="Manage the deduplicated blob store.")
+    parser.add_argument("command", choices=["dedupe", "gc"])
+    parser.add_argument("--storage", default=None, help="storage directory (defaults to settings.json)")
+    args = parser.parse_args(argv)
+    storage_directory = args.storage or load_settings().get("storage_directory", "storage/")
+
+    if args.command == "dedupe":
+        from utils.storage import list_subfolders
+        store = get_blob_store(storage_directory, create=True)
+        saved = 0
+        for folder_name in list_subfolders(storage_directory):
+            profile_path = os.path.join(storage_directory, folder_name)
+            for root, dirs, files in os.walk(profile_path):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                if root == profile_path:
+                    continue  # data.json is edited in place and must stay a regular file
+                for file in files:
+                    saved += store.adopt(os.path.join(root, file))
+        print(f"Deduplicated; {saved} bytes saved.")
+    else:
+        store = get_blob_store(storage_directory)
+        freed = store.gc() if store else 0
+        print(f"Freed {freed} unreferenced blobs.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
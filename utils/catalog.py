@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import hashlib
+from contextlib import closing
+
+CATALOG_FILE = ".catalog.sqlite3"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY,
+    displayname TEXT,
+    realname TEXT,
+    phone_number TEXT,
+    address TEXT,
+    email TEXT,
+    social_medias TEXT,
+    notes TEXT,
+    data TEXT
+);
+CREATE TABLE IF NOT EXISTS albums (
+    profile TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (profile, path)
+);
+CREATE TABLE IF NOT EXISTS files (
+    profile TEXT NOT NULL,
+    album TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT,
+    size INTEGER,
+    mtime REAL,
+    sha256 TEXT,
+    PRIMARY KEY (profile, album, name)
+);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+"""
+
+PROFILE_COLUMNS = ("displayname", "realname", "phone_number", "address", "email", "social_medias", "notes")
+
+
+def catalog_path(storage_directory):
+    return os.path.join(storage_directory, CATALOG_FILE)
+
+
+def is_enabled(storage_directory):
+    return os.path.isfile(catalog_path(storage_directory))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _album_key(album_name):
+    return album_name.replace(os.sep, "/").strip("/")
+
+
+def _like_prefix(path):
+    escaped = path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "/%"
+
+
+def _column_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+class Catalog:
+    """Thin wrapper around the catalog database. Every method runs in one transaction."""
+
+    def __init__(self, storage_directory):
+        self.storage_directory = storage_directory
+        self.path = catalog_path(storage_directory)
+
+    def connect(self):
+        import sqlite3  # only needed once a catalog exists
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    # --- Writes -----------------------------------------------------------
+
+    def _put_profile(self, conn, folder_name, data):
+        values = [_column_value(data.get(column, "")) for column in PROFILE_COLUMNS]
+        conn.execute(
+            f"INSERT OR REPLACE INTO profiles (name, {', '.join(PROFILE_COLUMNS)}, data) "
+            f"VALUES (?, {', '.join('?' for _ in PROFILE_COLUMNS)}, ?)",
+            [folder_name, *values, json.dumps(data)]
+        )
+
+    def _put_file(self, conn, folder_name, album_name, file_path, sha256=None):
+        st = os.stat(file_path)
+        name = os.path.basename(file_path)
+        if sha256 is None:
+            row = conn.execute(
+                "SELECT size, mtime, sha256 FROM files WHERE profile = ? AND album = ? AND name = ?",
+                (folder_name, album_name, name)
+            ).fetchone()
+            if row and row[0] == st.st_size and row[1] == st.st_mtime:
+                sha256 = row[2]
+            else:
+                sha256 = file_sha256(file_path)
+        conn.execute(
+            "INSERT OR REPLACE INTO files (profile, album, name, type, size, mtime, sha256) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (folder_name, album_name, name, os.path.splitext(name)[1][1:], st.st_size, st.st_mtime, sha256)
+        )
+
+    def put_profile(self, folder_name, data):
+        with closing(self.connect()) as conn, conn:
+            self._put_profile(conn, folder_name, data)
+
+    def delete_profile(self, folder_name):
+        with closing(self.connect()) as conn, conn:
+            conn.execute("DELETE FROM profiles WHERE name = ?", (folder_name,))
+            conn.execute("DELETE FROM albums WHERE profile = ?", (folder_name,))
+            conn.execute("DELETE FROM files WHERE profile = ?", (folder_name,))
+
+    def put_album(self, folder_name, album_name):
+        album = _album_key(album_name)
+        with closing(self.connect()) as conn, conn:
+            parts = album.split("/")
+            for depth in range(1, len(parts) + 1):
+                conn.execute(
+                    "INSERT OR IGNORE INTO albums (profile, path) VALUES (?, ?)",
+                    (folder_name, "/".join(parts[:depth]))
+                )
+
+    def delete_album(self, folder_name, album_name):
+        album = _album_key(album_name)
+        prefix = _like_prefix(album)
+        with closing(self.connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM albums WHERE profile = ? AND (path = ? OR path LIKE ? ESCAPE '\\')",
+                (folder_name, album, prefix)
+            )
+            conn.execute(
+                "DELETE FROM files WHERE profile = ? AND (album = ? OR album LIKE ? ESCAPE '\\')",
+                (folder_name, album, prefix)
+            )
+
+    def put_file(self, folder_name, album_name, file_path, sha256=None):
+        with closing(self.connect()) as conn, conn:
+            self._put_file(conn, folder_name, _album_key(album_name), file_path, sha256)
+
+    def put_files(self, folder_name, records):
+        """Record many (album name, file path, sha256 or None) triples in one transaction."""
+        with closing(self.connect()) as conn, conn:
+            for album_name, file_path, sha256 in records:
+                album = _album_key(album_name)
+                parts = album.split("/")
+                for depth in range(1, len(parts) + 1):
+                    conn.execute(
+                        "INSERT OR IGNORE INTO albums (profile, path) VALUES (?, ?)",
+                        (folder_name, "/".join(parts[:depth]))
+                    )
+                self._put_file(conn, folder_name, album, file_path, sha256)
+
+    def delete_file(self, folder_name, album_name, filename):
+        with closing(self.connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM files WHERE profile = ? AND album = ? AND name = ?",
+                (folder_name, _album_key(album_name), filename)
+            )
+
+    def _known_hashes(self, conn, folder_name=None):
+        sql = "SELECT profile, album, name, size, mtime, sha256 FROM files"
+        rows = conn.execute(sql + " WHERE profile = ?", (folder_name,)) if folder_name else conn.execute(sql)
+        return {(row[0], row[1], row[2]): (row[3], row[4], row[5]) for row in rows}
+
+    def _index_profile(self, conn, folder_name, known):
+        from utils.storage import read_data_json
+
+        conn.execute("DELETE FROM profiles WHERE name = ?", (folder_name,))
+        conn.execute("DELETE FROM albums WHERE profile = ?", (folder_name,))
+        conn.execute("DELETE FROM files WHERE profile = ?", (folder_name,))
+        profile_path = os.path.join(self.storage_directory, folder_name)
+        self._put_profile(conn, folder_name, read_data_json(self.storage_directory, folder_name) or {})
+        for root, dirs, files in os.walk(profile_path):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            album = _album_key(os.path.relpath(root, profile_path))
+            if album == ".":
+                continue  # data.json and other profile-level files are not album files
+            conn.execute("INSERT OR IGNORE INTO albums (profile, path) VALUES (?, ?)", (folder_name, album))
+            for file in files:
+                if file.startswith("."):
+                    continue
+                file_path = os.path.join(root, file)
+                st = os.stat(file_path)
+                cached = known.get((folder_name, album, file))
+                sha256 = cached[2] if cached and cached[0] == st.st_size and cached[1] == st.st_mtime else None
+                self._put_file(conn, folder_name, album, file_path, sha256 or file_sha256(file_path))
+
+    def rebuild_profile(self, folder_name):
+        """Resync one profile from disk, e.g. after it was imported."""
+        with closing(self.connect()) as conn, conn:
+            self._index_profile(conn, folder_name, self._known_hashes(conn, folder_name))
+
+    def rebuild(self, progress=None):
+        """
+        Resync the whole catalog from disk in one transaction. Hashes of files
+        whose size and mtime did not change are reused.
+        """
+        from utils.storage import list_subfolders
+
+        with closing(self.connect()) as conn, conn:
+            known = self._known_hashes(conn)
+            conn.execute("DELETE FROM profiles")
+            conn.execute("DELETE FROM albums")
+            conn.execute("DELETE FROM files")
+            for folder_name in list_subfolders(self.storage_directory):
+                self._index_profile(conn, folder_name, known)
+                if progress:
+                    progress(folder_name)
+
+    # --- Queries ----------------------------------------------------------
+
+    def query(self, sql, params=()):
+        with closing(self.connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def profiles_with_albums(self):
+        return [row[0] for row in self.query("SELECT DISTINCT profile FROM albums ORDER BY profile")]
+
+    def bytes_per_profile(self):
+        return dict(self.query("SELECT profile, COALESCE(SUM(size), 0) FROM files GROUP BY profile ORDER BY profile"))
+
+    def duplicate_hashes(self):
+        return self.query(
+            "SELECT sha256, COUNT(*), SUM(size) FROM files WHERE sha256 IS NOT NULL "
+            "GROUP BY sha256 HAVING COUNT(*) > 1 ORDER BY SUM(size) DESC"
+        )
+
+
+def open_catalog(storage_directory, create=False):
+    """Return the Catalog for storage_directory, or None if it is not enabled."""
+    if not create and not is_enabled(storage_directory):
+        return None
+    return Catalog(storage_directory)
+
+
+# --- Hooks used by utils.storage and utils.files ---------------------------
+
+def record_profile(storage_directory, folder_name, data):
+    catalog = open_catalog(storage_directory)
+    if catalog:
+        catalog.put_profile(folder_name, data)
+
+
+def forget_profile(storage_directory, folder_name):
+    catalog = open_catalog(storage_directory)
+    if catalog:
+        catalog.delete_profile(folder_name)
+
+
+def resync_profile(storage_directory, folder_name):
+    catalog = open_catalog(storage_directory)
+    if catalog:
+        catalog.rebuild_profile(folder_name)
+
+
+def record_album(storage_directory, folder_name, album_name):
+    catalog = open_catalog(storage_directory)
+    if catalog:
+        catalog.put_album(folder_name, album_name)
+
+
+def forget_album(storage_directory, folder_name, album_name):
+    catalog = open_catalog(storage_directory)
+    if catalog:
+        catalog.delete_album(folder_name, album_name)
+
+
+def record_file(storage_directory, folder_name, album_name, file_path, sha256=None):
+    catalog = open_catalog(storage_directory)
+    if catalog:
+        catalog.put_file(folder_name, album_name, file_path, sha256)
+
+
+def record_files(storage_directory, folder_name, records):
+    catalog = open_catalog(storage_directory)
+    if catalog and records:
+        catalog.put_files(folder_name, records)
+
+
+def forget_file(storage_directory, folder_name, album_name, filename):
+    catalog = open_catalog(storage_directory)
+    if catalog:
+        catalog.delete_file(folder_name, album_name, filename)
+
+
+def main(argv=None):
+    import argparse
+    from utils.settings import load_settings
+
+    parser = argparse.ArgumentParser(prog="python -m utils.catalog", description="Manage the storage catalog.")
+    parser.add_argument("command", choices=["rebuild", "stats"])
+    parser.add_argument("--storage", default=None, help="storage directory (defaults to settings.json)")
+    args = parser.parse_args(argv)
+    storage_directory = args.storage or load_settings().get("storage_directory", "storage/")
+
+    if args.command == "rebuild":
+        catalog = open_catalog(storage_directory, create=True)
+        catalog.rebuild(progress=lambda name: print(f"indexed {name}"))
+        print(f"Catalog rebuilt at {catalog.path}")
+    else:
+        catalog = open_catalog(storage_directory)
+        if catalog is None:
+            print("Catalog not enabled; run 'rebuild' first.", file=sys.stderr)
+            return 1
+        for profile, total in catalog.bytes_per_profile().items():
+            print(f"{profile}\t{total}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
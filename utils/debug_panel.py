@@ -0,0 +1,74 @@
+import tkinter as tk
+
+from utils.instrumentation import get_recorder
+
+REFRESH_MS = 1000
+
+
+class DebugPanel(tk.Toplevel):
+    """
+    Live view of the instrumentation counters and span timings, refreshed
+    every second while open. Reset clears them; Dump appends a summary line
+    to the instrumentation log.
+    """
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Debug")
+        self.geometry("720x360")
+
+        button_bar = tk.Frame(self)
+        button_bar.pack(side="bottom", fill="x", padx=6, pady=6)
+        tk.Button(button_bar, text="Reset", command=self.reset).pack(side="left", padx=2)
+        tk.Button(button_bar, text="Dump", command=self.dump).pack(side="left", padx=2)
+        self.status_var = tk.StringVar(value="")
+        tk.Label(button_bar, textvariable=self.status_var, anchor="w").pack(side="left", padx=6)
+
+        self.text = tk.Text(self, wrap="none", font=("Courier", 9))
+        self.text.pack(fill="both", expand=True, padx=6, pady=(6, 0))
+        self._job = None
+        self.refresh()
+
+    def refresh(self):
+        recorder = get_recorder()
+        lines = []
+        if recorder is None:
+            lines.append("Instrumentation is off.")
+        else:
+            snapshot = recorder.snapshot()
+            lines.append(f"{'span':<32}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+            for name, s in sorted(snapshot["spans"].items()):
+                lines.append(f"{name:<32}{s['count']:>8}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}"
+                             f"{s['p95_ms']:>10.2f}{s['max_ms']:>10.2f}")
+            if snapshot["counters"]:
+                lines.append("")
+                lines.append(f"{'counter':<32}{'value':>8}")
+                for name, value in sorted(snapshot["counters"].items()):
+                    lines.append(f"{name:<32}{value:>8}")
+        position = self.text.yview()[0]
+        self.text.config(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(lines))
+        self.text.config(state="disabled")
+        self.text.yview_moveto(position)
+        self._job = self.after(REFRESH_MS, self.refresh)
+
+    def reset(self):
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.reset()
+        self.status_var.set("Reset.")
+
+    def dump(self):
+        recorder = get_recorder()
+        if recorder is None:
+            return
+        recorder.dump()
+        self.status_var.set(f"Summary written to {recorder.log_path}." if recorder.log_path
+                            else "No log file configured.")
+
+    def destroy(self):
+        if self._job is not None:
+            self.after_cancel(self._job)
+            self._job = None
+        super().destroy()
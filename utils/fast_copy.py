@@ -0,0 +1,96 @@
+import os
+import shutil
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class CopyCancelled(Exception):
+    """Raised when a copy is cancelled through its cancel event."""
+
+
+def _copy_file_range(src, dest, size, on_chunk, check):
+    copied = 0
+    while copied < size:
+        check()
+        n = os.copy_file_range(src.fileno(), dest.fileno(), min(CHUNK_SIZE, size - copied))
+        if n == 0:
+            break
+        copied += n
+        on_chunk(n)
+    return copied
+
+
+def _sendfile(src, dest, size, on_chunk, check):
+    copied = 0
+    while copied < size:
+        check()
+        n = os.sendfile(dest.fileno(), src.fileno(), copied, min(CHUNK_SIZE, size - copied))
+        if n == 0:
+            break
+        copied += n
+        on_chunk(n)
+    return copied
+
+
+def _read_write(src, dest, on_chunk, check):
+    copied = 0
+    buf = bytearray(min(CHUNK_SIZE, 1024 * 1024))
+    view = memoryview(buf)
+    while True:
+        check()
+        n = src.readinto(buf)
+        if not n:
+            break
+        dest.write(view[:n])
+        copied += n
+        on_chunk(n)
+    return copied
+
+
+def copy_file(src_path, dest_path, progress=None, cancel_event=None):
+    """
+    Copy src_path to dest_path with copy_file_range or sendfile where the OS
+    supports them (the data never passes through Python), falling back to a
+    fixed-size buffer otherwise, so memory use does not depend on file size.
+    progress(n) is called with the size of every copied chunk. Metadata is
+    copied as with shutil.copy2. A cancelled copy removes the partial file.
+    """
+    copied_total = 0
+
+    def check():
+        if cancel_event is not None and cancel_event.is_set():
+            raise CopyCancelled("Copy cancelled.")
+
+    def on_chunk(n):
+        nonlocal copied_total
+        copied_total += n
+        if progress:
+            progress(n)
+
+    size = os.path.getsize(src_path)
+    fast_paths = []
+    if hasattr(os, "copy_file_range"):
+        fast_paths.append(_copy_file_range)
+    if hasattr(os, "sendfile"):
+        fast_paths.append(_sendfile)
+    try:
+        with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+            for fast_path in fast_paths:
+                try:
+                    fast_path(src, dest, size, on_chunk, check)
+                    break
+                except OSError:
+                    if copied_total:
+                        raise  # failed midway, not merely unsupported
+                    # e.g. EXDEV, ENOSYS or ENOTSOCK: try the next method
+            src.seek(copied_total)
+            dest.seek(copied_total)
+            _read_write(src, dest, on_chunk, check)
+        shutil.copystat(src_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        raise
+    return dest_path
@@ -0,0 +1,97 @@
+import os
+import shutil
+
+from utils.fast_copy import copy_file, CopyCancelled
+from utils.zip_export import ZipExporter, ExportCancelled, DEFAULT_WORKERS
+from utils.instrumentation import span
+
+
+def album_members(storage_directory, folder_name, album_name):
+    """Return (absolute path, path relative to the album) for every file in an album, sub-folders included."""
+    album_path = os.path.join(storage_directory, folder_name, album_name)
+    if not os.path.isdir(album_path):
+        raise FileNotFoundError(f"Album folder '{album_path}' not found.")
+    members = []
+    for root, dirs, files in os.walk(album_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for file in sorted(files):
+            if file.startswith("."):
+                continue
+            abs_path = os.path.join(root, file)
+            members.append((abs_path, os.path.relpath(abs_path, album_path)))
+    return members
+
+
+def copy_members(members, dest_dir, progress=None, cancel_event=None):
+    """
+    Copy members, (absolute path, relative path) pairs, below dest_dir.
+    Files go through fast_copy, so each is copied in the kernel or through a
+    fixed-size buffer and memory use does not grow with file size.
+    progress(done_bytes, total_bytes, done_files, total_files) is called per
+    chunk; setting cancel_event raises ExportCancelled.
+    """
+    total_bytes = sum(os.path.getsize(path) for path, _ in members)
+    done_bytes = 0
+    done_files = 0
+
+    def on_chunk(n):
+        nonlocal done_bytes
+        done_bytes += n
+        if progress:
+            progress(done_bytes, total_bytes, done_files, len(members))
+
+    if progress:
+        progress(0, total_bytes, 0, len(members))
+    try:
+        for path, rel_path in members:
+            dest_path = os.path.join(dest_dir, rel_path)
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            copy_file(path, dest_path, progress=on_chunk, cancel_event=cancel_event)
+            done_files += 1
+            if progress:
+                progress(done_bytes, total_bytes, done_files, len(members))
+    except CopyCancelled:
+        raise ExportCancelled("Export cancelled.")
+    return dest_dir
+
+
+def export_file(file_path, export_path, progress=None, cancel_event=None):
+    """
+    Copy one file to export_path. The copy is written under a temporary name
+    and renamed into place, so a cancelled or failed export never leaves a
+    truncated file where the user asked for it.
+    """
+    tmp_path = export_path + ".part"
+    with span("transfer.export_file", bytes=os.path.getsize(file_path)):
+        copy_members([(file_path, os.path.basename(tmp_path))], os.path.dirname(os.path.abspath(tmp_path)),
+                     progress=progress, cancel_event=cancel_event)
+    os.replace(tmp_path, export_path)
+    return export_path
+
+
+def export_album(storage_directory, folder_name, album_name, export_path, as_zip=False, progress=None,
+                 cancel_event=None, workers=DEFAULT_WORKERS):
+    """
+    Export an album (album_name may be a path like "album1/subfolder1") to
+    export_path, either as a zip archive or as a plain folder that must not
+    exist yet. Like the profile export, the result appears only once
+    complete; progress and cancel_event work as for copy_members.
+    """
+    members = album_members(storage_directory, folder_name, album_name)
+    if as_zip:
+        exporter = ZipExporter(export_path, progress=progress, cancel_event=cancel_event, workers=workers)
+        with span("transfer.export_album", profile=folder_name, album=album_name, files=len(members), zip=True):
+            return exporter.write_all(members)
+    if os.path.exists(export_path):
+        raise FileExistsError(f"Destination folder '{export_path}' already exists.")
+    tmp_dir = export_path.rstrip(os.sep) + ".part"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        os.makedirs(tmp_dir)
+        with span("transfer.export_album", profile=folder_name, album=album_name, files=len(members), zip=False):
+            copy_members(members, tmp_dir, progress=progress, cancel_event=cancel_event)
+        os.rename(tmp_dir, export_path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return export_path
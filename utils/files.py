@@ -1,57 +1,207 @@
 import os
 import json
 import shutil
+import threading
+from utils.fast_copy import copy_file, CopyCancelled
+from utils.thumbnails import invalidate, invalidate_tree
+from utils.album_index import album_index
+from utils.folder_scanner import folder_listing
+from utils import catalog, album_tree
+from utils.blob_store import get_blob_store
+from utils.instrumentation import span
+
+DEFAULT_INGEST_WORKERS = 4
 
 def create_album_upload_folder(storage_directory, folder_name, album_name):
     album_path = os.path.join(storage_directory, folder_name, album_name)
-    os.makedirs(album_path, exist_ok=True)
+    if not os.path.isdir(album_path):
+        os.makedirs(album_path)
+        album_tree.forget_tree(storage_directory, album_path)
+    catalog.record_album(storage_directory, folder_name, album_name)
     return album_path
 
 def list_album_upload_folders(storage_directory, folder_name):
-    uploads_path = os.path.join(storage_directory, folder_name)
-    if not os.path.isdir(uploads_path):
+    # Cached until the profile folder's mtime changes
+    return folder_listing.list(os.path.join(storage_directory, folder_name))
+
+def list_album_entries(storage_directory, folder_name, album_name):
+    """
+    Return the album's files and sub-folders as AlbumEntry records, sorted by
+    name. Listings are cached per directory and reused while its mtime is unchanged.
+    """
+    album_path = os.path.join(storage_directory, folder_name, album_name)
+    if not os.path.isdir(album_path):
         return []
-    return [
-        name for name in os.listdir(uploads_path)
-        if os.path.isdir(os.path.join(uploads_path, name))
-    ]
+    with span("files.list_album_entries", profile=folder_name, album=album_name) as timing:
+        entries = album_index.list(album_path)
+        timing.set("entries", len(entries))
+    return entries
 
 def get_album_files_info(storage_directory, folder_name, album_name):
+    with span("files.get_album_files_info", profile=folder_name, album=album_name):
+        entries = list_album_entries(storage_directory, folder_name, album_name)
+        return json.dumps([entry.to_dict() for entry in entries], indent=4)
+
+def _place_file(storage_directory, album_path, src_path, dest_name, dedup, progress=None, cancel_event=None):
+    """Copy (or blob-link) one file into album_path; returns (dest path, sha256 or None)."""
+    os.makedirs(album_path, exist_ok=True)
+    dest_path = os.path.join(album_path, dest_name)
+    sha256 = None
+    if dedup:
+        sha256 = get_blob_store(storage_directory, create=True).link_into(src_path, dest_path)
+        if progress:
+            progress(os.path.getsize(dest_path))
+    else:
+        store = get_blob_store(storage_directory)
+        if store is not None and os.path.exists(dest_path):
+            store.unlink(dest_path)  # never overwrite shared blob data in place
+        copy_file(src_path, dest_path, progress=progress, cancel_event=cancel_event)
+    invalidate(storage_directory, dest_path)
+    album_index.refresh_entry(album_path, dest_name)
+    album_tree.record_file(storage_directory, dest_path)
+    return dest_path, sha256
+
+def add_file_to_album(storage_directory, folder_name, album_name, src_path, dest_name=None, dedup=False):
+    """
+    Copy src_path into the album and return the destination path. With dedup,
+    the album entry is a hardlink into the content-addressed blob store.
+    """
     album_path = os.path.join(storage_directory, folder_name, album_name)
-    if not os.path.isdir(album_path):
-        return json.dumps([])
-
-    files_info = []
-    for filename in os.listdir(album_path):
-        file_path = os.path.join(album_path, filename)
-        if os.path.isfile(file_path):
-            file_info = {
-                "name": filename,
-                "type": os.path.splitext(filename)[1][1:],  # extension without dot
-                "size": os.path.getsize(file_path),
-                "is_folder": False
-            }
-            files_info.append(file_info)
-        elif os.path.isdir(file_path):
-            folder_info = {
-                "name": filename,
-                "type": "folder",
-                "size": None,
-                "is_folder": True
-            }
-            files_info.append(folder_info)
-    return json.dumps(files_info, indent=4)
+    dest_name = dest_name or os.path.basename(src_path)
+    dest_path, sha256 = _place_file(storage_directory, album_path, src_path, dest_name, dedup)
+    catalog.record_file(storage_directory, folder_name, album_name, dest_path, sha256)
+    return dest_path
+
+def plan_ingest(sources):
+    """
+    Expand files and directory trees into (source path, relative destination)
+    pairs. Directory trees keep their structure as nested album folders;
+    hidden files and folders are skipped.
+    """
+    plan = []
+    for source in sources:
+        if os.path.isdir(source):
+            base = os.path.dirname(os.path.abspath(source).rstrip(os.sep))
+            for root, dirs, files in os.walk(source):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for file in sorted(files):
+                    if not file.startswith("."):
+                        abs_path = os.path.join(root, file)
+                        plan.append((abs_path, os.path.relpath(os.path.abspath(abs_path), base)))
+        elif os.path.isfile(source):
+            plan.append((source, os.path.basename(source)))
+    return plan
+
+def ingest_files(storage_directory, folder_name, album_name, sources, dedup=False, workers=DEFAULT_INGEST_WORKERS,
+                 progress=None, cancel_event=None):
+    """
+    Bulk-copy files and directory trees into an album on a thread pool.
+    progress(done_bytes, total_bytes, done_files, total_files) reports the
+    aggregate; setting cancel_event stops remaining copies. Returns a list
+    of (source path, error) for the files that failed. A KeyboardInterrupt
+    cancels the copies still queued or running before it propagates.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if cancel_event is None:
+        cancel_event = threading.Event()
+    plan = plan_ingest(sources)
+    album_path = os.path.join(storage_directory, folder_name, album_name)
+    total_bytes = sum(os.path.getsize(src) for src, _ in plan)
+    state = {"bytes": 0, "files": 0}
+    lock = threading.Lock()
+    placed = []
+    failures = []
+
+    def report():
+        if progress:
+            progress(state["bytes"], total_bytes, state["files"], len(plan))
+
+    def on_chunk(n):
+        with lock:
+            state["bytes"] += n
+            report()
+
+    def place(src_path, rel_dest):
+        if cancel_event.is_set():
+            raise CopyCancelled("Upload cancelled.")
+        rel_dir, dest_name = os.path.split(rel_dest)
+        dest_dir = os.path.join(album_path, rel_dir)
+        dest_path, sha256 = _place_file(storage_directory, dest_dir, src_path, dest_name, dedup, on_chunk, cancel_event)
+        with lock:
+            state["files"] += 1
+            placed.append((os.path.join(album_name, rel_dir), dest_path, sha256))
+            report()
+
+    report()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(place, src, rel): src for src, rel in plan}
+            try:
+                for future, src in futures.items():
+                    try:
+                        future.result()
+                    except CopyCancelled:
+                        pass
+                    except Exception as e:
+                        failures.append((src, e))
+            except KeyboardInterrupt:
+                # Leaving the with block waits for the pool: make that quick
+                cancel_event.set()
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        catalog.record_files(storage_directory, folder_name, placed)
+    return failures
+
+def _album_location(storage_directory, file_path):
+    """Split an album file's path into (profile, album path, filename), or None if it is not in an album."""
+    rel_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(storage_directory))
+    parts = rel_path.split(os.sep)
+    if len(parts) < 3 or parts[0] == os.pardir:
+        return None
+    return parts[0], "/".join(parts[1:-1]), parts[-1]
+
+def remove_file(storage_directory, file_path):
+    """
+    Delete an album file, releasing its blob when it was the last reference,
+    and drop it from the thumbnail cache, the album listing and the catalog.
+    """
+    invalidate(storage_directory, file_path)
+    store = get_blob_store(storage_directory)
+    if store is not None:
+        store.unlink(file_path)
+    else:
+        os.remove(file_path)
+    album_index.refresh_entry(os.path.dirname(file_path), os.path.basename(file_path))
+    album_tree.record_file(storage_directory, file_path)
+    location = _album_location(storage_directory, file_path)
+    if location is not None:
+        catalog.forget_file(storage_directory, *location)
+
+def remove_tree(storage_directory, dir_path):
+    """Delete a folder of album files, releasing blobs that become unreferenced."""
+    store = get_blob_store(storage_directory)
+    if store is not None:
+        store.unlink_tree(dir_path)
+    else:
+        shutil.rmtree(dir_path)
+    album_tree.forget_tree(storage_directory, dir_path)
 
 def delete_album_upload_folder(storage_directory, folder_name, album_name):
     album_path = os.path.join(storage_directory, folder_name, album_name)
     if os.path.isdir(album_path):
-        shutil.rmtree(album_path)
+        invalidate_tree(storage_directory, album_path)
+        remove_tree(storage_directory, album_path)
+        album_index.invalidate(album_path)
+        catalog.forget_album(storage_directory, folder_name, album_name)
         return True
     return False
 
 def delete_file_in_album(storage_directory, folder_name, album_name, filename):
     file_path = os.path.join(storage_directory, folder_name, album_name, filename)
     if os.path.isfile(file_path):
-        os.remove(file_path)
+        remove_file(storage_directory, file_path)
         return True
     return False
\ No newline at end of file
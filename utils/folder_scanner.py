@@ -0,0 +1,184 @@
+import os
+import time
+import threading
+import traceback
+
+from utils.album_index import RACY_WINDOW_NS
+
+# Names delivered per incremental update while a large directory is scanned
+BATCH_SIZE = 500
+
+
+class FolderListing:
+    """
+    Cache of the sub-folder names of a directory (profiles under the storage
+    directory, albums under a profile), keyed on the directory's mtime. An
+    unchanged directory costs one stat. A changed one is re-read with
+    scandir, whose entry types come from the directory itself, so no
+    per-entry stat is needed on filesystems that report them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listings = {}  # abs path -> (dir mtime_ns, scan time ns, [names])
+
+    def cached(self, dir_path):
+        """Return the cached names if they are still current, else None."""
+        key = os.path.abspath(dir_path)
+        try:
+            dir_mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            self.invalidate(key)
+            return []
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached is not None:
+            cached_mtime, scanned_at, names = cached
+            if cached_mtime == dir_mtime and scanned_at - dir_mtime > RACY_WINDOW_NS:
+                return list(names)
+        return None
+
+    def scan(self, dir_path, on_batch=None, cancel_event=None):
+        """
+        Re-read dir_path and return its sub-folder names, calling
+        on_batch(names so far) every BATCH_SIZE names. Returns None if
+        cancel_event was set before the scan finished.
+        """
+        key = os.path.abspath(dir_path)
+        try:
+            dir_mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            self.invalidate(key)
+            return []
+        scanned_at = time.time_ns()
+        names = []
+        with os.scandir(key) as it:
+            for entry in it:
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if not entry.is_dir():
+                        continue
+                except OSError:
+                    continue  # removed while listing
+                names.append(entry.name)
+                if on_batch is not None and len(names) % BATCH_SIZE == 0:
+                    on_batch(list(names))
+        with self._lock:
+            self._listings[key] = (dir_mtime, scanned_at, names)
+        return list(names)
+
+    def list(self, dir_path):
+        """Return the sub-folder names of dir_path, from the cache when it is current."""
+        if not os.path.isdir(dir_path):
+            return []
+        names = self.cached(dir_path)
+        return names if names is not None else self.scan(dir_path)
+
+    def invalidate(self, dir_path=None):
+        with self._lock:
+            if dir_path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(os.path.abspath(dir_path), None)
+
+
+folder_listing = FolderListing()
+
+
+class BackgroundScanner:
+    """
+    Lists directories on a worker thread and hands the names back to the Tk
+    thread through master.after, in batches while the scan is running. Each
+    request belongs to a channel (e.g. "profiles" or "albums"); a newer
+    request on the same channel cancels the older one, so only the latest
+    listing ever reaches the widgets.
+    """
+
+    def __init__(self, master, listing=folder_listing):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.master = master
+        self.listing = listing
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="folder-scan")
+        self._lock = threading.Lock()
+        self._current = {}  # channel -> cancel event of the latest request
+
+    def _begin(self, channel):
+        cancel_event = threading.Event()
+        if channel is None:
+            return cancel_event
+        with self._lock:
+            previous = self._current.get(channel)
+            if previous is not None:
+                previous.set()
+            self._current[channel] = cancel_event
+        return cancel_event
+
+    def request(self, channel, dir_path, on_batch, on_done):
+        """
+        List dir_path's sub-folders. on_batch(names so far) may be called
+        several times during a long scan; on_done(names) is called once at
+        the end. Both run on the Tk thread.
+        """
+        cancel_event = self._begin(channel)
+        return self._executor.submit(self._run, dir_path, cancel_event, on_batch, on_done)
+
+    def submit(self, channel, job, on_done, on_error=None):
+        """
+        Call job() on the worker thread, after any listing already queued,
+        and on_done(result) on the Tk thread. If job() raises, on_error(exc)
+        (default: print the traceback) runs on the Tk thread first and
+        on_done gets None. With channel None the job is never superseded by
+        a newer one.
+        """
+        cancel_event = self._begin(channel)
+        return self._executor.submit(self._run_job, job, cancel_event, on_done, on_error or self._report)
+
+    def _run(self, dir_path, cancel_event, on_batch, on_done):
+        if cancel_event.is_set():
+            return
+        try:
+            if not os.path.isdir(dir_path):
+                names = []
+            else:
+                names = self.listing.cached(dir_path)
+                if names is None:
+                    names = self.listing.scan(
+                        dir_path, lambda batch: self._deliver(cancel_event, on_batch, batch), cancel_event
+                    )
+        except OSError:
+            names = []
+        if names is not None:
+            self._deliver(cancel_event, on_done, names)
+
+    def _run_job(self, job, cancel_event, on_done, on_error):
+        if cancel_event.is_set():
+            return
+        try:
+            result = job()
+        except Exception as e:
+            self._deliver(cancel_event, on_error, e)
+            result = None
+        self._deliver(cancel_event, on_done, result)
+
+    @staticmethod
+    def _report(error):
+        traceback.print_exception(type(error), error, error.__traceback__)
+
+    def _deliver(self, cancel_event, callback, names):
+        def deliver():
+            if not cancel_event.is_set():
+                callback(names)
+        try:
+            self.master.after(0, deliver)
+        except RuntimeError:
+            pass  # main loop is gone
+
+    def shutdown(self):
+        with self._lock:
+            for cancel_event in self._current.values():
+                cancel_event.set()
+        self._executor.shutdown(wait=False)
@@ -1,13 +1,19 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk, filedialog
 import os
-import shutil
-import json
-from utils.settings import load_settings
-from utils.profile_transfer import export_profile, import_profile  # <-- Add this import
+from utils.progress_dialog import ProgressDialog
+from utils.instrumentation import span, enabled as instrumentation_enabled
 import threading
 
-settings = load_settings()
+IMAGE_EXTS = {"jpg", "jpeg", "png", "gif", "bmp", "webp"}
+VIDEO_EXTS = {"mp4", "avi", "mov", "wmv", "webm"}
+KIND_ORDER = {"folder": 0, "image": 1, "video": 2, "other": 3}
+
+
+def album_entry_order(entry):
+    # Tiles as folders, images, videos, then the other files listed below
+    return (KIND_ORDER[entry["kind"]], entry["name"].lower())
+
 
 class DocumenterApp:
     def __init__(self, master, settings, storage_utils=None, files_utils=None):
@@ -27,10 +33,146 @@ class DocumenterApp:
         self.selected_folder = tk.StringVar(value="")  # Start blank
         self.selected_album = tk.StringVar(value="")   # Start blank
         self.profile_data = {}
+        self.thumbnail_loader = None
+        self.album_grid = None
+        self.all_folders = []
+        self.search_index = None
+        self.folder_scanner = None
+        self.watcher = None
+        self.shown_album = None  # (folder, album) currently in the album grid
+        self.debug_panel = None
 
         self.create_widgets()
+        # Scan storage only once the window is on screen: the timer fires on
+        # the first pass of the main loop and the idle callback after the
+        # initial redraw
+        self.master.after(0, lambda: self.master.after_idle(self.initial_scan))
+
+    def initial_scan(self):
         self.refresh_storage_folders()
         self.refresh_albums()
+        self.start_watcher()
+
+    # --- Live updates from the storage watcher ---------------------------
+
+    def start_watcher(self):
+        """Watch the storage directory for changes made by other processes or workstations."""
+        backend = self.settings.get("watch_storage", "auto")
+        if not backend or backend == "off":
+            return
+        from utils.watcher import start_watcher, DEFAULT_POLL_INTERVAL
+
+        storage_dir = self.settings.get("storage_directory", "storage/")
+        interval = float(self.settings.get("watch_poll_interval", DEFAULT_POLL_INTERVAL))
+
+        def on_events(events):
+            # Called on the watcher thread
+            try:
+                self.master.after(0, lambda: self.apply_watch_events(events))
+            except RuntimeError:
+                pass  # main loop is gone
+        self.watcher = start_watcher(storage_dir, on_events, backend=backend, interval=interval)
+
+    def apply_watch_events(self, events):
+        """Apply a batch of watcher events to the open views without rescanning."""
+        from utils.watcher import ADDED, REMOVED, RESCAN
+        from utils import album_tree
+
+        storage_dir = self.settings.get("storage_directory", "storage/")
+        folder = self.selected_folder.get()
+        changed_profiles = set()
+        albums = list(self.album_dropdown["values"])
+        albums_changed = False
+        album_changes = {}  # name in the shown album -> last event kind
+        for event in events:
+            if event.kind == RESCAN:
+                self.rescan_views()
+                return
+            if event.scope == "profile":
+                if event.kind == REMOVED:
+                    album_tree.forget_tree(storage_dir, event.path)
+                if event.kind == ADDED and event.profile not in self.all_folders:
+                    self.all_folders.append(event.profile)
+                elif event.kind == REMOVED and event.profile in self.all_folders:
+                    self.all_folders.remove(event.profile)
+                changed_profiles.add(event.profile)
+                continue
+            if event.scope == "album":
+                album_tree.forget_tree(storage_dir, event.path)
+                parent, name = os.path.split(event.album)
+                if event.profile == folder and not parent:
+                    if event.kind == ADDED and name not in albums:
+                        albums.append(name)
+                        albums_changed = True
+                    elif event.kind == REMOVED and name in albums:
+                        albums.remove(name)
+                        albums_changed = True
+            else:
+                album_tree.record_file(storage_dir, event.path)
+                parent, name = event.album, event.name
+            shown = self.shown_album
+            if shown is None or event.profile != shown[0]:
+                continue
+            if shown[1] == parent:
+                album_changes[name] = event.kind
+            elif event.scope == "album" and event.kind == REMOVED and (
+                    shown[1] == event.album or shown[1].startswith(event.album + os.sep)):
+                # The shown album (or a folder above it) was deleted
+                self.album_grid.set_entries([])
+                self.album_files_label.config(text=f"Album Files: {shown[1]} (removed)")
+                self.shown_album = None
+                album_changes = {}
+
+        if changed_profiles:
+            if self.search_index is not None:
+                # Only the profiles that changed are read again; these
+                # updates must all run, so they are never superseded
+                names = sorted(changed_profiles)
+                self.update_search_index(lambda index: index.refresh_profiles(names), channel=None)
+            self.apply_profile_search()
+        if albums_changed:
+            self.album_dropdown["values"] = albums
+        if album_changes:
+            self.apply_album_changes(album_changes)
+
+    def rescan_views(self):
+        """Re-list everything shown after the watcher lost track, keeping the selection."""
+        from utils.album_tree import get_album_tree
+
+        storage_dir = self.settings.get("storage_directory", "storage/")
+        get_album_tree(storage_dir).refresh()
+        folder = self.selected_folder.get()
+        scanner = self.get_folder_scanner()
+        scanner.request("profiles", storage_dir, lambda folders: None, self.set_all_folders)
+        if folder:
+            def on_albums(albums):
+                if self.selected_folder.get() == folder:
+                    self.album_dropdown["values"] = albums
+            scanner.request("albums", os.path.join(storage_dir, folder), on_albums, on_albums)
+        if self.shown_album is not None:
+            self.load_album(*self.shown_album)
+
+    def apply_album_changes(self, changes):
+        """Update the album grid for {name: event kind} without listing the album again."""
+        from utils.album_index import AlbumEntry, album_index
+        from utils.watcher import REMOVED, MODIFIED
+
+        storage_dir = self.settings.get("storage_directory", "storage/")
+        folder, album = self.shown_album
+        album_dir = os.path.join(storage_dir, folder, album)
+        entries = {entry["name"]: entry for entry in self.album_grid.entries}
+        modified = []
+        for name, kind in changes.items():
+            album_index.refresh_entry(album_dir, name)
+            info = None if kind == REMOVED else AlbumEntry.from_path(os.path.join(album_dir, name))
+            if info is None:
+                entries.pop(name, None)
+                continue
+            if kind == MODIFIED and name in entries:
+                modified.append(entries[name]["path"])
+            entries[name] = self.make_album_entry(album_dir, info)
+        self.album_grid.update_entries(sorted(entries.values(), key=album_entry_order), changed=modified)
+        self.show_album_stats()
 
     def create_widgets(self):
         # --- Button Bar ---
@@ -48,6 +190,14 @@ class DocumenterApp:
         self.folder_dropdown.pack(side="left", padx=2)
         self.folder_dropdown.bind("<<ComboboxSelected>>", lambda e: [self.load_profile(), self.refresh_albums()])
 
+        # Profile search (filters the storage folder dropdown)
+        tk.Label(button_bar, text="Search:").pack(side="left", padx=(6, 0))
+        self.search_var = tk.StringVar(value="")
+        self.search_entry = tk.Entry(button_bar, textvariable=self.search_var, width=18)
+        self.search_entry.pack(side="left", padx=2)
+        self.search_entry.bind("<KeyRelease>", lambda e: self.schedule_profile_search())
+        self.search_job = None
+
         tk.Button(button_bar, text="New", command=self.new_storage_folder).pack(side="left", padx=2)
         tk.Button(button_bar, text="Load", command=self.load_profile).pack(side="left", padx=2)
         tk.Button(button_bar, text="Save", command=self.save_profile).pack(side="left", padx=2)
@@ -55,6 +205,7 @@ class DocumenterApp:
         # --- Export and Import buttons ---
         tk.Button(button_bar, text="Export", command=self.export_profile_gui).pack(side="left", padx=2)
         tk.Button(button_bar, text="Import", command=self.import_profile_gui).pack(side="left", padx=2)
+        tk.Button(button_bar, text="Duplicates", command=self.find_duplicates_gui).pack(side="left", padx=2)
 
         # Albums dropdown
         tk.Label(button_bar, text="Albums:").pack(side="left", padx=(20,2))
@@ -73,6 +224,8 @@ class DocumenterApp:
 
         # About button
         tk.Button(button_bar, text="About", command=self.show_about).pack(side="right", padx=2)
+        if instrumentation_enabled():
+            tk.Button(button_bar, text="Debug", command=self.show_debug_panel).pack(side="right", padx=2)
 
         # --- Separator Line ---
         separator = tk.Frame(self.master, height=2, bg="black")
@@ -131,36 +284,97 @@ class DocumenterApp:
         # --- Album controls and info in right area ---
         self.album_controls = tk.Frame(self.album_area)
         self.album_controls.pack(fill="x", pady=(0, 10))
-        self.upload_btn = tk.Button(self.album_controls, text="Upload File", command=self.upload_file_to_album)
-        self.upload_btn.pack(anchor="w", pady=2)
+        self.upload_btn = tk.Button(self.album_controls, text="Upload Files", command=self.upload_file_to_album)
+        self.upload_btn.pack(side="left", anchor="w", pady=2)
+        tk.Button(self.album_controls, text="Upload Folder", command=self.upload_folder_to_album).pack(side="left", padx=4, pady=2)
+        tk.Button(self.album_controls, text="Export Album", command=self.export_album_gui).pack(side="left", padx=4, pady=2)
+        tk.Button(self.album_controls, text="Up", command=self.open_parent_album).pack(side="left", padx=4, pady=2)
 
         self.album_files_label = tk.Label(self.album_area, text="Album Files:")
         self.album_files_label.pack(anchor="nw", pady=(10, 0))
         self.album_files_list = tk.Listbox(self.album_area, width=50)
         self.album_files_list.pack(fill="both", expand=True, padx=5, pady=5)
 
+    def get_folder_scanner(self):
+        """Return the background folder scanner, creating it on first use."""
+        if self.folder_scanner is None:
+            from utils.folder_scanner import BackgroundScanner
+            self.folder_scanner = BackgroundScanner(self.master)
+        return self.folder_scanner
+
     def refresh_storage_folders(self):
         storage_dir = self.settings.get("storage_directory", "storage/")
-        folders = self.storage_utils.list_subfolders(storage_dir)
-        self.folder_dropdown["values"] = folders
         # Do not auto-select a folder
         self.selected_folder.set("")
 
+        def on_batch(folders):
+            # Fill the dropdown while a large storage directory is still being
+            # read; searching waits for the complete list
+            if not self.search_var.get().strip():
+                self.folder_dropdown["values"] = folders
+
+        self.get_folder_scanner().request("profiles", storage_dir, on_batch, self.set_all_folders)
+
+    def set_all_folders(self, folders):
+        self.all_folders = folders
+        if self.search_index is not None:
+            names = list(folders)
+            self.update_search_index(lambda index: index.sync(names))
+        self.apply_profile_search()
+
+    def update_search_index(self, job, channel="search"):
+        """Run job(search index) on the folder scanner's worker, then apply the search again."""
+        index = self.search_index
+
+        def on_error(e):
+            messagebox.showerror("Search", f"Failed to update the search index: {e}")
+        self.get_folder_scanner().submit(channel, lambda: job(index), lambda _: self.apply_profile_search(), on_error)
+
+    def schedule_profile_search(self):
+        # Debounce typing so the index is queried once per pause
+        if self.search_job is not None:
+            self.master.after_cancel(self.search_job)
+        self.search_job = self.master.after(150, self.apply_profile_search)
+
+    def apply_profile_search(self):
+        """Filter the storage folder dropdown by the search box query."""
+        from utils.search import get_search_index
+
+        self.search_job = None
+        query = self.search_var.get().strip()
+        if not query:
+            self.folder_dropdown["values"] = self.all_folders
+            return
+        if self.search_index is None:
+            storage_dir = self.settings.get("storage_directory", "storage/")
+            self.search_index = get_search_index(storage_dir)
+            names = list(self.all_folders)
+            # Searched again once the index is loaded and synced
+            self.update_search_index(lambda index: index.sync(names))
+            return
+        self.folder_dropdown["values"] = self.search_index.search(query)
+
     def refresh_albums(self):
         storage_dir = self.settings.get("storage_directory", "storage/")
         folder = self.selected_folder.get()
+        if self.thumbnail_loader is not None:
+            self.thumbnail_loader.cancel_pending()
         if not folder:
             self.album_dropdown["values"] = []
             self.selected_album.set("")
             return
-        albums = self.files_utils.list_album_upload_folders(storage_dir, folder)
-        self.album_dropdown["values"] = albums
         # Do not auto-select an album
         self.selected_album.set("")
 
+        def on_albums(albums):
+            if self.selected_folder.get() == folder:
+                self.album_dropdown["values"] = albums
+
+        self.get_folder_scanner().request("albums", os.path.join(storage_dir, folder), on_albums, on_albums)
+
         # Add upload button next to album dropdown if not already present
         if not hasattr(self, "upload_btn"):
-            self.upload_btn = tk.Button(self.master, text="Upload File", command=self.upload_file_to_album)
+            self.upload_btn = tk.Button(self.master, text="Upload Files", command=self.upload_file_to_album)
             # Place the button just below the album dropdown (or adjust as needed)
             self.upload_btn.pack(pady=(0, 10), anchor="w")
         self.upload_btn.lift()
@@ -252,132 +466,168 @@ class DocumenterApp:
         self.storage_utils.update_data_json(storage_dir, folder, updates)
         messagebox.showinfo("Saved", "Profile saved successfully.")
 
-    def load_album(self):
-        from PIL import Image, ImageTk  # Requires Pillow installed
-        from utils.album_preview import AlbumPreview
-        import mimetypes
+    def get_thumbnail_loader(self, storage_dir):
+        """Return the background thumbnail loader, creating it on first use."""
+        from utils.thumbnails import get_thumbnail_cache
+        from utils.thumbnail_worker import ThumbnailLoader, DEFAULT_WORKERS, DEFAULT_VIDEO_WORKERS
+
+        cache = get_thumbnail_cache(
+            storage_dir,
+            max_bytes=int(self.settings.get("thumbnail_cache_max_mb", 256)) * 1024 * 1024
+        )
+        if self.thumbnail_loader is None or self.thumbnail_loader.cache is not cache:
+            if self.thumbnail_loader is not None:
+                self.thumbnail_loader.shutdown()
+            workers = int(self.settings.get("thumbnail_workers", DEFAULT_WORKERS))
+            video_workers = int(self.settings.get("video_thumbnail_workers", DEFAULT_VIDEO_WORKERS))
+            self.thumbnail_loader = ThumbnailLoader(
+                self.master, cache, max_workers=max(1, workers), video_workers=max(1, video_workers)
+            )
+        return self.thumbnail_loader
+
+    def load_album(self, folder=None, album=None):
+        """Show an album in the grid; defaults to the selected folder and album."""
+        from utils.album_grid import AlbumGrid
 
         storage_dir = self.settings.get("storage_directory", "storage/")
-        folder = self.selected_folder.get()
-        album = self.selected_album.get()
+        folder = folder or self.selected_folder.get()
+        album = album or self.selected_album.get()
         if not folder or not album:
             messagebox.showwarning("Warning", "No storage folder or album selected.")
             return
 
-        # Clear previous album area content
-        for widget in self.album_area.winfo_children():
-            widget.destroy()
-
-        # Album controls
-        self.album_controls = tk.Frame(self.album_area)
-        self.album_controls.pack(fill="x", pady=(0, 10))
-        self.upload_btn = tk.Button(self.album_controls, text="Upload File", command=self.upload_file_to_album)
-        self.upload_btn.pack(anchor="w", pady=2)
-
-        self.album_files_label = tk.Label(self.album_area, text=f"Album Files: {album}")
-        self.album_files_label.pack(anchor="nw", pady=(10, 0))
+        # Drop thumbnail jobs still queued for the previously shown album
+        if self.thumbnail_loader is not None:
+            self.thumbnail_loader.cancel_pending()
+        loader = self.get_thumbnail_loader(storage_dir)
+
+        if self.album_grid is None or not self.album_grid.winfo_exists():
+            # Clear previous album area content
+            for widget in self.album_area.winfo_children():
+                widget.destroy()
+
+            # Album controls
+            self.album_controls = tk.Frame(self.album_area)
+            self.album_controls.pack(fill="x", pady=(0, 10))
+            self.upload_btn = tk.Button(self.album_controls, text="Upload Files", command=self.upload_file_to_album)
+            self.upload_btn.pack(side="left", anchor="w", pady=2)
+            tk.Button(self.album_controls, text="Upload Folder", command=self.upload_folder_to_album).pack(side="left", padx=4, pady=2)
+            tk.Button(self.album_controls, text="Export Album", command=self.export_album_gui).pack(side="left", padx=4, pady=2)
+            tk.Button(self.album_controls, text="Up", command=self.open_parent_album).pack(side="left", padx=4, pady=2)
+
+            self.album_files_label = tk.Label(self.album_area)
+            self.album_files_label.pack(anchor="nw", pady=(10, 0))
+
+            # One virtualized grid is reused for every album; it only creates
+            # widgets for the rows that are on screen
+            self.album_grid = AlbumGrid(
+                self.album_area,
+                loader=loader,
+                on_open=self.open_album_entry,
+                max_images=int(self.settings.get("thumbnail_pool_size", 300))
+            )
+            self.album_grid.pack(fill="both", expand=True, padx=5, pady=5)
+        self.album_grid.loader = loader
+        self.album_files_label.config(text=f"Album Files: {album}")
+
+        with span("gui.load_album", profile=folder, album=album):
+            # Get files info (album can be a path like "album1/subfolder1")
+            files_info = self.files_utils.list_album_entries(storage_dir, folder, album)
+            album_dir = os.path.join(storage_dir, folder, album)
+            entries = [self.make_album_entry(album_dir, file_info) for file_info in files_info]
+            with span("gui.album_grid.build", entries=len(entries)):
+                self.album_grid.set_entries(sorted(entries, key=album_entry_order))
+        self.shown_album = (folder, album)
+        self.show_album_stats()
+
+    def show_album_stats(self):
+        """
+        Label the shown album and its folder tiles with their sizes. The
+        counts come from the album tree's cached rollups, computed on a
+        worker thread the first time an album is shown.
+        """
+        from utils.album_tree import get_album_tree, format_stats, format_types
 
-        album_files_frame = tk.Frame(self.album_area)
-        album_files_frame.pack(fill="both", expand=True, padx=5, pady=5)
-
-        # Get files info (album can be a path like "album1/subfolder1")
-        files_json = self.files_utils.get_album_files_info(storage_dir, folder, album)
-        try:
-            files_info = json.loads(files_json)
-        except Exception:
-            files_info = []
-
-        # Separate images, videos, folders, and other files
-        image_exts = {"jpg", "jpeg", "png", "gif", "bmp", "webp"}
-        video_exts = {"mp4", "avi", "mov", "wmv", "webm"}
-        folder_files = [f for f in files_info if f.get("is_folder")]
-        image_files = [f for f in files_info if not f.get("is_folder") and f["type"].lower() in image_exts]
-        video_files = [f for f in files_info if not f.get("is_folder") and f["type"].lower() in video_exts]
-        other_files = [f for f in files_info if not f.get("is_folder") and f["type"].lower() not in image_exts and f["type"].lower() not in video_exts]
-
-        # Show folder icons
-        files_per_row = 4
-        for idx, file_info in enumerate(folder_files):
-            row = (idx // files_per_row) * 2
-            col = idx % files_per_row
-            canvas = tk.Canvas(album_files_frame, width=100, height=100, bg="#f0dc8c", highlightthickness=0, cursor="hand2")
-            canvas.create_rectangle(10, 40, 90, 90, fill="#e2c76c", outline="#b89d4a")
-            canvas.create_rectangle(20, 25, 70, 50, fill="#f6e7a1", outline="#b89d4a")
-            canvas.grid(row=row, column=col, padx=5, pady=5)
-            display_name = file_info["name"][:25] + ("..." if len(file_info["name"]) > 25 else "")
-            name_label = tk.Label(album_files_frame, text=display_name)
-            name_label.grid(row=row + 1, column=col, padx=5, pady=(0, 10))
-
-            # Bind click to load this folder as album (append to current album path)
-            def load_subfolder_album(event, folder_name=file_info["name"], parent_album=album):
-                # Use os.path.join to handle nested folders
-                new_album = os.path.join(parent_album, folder_name)
-                self.selected_album.set(new_album)
-                self.load_album()
-            canvas.bind("<Button-1>", lambda e, fn=file_info["name"], pa=album: load_subfolder_album(e, fn, pa))
-            name_label.bind("<Button-1>", lambda e, fn=file_info["name"], pa=album: load_subfolder_album(e, fn, pa))
-            name_label.config(cursor="hand2")
-
-        # Show image previews
-        self.album_images = []  # Keep references to PhotoImage objects
-        offset = len(folder_files)
-        for idx, file_info in enumerate(image_files):
-            file_path = os.path.join(storage_dir, folder, album, file_info["name"])
-            try:
-                img = Image.open(file_path)
-                img.thumbnail((100, 100))
-                photo = ImageTk.PhotoImage(img)
-                self.album_images.append(photo)
-                row = ((offset + idx) // files_per_row) * 2
-                col = (offset + idx) % files_per_row
-                img_label = tk.Label(album_files_frame, image=photo, cursor="hand2")
-                img_label.grid(row=row, column=col, padx=5, pady=5)
-                img_label.bind("<Button-1>", lambda e, fp=file_path: AlbumPreview(self.master, fp))
-                img_label.file_info = file_info
-                display_name = file_info["name"][:25] + ("..." if len(file_info["name"]) > 25 else "")
-                name_label = tk.Label(album_files_frame, text=display_name)
-                name_label.grid(row=row + 1, column=col, padx=5, pady=(0, 10))
-            except Exception as e:
-                err_label = tk.Label(album_files_frame, text=f"Error loading {file_info['name']}")
-                err_label.grid(row=0, column=idx, padx=5, pady=5)
+        storage_dir = self.settings.get("storage_directory", "storage/")
+        shown = self.shown_album
+        folder, album = shown
+        album_dir = os.path.join(storage_dir, folder, album)
+        tree = get_album_tree(storage_dir)
 
-        # Show video previews (as placeholder image with play icon)
-        video_start_idx = offset + len(image_files)
-        for idx, file_info in enumerate(video_files):
-            file_path = os.path.join(storage_dir, folder, album, file_info["name"])
+        def count():
             try:
-                vid_idx = video_start_idx + idx
-                row = (vid_idx // files_per_row) * 2
-                col = vid_idx % files_per_row
-                play_icon = tk.Canvas(album_files_frame, width=100, height=100, bg="black")
-                play_icon.create_polygon(
-                    [35, 25, 35, 75, 75, 50], fill="white"
+                total = tree.stats(album_dir)
+                children = dict(tree.children(album_dir))
+            except OSError:
+                return
+
+            def apply():
+                if self.shown_album != shown or self.album_grid is None or not self.album_grid.winfo_exists():
+                    return
+                types = format_types(total, limit=4)
+                self.album_files_label.config(
+                    text=f"Album Files: {album} ({format_stats(total)}{'; ' + types if types else ''})"
                 )
-                play_icon.grid(row=row, column=col, padx=5, pady=5)
-                play_icon.bind("<Button-1>", lambda e, fp=file_path: AlbumPreview(self.master, fp))
-                display_name = file_info["name"][:25] + ("..." if len(file_info["name"]) > 25 else "")
-                name_label = tk.Label(album_files_frame, text=display_name)
-                name_label.grid(row=row + 1, column=col, padx=5, pady=(0, 10))
-            except Exception:
-                vid_label = tk.Label(album_files_frame, text=f"[Video] {file_info['name']}", width=15, height=5, bg="black", fg="white")
-                vid_label.grid(row=0, column=video_start_idx + idx, padx=5, pady=5)
-                vid_label.bind("<Button-1>", lambda e, fp=file_path: AlbumPreview(self.master, fp))
-                display_name = file_info["name"][:25] + ("..." if len(file_info["name"]) > 25 else "")
-                name_label = tk.Label(album_files_frame, text=display_name)
-                name_label.grid(row=1, column=video_start_idx + idx, padx=5, pady=(0, 10))
-
-        # List other files below images/videos
-        total_media = offset + len(image_files) + len(video_files)
-        row_offset = ((total_media - 1) // files_per_row + 1) * 2 if total_media else 0
-        col_span = min(files_per_row, total_media) if total_media else 1
-        if other_files:
-            files_list_label = tk.Label(album_files_frame, text="Other Files:")
-            files_list_label.grid(row=row_offset, column=0, sticky="w", pady=(10, 0), columnspan=col_span)
-            for i, file_info in enumerate(other_files):
-                file_path = os.path.join(storage_dir, folder, album, file_info["name"])
-                file_label = tk.Label(album_files_frame, text=f"{file_info['name']} ({file_info['type']}, {file_info['size']} bytes)", fg="blue", cursor="hand2")
-                file_label.grid(row=row_offset + 1 + i, column=0, sticky="w", columnspan=col_span)
-                file_label.bind("<Button-1>", lambda e, fp=file_path: AlbumPreview(self.master, fp))
+                entries = [
+                    dict(entry, detail=format_stats(children[entry["name"]], sep="\n"))
+                    if entry["kind"] == "folder" and entry["name"] in children else entry
+                    for entry in self.album_grid.entries
+                ]
+                self.album_grid.update_entries(entries)
+            try:
+                self.master.after(0, apply)
+            except RuntimeError:
+                pass  # main loop is gone
+        threading.Thread(target=count, daemon=True).start()
+
+    def open_parent_album(self):
+        """Go up from a sub-folder to the folder (album) that contains it."""
+        album = self.selected_album.get()
+        parent = os.path.dirname(os.path.normpath(album)) if album else ""
+        if not parent:
+            return
+        self.selected_album.set(parent)
+        self.load_album()
+
+    @staticmethod
+    def make_album_entry(album_dir, file_info):
+        if file_info.is_folder:
+            kind = "folder"
+        elif file_info.type.lower() in IMAGE_EXTS:
+            kind = "image"
+        elif file_info.type.lower() in VIDEO_EXTS:
+            kind = "video"
+        else:
+            kind = "other"
+        return {
+            "name": file_info.name,
+            "kind": kind,
+            "path": os.path.join(album_dir, file_info.name),
+            "info": file_info,
+        }
+
+    def open_album_entry(self, entry):
+        """Open a tile from the album grid: descend into folders, preview files."""
+        from utils.album_preview import AlbumPreview
+
+        if entry["kind"] == "folder":
+            # Use os.path.join to handle nested folders
+            self.selected_album.set(os.path.join(self.selected_album.get(), entry["name"]))
+            self.load_album()
+            return
+        # Hand the preview the album's files in display order for next/previous
+        file_list = [e["path"] for e in self.album_grid.entries if e["kind"] != "folder"]
+        AlbumPreview(
+            self.master, entry["path"], self.settings.get("storage_directory", "storage/"),
+            file_list=file_list, prefetch=self.settings.get("preview_prefetch", 2)
+        )
+
+    def show_debug_panel(self):
+        from utils.debug_panel import DebugPanel
+
+        if self.debug_panel is None or not self.debug_panel.winfo_exists():
+            self.debug_panel = DebugPanel(self.master)
+        self.debug_panel.lift()
 
     def show_about(self):
         messagebox.showinfo(
@@ -416,26 +666,46 @@ class DocumenterApp:
         messagebox.showinfo("Created", f"Album '{album_name}' created.")
 
     def upload_file_to_album(self):
-        from tkinter import filedialog
+        file_paths = filedialog.askopenfilenames(title="Select files to upload")
+        if file_paths:
+            self.ingest_into_album(list(file_paths))
+
+    def upload_folder_to_album(self):
+        dir_path = filedialog.askdirectory(title="Select folder to upload")
+        if dir_path:
+            self.ingest_into_album([dir_path])
+
+    def ingest_into_album(self, sources):
+        """Copy files/folders into the selected album in the background, then refresh it once."""
         storage_dir = self.settings.get("storage_directory", "storage/")
         folder = self.selected_folder.get()
         album = self.selected_album.get()
         if not folder or not album:
             messagebox.showwarning("Warning", "No storage folder or album selected.")
             return
-        file_path = filedialog.askopenfilename(title="Select file to upload")
-        if not file_path:
-            return
-        album_dir = os.path.join(storage_dir, folder, album)
-        if not os.path.isdir(album_dir):
-            os.makedirs(album_dir, exist_ok=True)
-        dest_path = os.path.join(album_dir, os.path.basename(file_path))
-        try:
-            shutil.copy2(file_path, dest_path)
-            # No confirmation, just refresh album display
-            self.load_album()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to upload file: {e}")
+        dialog = ProgressDialog(self.master, f"Uploading to {album}")
+        dedup = bool(self.settings.get("dedup_storage", False))
+        workers = int(self.settings.get("upload_workers", self.files_utils.DEFAULT_INGEST_WORKERS))
+        def do_ingest():
+            try:
+                failures = self.files_utils.ingest_files(
+                    storage_dir, folder, album, sources,
+                    dedup=dedup, workers=workers,
+                    progress=dialog.report_transfer,
+                    cancel_event=dialog.cancel_event
+                )
+            except Exception as e:
+                failures = [("", e)]
+            def finish():
+                dialog.close()
+                # No confirmation, just refresh album display (once, if it is still shown)
+                if self.selected_folder.get() == folder and self.selected_album.get() == album:
+                    self.load_album()
+                if failures:
+                    details = "\n".join(f"{os.path.basename(src)}: {err}" for src, err in failures[:10])
+                    messagebox.showerror("Error", f"Failed to upload {len(failures)} file(s):\n{details}")
+            self.master.after(0, finish)
+        threading.Thread(target=do_ingest, daemon=True).start()
 
     def export_profile_gui(self):
         storage_dir = self.settings.get("storage_directory", "storage/")
@@ -450,28 +720,181 @@ class DocumenterApp:
             filetypes=[("Zip Files", "*.zip")]
         )
         if export_path:
+            # The zip modules pull in zipfile and multiprocessing; load them on first use
+            from utils.profile_transfer import export_profile
+            from utils.zip_export import ExportCancelled, DEFAULT_WORKERS as DEFAULT_EXPORT_WORKERS
+
+            dialog = ProgressDialog(self.master, f"Exporting {folder}")
+            workers = int(self.settings.get("export_workers") or DEFAULT_EXPORT_WORKERS)
             def do_export():
                 try:
-                    export_profile(storage_dir, folder, export_path)
+                    export_profile(
+                        storage_dir, folder, export_path,
+                        progress=dialog.report_transfer,
+                        cancel_event=dialog.cancel_event,
+                        workers=workers
+                    )
+                    self.master.after(0, dialog.close)
                     self.master.after(0, lambda: messagebox.showinfo("Export", f"Profile exported to {export_path}"))
+                except ExportCancelled:
+                    self.master.after(0, dialog.close)
                 except Exception as e:
-                    self.master.after(0, lambda: messagebox.showerror("Export Error", f"Failed to export profile: {e}"))
+                    msg = str(e)
+                    self.master.after(0, dialog.close)
+                    self.master.after(0, lambda: messagebox.showerror("Export Error", f"Failed to export profile: {msg}"))
             threading.Thread(target=do_export, daemon=True).start()
 
+    def export_album_gui(self):
+        """Export the selected album as a zip file or a plain folder, in the background."""
+        storage_dir = self.settings.get("storage_directory", "storage/")
+        folder = self.selected_folder.get()
+        album = self.selected_album.get()
+        if not folder or not album:
+            messagebox.showwarning("Warning", "No storage folder or album selected.")
+            return
+        as_zip = messagebox.askyesnocancel("Export Album", "Export the album as a zip file?\n\nNo exports a plain folder.")
+        if as_zip is None:
+            return
+        album_name = os.path.basename(os.path.normpath(album))
+        if as_zip:
+            export_path = filedialog.asksaveasfilename(
+                title="Export Album as ZIP",
+                defaultextension=".zip",
+                initialfile=f"{album_name}.zip",
+                filetypes=[("Zip Files", "*.zip")]
+            )
+        else:
+            parent = filedialog.askdirectory(title="Export Album into Folder")
+            export_path = os.path.join(parent, album_name) if parent else ""
+        if not export_path:
+            return
+        from utils.file_export import export_album
+        from utils.zip_export import ExportCancelled, DEFAULT_WORKERS as DEFAULT_EXPORT_WORKERS
+
+        dialog = ProgressDialog(self.master, f"Exporting {album}")
+        workers = int(self.settings.get("export_workers") or DEFAULT_EXPORT_WORKERS)
+        def do_export():
+            try:
+                export_album(
+                    storage_dir, folder, album, export_path, as_zip=as_zip,
+                    progress=dialog.report_transfer,
+                    cancel_event=dialog.cancel_event,
+                    workers=workers
+                )
+                self.master.after(0, dialog.close)
+                self.master.after(0, lambda: messagebox.showinfo("Export", f"Album exported to {export_path}"))
+            except ExportCancelled:
+                self.master.after(0, dialog.close)
+            except Exception as e:
+                msg = str(e)
+                self.master.after(0, dialog.close)
+                self.master.after(0, lambda: messagebox.showerror("Export Error", f"Failed to export album: {msg}"))
+        threading.Thread(target=do_export, daemon=True).start()
+
+    def find_duplicates_gui(self):
+        """List groups of near-duplicate images (resized or recompressed copies) in the selected profile."""
+        from utils.phash import get_perceptual_index
+
+        storage_dir = self.settings.get("storage_directory", "storage/")
+        folder = self.selected_folder.get()
+        if not folder:
+            messagebox.showwarning("Warning", "No storage folder selected.")
+            return
+        dialog = ProgressDialog(self.master, f"Finding duplicates in {folder}")
+        def do_search():
+            try:
+                index = get_perceptual_index(storage_dir)
+                _, failures = index.sync(
+                    [folder],
+                    progress=lambda done, total: dialog.report(done, total, f"Hashed {done}/{total} images"),
+                    cancel_event=dialog.cancel_event
+                )
+                clusters = None if dialog.cancel_event.is_set() else index.clusters(folder)
+                self.master.after(0, dialog.close)
+                if clusters is not None:
+                    self.master.after(0, lambda: self.show_duplicate_clusters(folder, clusters, len(failures)))
+            except Exception as e:
+                msg = str(e)
+                self.master.after(0, dialog.close)
+                self.master.after(0, lambda: messagebox.showerror("Duplicates", f"Failed to find duplicates: {msg}"))
+        threading.Thread(target=do_search, daemon=True).start()
+
+    def show_duplicate_clusters(self, folder, clusters, failed=0):
+        skipped = f"\n{failed} image(s) could not be read and were skipped." if failed else ""
+        if not clusters:
+            messagebox.showinfo("Duplicates", f"No near-duplicate images found in {folder}.{skipped}")
+            return
+        from utils.album_preview import AlbumPreview
+
+        storage_dir = self.settings.get("storage_directory", "storage/")
+        profile_dir = os.path.join(storage_dir, folder)
+        window = tk.Toplevel(self.master)
+        window.title(f"Duplicates in {folder}")
+        window.geometry("700x500")
+        tk.Label(window, text=f"{len(clusters)} group(s) of similar images. Double-click a file to compare its group."
+                              f"{skipped}").pack(
+            anchor="w", padx=10, pady=(10, 4)
+        )
+        listbox = tk.Listbox(window)
+        scrollbar = tk.Scrollbar(window, orient="vertical", command=listbox.yview)
+        listbox.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        listbox.pack(fill="both", expand=True, padx=(10, 0), pady=(0, 10))
+        rows = []  # listbox row -> (group, path) or None for headers
+        for number, group in enumerate(clusters, 1):
+            listbox.insert("end", f"Group {number} ({len(group)} files)")
+            rows.append(None)
+            for path in group:
+                listbox.insert("end", "    " + os.path.relpath(path, profile_dir))
+                rows.append((group, path))
+
+        def open_row(event):
+            selection = listbox.curselection()
+            row = rows[selection[0]] if selection else None
+            if row is not None:
+                group, path = row
+                AlbumPreview(self.master, path, storage_dir, file_list=group,
+                             prefetch=self.settings.get("preview_prefetch", 2))
+        listbox.bind("<Double-Button-1>", open_row)
+
     def import_profile_gui(self):
+        from utils.profile_transfer import import_profile, order_chain
+        from utils.zip_import import ImportCancelled
+
         storage_dir = self.settings.get("storage_directory", "storage/")
-        import_zip_path = filedialog.askopenfilename(
+        # Several files are a full export plus the incremental exports made after it
+        import_zip_paths = filedialog.askopenfilenames(
             title="Import Profile from ZIP",
             filetypes=[("Zip Files", "*.zip")]
         )
-        if not import_zip_path:
+        if not import_zip_paths:
             return
+        if len(import_zip_paths) == 1:
+            import_zip_path = import_zip_paths[0]
+        else:
+            try:
+                import_zip_path = order_chain(import_zip_paths)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Import Error", f"Cannot import these archives together: {e}")
+                return
         folder_name = simpledialog.askstring("Import Profile", "Enter folder name for imported profile (leave blank to use zip name):")
+        dialog = ProgressDialog(self.master, "Importing profile")
         def do_import():
             try:
-                imported_folder = import_profile(storage_dir, import_zip_path, folder_name if folder_name else None)
+                imported_folder = import_profile(
+                    storage_dir, import_zip_path, folder_name if folder_name else None,
+                    progress=dialog.report_transfer,
+                    cancel_event=dialog.cancel_event
+                )
+                self.master.after(0, dialog.close)
                 self.master.after(0, lambda: messagebox.showinfo("Import", f"Profile imported to {imported_folder}"))
                 self.master.after(0, self.refresh_storage_folders)
+            except ImportCancelled:
+                self.master.after(0, dialog.close)
             except Exception as e:
-                self.master.after(0, lambda: messagebox.showerror("Import Error", f"Failed to import profile: {e}"))
+                msg = str(e)
+                self.master.after(0, dialog.close)
+                self.master.after(0, lambda: messagebox.showerror(
+                    "Import Error", f"Failed to import profile: {msg}\nImporting the same file again resumes where it stopped."
+                ))
         threading.Thread(target=do_import, daemon=True).start()
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import threading
+
+# Histogram buckets are powers of two of milliseconds, from 1/64 ms up
+BUCKET_OFFSET = 6
+BUCKETS = 28
+DEFAULT_LOG = "instrumentation.jsonl"
+
+_recorder = None
+
+
+class Histogram:
+    """Count, total, min, max and log2 buckets of span durations in milliseconds."""
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = max(self.max, ms)
+        bucket = 0
+        if ms > 0:
+            bucket = min(BUCKETS - 1, max(0, int(ms * (1 << BUCKET_OFFSET)).bit_length()))
+        self.buckets[bucket] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(self.max, (1 << bucket) / (1 << BUCKET_OFFSET))
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min or 0.0, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class Recorder:
+    """
+    Collects counters and span histograms in memory and, when log_path is
+    set, appends every span as one JSON object per line:
+      {"ts": ..., "span": "files.list_album_entries", "ms": 1.8, "thread": "MainThread", ...fields}
+    Safe to use from any thread.
+    """
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._log = None
+        self.counters = {}
+        self.histograms = {}
+        if log_path:
+            self._log = open(log_path, "a", encoding="utf-8", buffering=1)
+
+    def record(self, name, ms, fields=None):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(ms)
+            if self._log is not None:
+                line = {"ts": round(time.time(), 6), "span": name, "ms": round(ms, 3),
+                        "thread": threading.current_thread().name}
+                if fields:
+                    line.update(fields)
+                self._log.write(json.dumps(line, default=str) + "\n")
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "spans": {name: histogram.summary() for name, histogram in self.histograms.items()},
+            }
+
+    def dump(self):
+        """Append the current counters and span summaries to the log as one "summary" line."""
+        snapshot = self.snapshot()
+        with self._lock:
+            if self._log is not None:
+                self._log.write(json.dumps({"ts": round(time.time(), 6), "summary": snapshot}) + "\n")
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "fields", "started")
+
+    def __init__(self, recorder, name, fields):
+        self.recorder = recorder
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def set(self, key, value):
+        """Attach a field known only inside the block, e.g. a result size."""
+        self.fields[key] = value
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.started) * 1000
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.recorder.record(self.name, ms, self.fields)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def set(self, key, value):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **fields):
+    """
+    Time a block: with span("storage.read_data_json", profile=name): ...
+    When instrumentation is off this returns a shared no-op context, so the
+    cost at a call site is one global lookup.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name, fields)
+
+
+def count(name, n=1):
+    recorder = _recorder
+    if recorder is not None:
+        recorder.count(name, n)
+
+
+def enabled():
+    return _recorder is not None
+
+
+def get_recorder():
+    return _recorder
+
+
+def configure(settings):
+    """
+    Turn instrumentation on or off from settings: "instrumentation" enables
+    it and "instrumentation_log" names the JSON-lines file (relative paths
+    are relative to the working directory; empty keeps results in memory
+    for the debug panel only).
+    """
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+    if settings.get("instrumentation", False):
+        log_path = settings.get("instrumentation_log", DEFAULT_LOG)
+        _recorder = Recorder(os.path.abspath(log_path) if log_path else None)
+    return _recorder
@@ -0,0 +1,345 @@
+import os
+import sys
+import json
+import threading
+
+from utils import storage
+from utils.thumbnails import get_thumbnail_cache
+
+INDEX_FILE = ".phash_index.json"
+INDEX_VERSION = 1
+# dHash compares each pixel of a 9x8 grayscale image with its right neighbour
+HASH_SIZE = 8
+# Bits that may differ for two images to count as near-duplicates (of 64)
+DEFAULT_MAX_DISTANCE = 10
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def dhash(image):
+    """Return the 64-bit difference hash of a PIL image."""
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE))
+    pixels = small.tobytes()  # one byte per pixel in mode "L"
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def is_hashable(file_path):
+    return file_path.lower().endswith(IMAGE_EXTS)
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over hashes under the Hamming distance. A search for
+    hashes within d of h only descends into children whose edge distance is
+    within d of the node's distance to h, so it touches a small part of the
+    tree. Each node keeps the set of items with that exact hash; removing an
+    item leaves its node in place as a routing key.
+    """
+
+    __slots__ = ("_root", "_nodes")
+
+    def __init__(self):
+        self._root = None  # [hash, items, {distance: child}]
+        self._nodes = {}   # hash -> node, for O(1) add/discard of known hashes
+
+    def add(self, value, item):
+        node = self._nodes.get(value)
+        if node is not None:
+            node[1].add(item)
+            return
+        node = [value, {item}, {}]
+        self._nodes[value] = node
+        if self._root is None:
+            self._root = node
+            return
+        current = self._root
+        while True:
+            distance = hamming(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def discard(self, value, item):
+        node = self._nodes.get(value)
+        if node is not None:
+            node[1].discard(item)
+
+    def search(self, value, max_distance):
+        """Return [(distance, item)] for every item whose hash is within max_distance of value."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class PerceptualIndex:
+    """
+    Perceptual hashes of the album images under a storage directory, for
+    finding resized or recompressed copies of the same photo. Hashes are
+    computed from the cached thumbnails (decoding the original only when no
+    thumbnail exists yet) and persisted under the storage directory together
+    with each file's size and mtime, so a file is hashed once until it
+    changes. Lookups go through a BK-tree.
+    """
+
+    def __init__(self, storage_directory):
+        self.storage_directory = storage_directory
+        self.path = os.path.join(storage_directory, INDEX_FILE)
+        self._lock = threading.RLock()
+        self._files = {}  # path relative to storage -> (size, mtime_ns, hash)
+        self._tree = BKTree()
+        self._dirty = False
+        self.loaded = False
+
+    def _set(self, rel_path, size, mtime, value):
+        self._remove(rel_path)
+        self._files[rel_path] = (size, mtime, value)
+        self._tree.add(value, rel_path)
+        self._dirty = True
+
+    def _remove(self, rel_path):
+        record = self._files.pop(rel_path, None)
+        if record is not None:
+            self._tree.discard(record[2], rel_path)
+            self._dirty = True
+
+    def load(self):
+        """Load the persisted hashes, if any."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = None
+        with self._lock:
+            if stored and stored.get("version") == INDEX_VERSION:
+                for rel_path, (size, mtime, value) in stored["files"].items():
+                    self._set(rel_path, size, mtime, int(value, 16))
+            self._dirty = False
+            self.loaded = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            stored = {
+                "version": INDEX_VERSION,
+                "files": {p: [size, mtime, f"{value:016x}"] for p, (size, mtime, value) in self._files.items()}
+            }
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(stored, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # the hashes are only a cache; missing ones are computed again
+
+    def hash_file(self, file_path):
+        """Compute the hash of one image through the thumbnail cache."""
+        thumb = get_thumbnail_cache(self.storage_directory).get_or_create(file_path)
+        return dhash(thumb)
+
+    def _rel(self, file_path):
+        return os.path.relpath(os.path.abspath(file_path), os.path.abspath(self.storage_directory))
+
+    def _images(self, folder_name):
+        """Yield (rel path, size, mtime_ns) for the images in a profile's albums."""
+        stack = [os.path.join(self.storage_directory, folder_name)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.name.startswith("."):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif is_hashable(entry.name):
+                                st = entry.stat()
+                                yield self._rel(entry.path), st.st_size, st.st_mtime_ns
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def sync(self, folders=None, progress=None, cancel_event=None, workers=DEFAULT_WORKERS):
+        """
+        Bring the hashes of the given profiles (default: all) up to date: one
+        stat per image, and only new or changed images are hashed, on workers
+        threads. progress(processed, total) is called as images are hashed
+        or fail. Returns (number hashed, [(path, error)] of the images that
+        could not be hashed, e.g. unreadable or not really images).
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if not self.loaded:
+            self.load()
+        all_folders = folders is None
+        if all_folders:
+            folders = storage.list_subfolders(self.storage_directory)
+        # Walk the folders without the lock; lookups and hashing go on meanwhile
+        found = [image for folder_name in folders for image in self._images(folder_name)]
+        pending = []
+        with self._lock:
+            seen = set()
+            for rel_path, size, mtime in found:
+                seen.add(rel_path)
+                record = self._files.get(rel_path)
+                if record is None or record[:2] != (size, mtime):
+                    pending.append((rel_path, size, mtime))
+            prefixes = None if all_folders else tuple(f + os.sep for f in folders)
+            for rel_path in [p for p in self._files if p not in seen and (prefixes is None or p.startswith(prefixes))]:
+                self._remove(rel_path)
+
+        done = 0
+        failures = []
+
+        def hash_one(item):
+            rel_path, size, mtime = item
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            path = os.path.join(self.storage_directory, rel_path)
+            try:
+                value = self.hash_file(path)
+            except Exception as e:
+                value = None
+                error = e
+            nonlocal done
+            with self._lock:
+                if value is None:
+                    failures.append((path, error))
+                else:
+                    self._set(rel_path, size, mtime, value)
+                    done += 1
+                count = done + len(failures)
+            if progress:
+                progress(count, len(pending))
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="phash") as executor:
+                list(executor.map(hash_one, pending))
+        finally:
+            self.save()
+        return done, failures
+
+    def near_duplicates(self, file_path, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Return [(distance, path)] of the indexed images that look like
+        file_path, closest first. file_path may be outside the storage
+        directory; it is never part of the result itself.
+        """
+        if not self.loaded:
+            self.load()
+        rel_path = self._rel(file_path)
+        with self._lock:
+            record = self._files.get(rel_path)
+        value = record[2] if record is not None else self.hash_file(file_path)
+        with self._lock:
+            matches = self._tree.search(value, max_distance)
+        results = []
+        for distance, match in matches:
+            path = os.path.join(self.storage_directory, match)
+            if match != rel_path and os.path.isfile(path):
+                results.append((distance, path))
+        return sorted(results)
+
+    def clusters(self, folder_name, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Return the groups of near-duplicate images within one profile, largest
+        first. Every image of a group is within max_distance of at least one
+        other image of the group.
+        """
+        if not self.loaded:
+            self.load()
+        prefix = folder_name + os.sep
+        with self._lock:
+            members = {p: record[2] for p, record in self._files.items() if p.startswith(prefix)}
+            parent = {p: p for p in members}
+
+            def find(p):
+                while parent[p] != p:
+                    parent[p] = parent[parent[p]]
+                    p = parent[p]
+                return p
+
+            for rel_path, value in members.items():
+                for _, match in self._tree.search(value, max_distance):
+                    if match in parent and match != rel_path:
+                        parent[find(match)] = find(rel_path)
+        groups = {}
+        for rel_path in members:
+            groups.setdefault(find(rel_path), []).append(os.path.join(self.storage_directory, rel_path))
+        clusters = [sorted(group) for group in groups.values() if len(group) > 1]
+        return sorted(clusters, key=lambda group: (-len(group), group[0]))
+
+
+def get_perceptual_index(storage_directory):
+    """Return the shared perceptual hash index for storage_directory (not yet synced)."""
+    key = os.path.abspath(storage_directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = PerceptualIndex(storage_directory)
+        return index
+
+
+def main(argv=None):
+    import argparse
+    from utils.settings import load_settings
+
+    parser = argparse.ArgumentParser(prog="python -m utils.phash", description="Find near-duplicate images.")
+    parser.add_argument("--storage", default=None, help="storage directory (defaults to settings.json)")
+    parser.add_argument("--distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                        help="differing hash bits (of 64) still counted as a duplicate")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("sync", help="hash new and changed images in every profile")
+    sub = commands.add_parser("similar", help="list images that look like a file")
+    sub.add_argument("file")
+    sub = commands.add_parser("clusters", help="list groups of near-duplicate images in a profile")
+    sub.add_argument("profile")
+    args = parser.parse_args(argv)
+    storage_directory = args.storage or load_settings().get("storage_directory", "storage/")
+    index = get_perceptual_index(storage_directory)
+
+    if args.command == "sync":
+        hashed, failures = index.sync()
+        for path, error in failures:
+            print(f"{path}: {error}", file=sys.stderr)
+        print(f"hashed {hashed} image(s)" + (f", {len(failures)} failed" if failures else ""))
+    elif args.command == "similar":
+        index.sync()
+        for distance, path in index.near_duplicates(args.file, args.distance):
+            print(f"{distance}\t{path}")
+    else:
+        if not os.path.isdir(os.path.join(storage_directory, args.profile)):
+            print(f"Profile '{args.profile}' not found.", file=sys.stderr)
+            return 1
+        index.sync([args.profile])
+        for group in index.clusters(args.profile, args.distance):
+            print("\n".join(group) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
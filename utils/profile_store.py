@@ -0,0 +1,199 @@
+import os
+import copy
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from utils import catalog, search
+from utils.album_index import RACY_WINDOW_NS
+
+DATA_FILE = "data.json"
+# Clean profiles kept in memory; profiles with unsaved changes are never dropped
+MAX_CACHED_PROFILES = 1000
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Profile:
+    __slots__ = ("data", "stamp", "read_at", "pending")
+
+    def __init__(self, data, stamp, read_at=0):
+        self.data = data
+        self.stamp = stamp      # (mtime_ns, size) of data.json when read, or None if it did not exist
+        self.read_at = read_at  # time.time_ns() just before that stat
+        self.pending = None     # updates not yet written, or None when clean
+
+
+class ProfileStore:
+    """
+    Write-back cache of the profiles' data.json files. Reads are served from
+    memory while the file's mtime and size are unchanged and the mtime is
+    old enough not to hide a later change in the same clock tick. Callers
+    always get copies, so mutating one never touches the cache. Updates are merged into the
+    cached profile and written at once, or, inside a batch(), once per
+    profile when the outermost batch ends. Writes go to a temporary file that
+    is fsync'ed and renamed over data.json, so a crash leaves either the old
+    or the new contents. If data.json was changed by someone else in the
+    meantime, pending updates are applied on top of the new contents, as
+    update_data_json always did.
+    """
+
+    def __init__(self, storage_directory, compact=False):
+        self.storage_directory = storage_directory
+        self.compact = compact
+        self._lock = threading.RLock()
+        self._profiles = OrderedDict()  # folder name -> _Profile, least recently used first
+        self._batch_depth = 0
+
+    def _path(self, folder_name):
+        return os.path.join(self.storage_directory, folder_name, DATA_FILE)
+
+    def _load(self, folder_name):
+        """Return the cached profile, (re)reading data.json if it changed on disk."""
+        read_at = time.time_ns()
+        stamp = self._stat(folder_name)
+        profile = self._profiles.get(folder_name)
+        if profile is not None and profile.stamp == stamp and (
+                stamp is None or profile.pending is not None or profile.read_at - stamp[0] > RACY_WINDOW_NS):
+            self._profiles.move_to_end(folder_name)
+            return profile
+        data = None
+        if stamp is not None:
+            with open(self._path(folder_name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        if profile is None:
+            profile = _Profile(data, stamp, read_at)
+            self._profiles[folder_name] = profile
+            self._trim()
+        else:
+            # Changed on disk; keep our unsaved updates on top of the new contents
+            profile.data = data if profile.pending is None else {**(data or {}), **profile.pending}
+            profile.stamp = stamp
+            profile.read_at = read_at
+            self._profiles.move_to_end(folder_name)
+        return profile
+
+    def _trim(self):
+        for folder_name in list(self._profiles):
+            if len(self._profiles) <= MAX_CACHED_PROFILES:
+                break
+            if self._profiles[folder_name].pending is None:
+                del self._profiles[folder_name]
+
+    def get(self, folder_name):
+        """Return a copy of the profile's data, or None if it has no data.json."""
+        with self._lock:
+            data = self._load(folder_name).data
+            return None if data is None else copy.deepcopy(data)
+
+    def update(self, folder_name, updates):
+        """Merge updates into the profile and return the merged data."""
+        updates = copy.deepcopy(updates)
+        with self._lock:
+            profile = self._load(folder_name)
+            profile.data = {**(profile.data or {}), **updates}
+            profile.pending = {**(profile.pending or {}), **updates}
+            data = copy.deepcopy(profile.data)
+            if self._batch_depth == 0:
+                self.flush([folder_name])
+        return data
+
+    def write(self, folder_name, data):
+        """Replace the profile's data entirely."""
+        data = copy.deepcopy(data)
+        with self._lock:
+            profile = self._profiles.get(folder_name)
+            if profile is None:
+                profile = self._profiles[folder_name] = _Profile(None, None)
+            profile.data = data
+            profile.pending = dict(data)
+            # Not a merge: make the next flush overwrite whatever is on disk
+            profile.stamp = self._stat(folder_name)
+            if self._batch_depth == 0:
+                self.flush([folder_name])
+
+    def _stat(self, folder_name):
+        """Return (mtime_ns, size) of the profile's data.json, or None if it does not exist."""
+        try:
+            st = os.stat(self._path(folder_name))
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    @contextmanager
+    def batch(self):
+        """Defer writes until the outermost batch ends, then write each changed profile once."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    def dirty(self):
+        with self._lock:
+            return [name for name, profile in self._profiles.items() if profile.pending is not None]
+
+    def flush(self, folder_names=None):
+        """Write the given (default: all) profiles that have unsaved changes."""
+        with self._lock:
+            for folder_name in folder_names if folder_names is not None else self.dirty():
+                profile = self._profiles.get(folder_name)
+                if profile is None or profile.pending is None:
+                    continue
+                if self._stat(folder_name) != profile.stamp:
+                    self._load(folder_name)  # merges pending updates onto the new contents
+                self._write_file(folder_name, profile.data)
+                profile.read_at = time.time_ns()
+                profile.stamp = self._stat(folder_name)
+                profile.pending = None
+                catalog.record_profile(self.storage_directory, folder_name, profile.data)
+                search.record_profile(self.storage_directory, folder_name, profile.data)
+
+    def _write_file(self, folder_name, data):
+        path = self._path(folder_name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                if self.compact:
+                    json.dump(data, f, separators=(",", ":"))
+                else:
+                    json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def forget(self, folder_name):
+        """Drop a profile from the cache, discarding unsaved changes (e.g. after deleting it)."""
+        with self._lock:
+            self._profiles.pop(folder_name, None)
+
+
+def get_profile_store(storage_directory, compact=None):
+    """
+    Return the shared profile store for storage_directory. compact defaults
+    to the "compact_json" setting.
+    """
+    key = os.path.abspath(storage_directory)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if compact is None:
+                from utils.settings import load_settings
+                compact = bool(load_settings().get("compact_json", False))
+            store = _stores[key] = ProfileStore(storage_directory, compact)
+        elif compact is not None:
+            store.compact = compact
+        return store
@@ -1,40 +1,244 @@
 import os
+import json
+import uuid
 import zipfile
 import shutil
+from utils import catalog
+from utils.instrumentation import span
+from utils.zip_export import ZipExporter, DEFAULT_WORKERS
+from utils.zip_import import ZipImporter, staging_path, read_manifest_data, safe_member_path, \
+    DEFAULT_WORKERS as DEFAULT_IMPORT_WORKERS
 
-def export_profile(storage_directory, folder_name, export_path):
+# Records which archives of a chain are already applied to the staging folder
+CHAIN_JOURNAL_NAME = ".import-chain"
+DELTA_STAGING_NAME = ".import-delta"
+# Manifest mtimes are floats; allow for rounding when they are compared
+MTIME_TOLERANCE = 1e-6
+
+def load_manifest(path):
+    """
+    Return the manifest of an exported archive, or of a manifest file saved
+    next to one with export_profile(manifest_path=...).
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path, "r") as zipf:
+            data = read_manifest_data(zipf)
+        if data is None:
+            raise ValueError(f"'{path}' has no manifest; export the profile again to use it as a base.")
+        return data
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def is_delta(manifest):
+    return manifest is not None and "deleted" in manifest
+
+def manifest_state(manifest):
+    """Return {path: entry} for every file the profile had at that export, including files a delta left out as unchanged."""
+    return {entry["path"]: entry for entry in manifest.get("unchanged", []) + manifest.get("files", [])}
+
+def _profile_members(folder_path):
+    members = []
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            abs_path = os.path.join(root, file)
+            rel_path = os.path.relpath(abs_path, folder_path)
+            members.append((abs_path, rel_path))
+    return members
+
+def _diff_members(members, base_manifest):
+    """
+    Split members into those to write and the manifest entries of those
+    unchanged since base_manifest. A file counts as unchanged when its size
+    and mtime match; when only the mtime moved, its hash decides.
+    """
+    previous = manifest_state(base_manifest)
+    changed, unchanged = [], []
+    for abs_path, rel_path in members:
+        old = previous.get(rel_path.replace(os.sep, "/"))
+        st = os.stat(abs_path)
+        if old is not None and old["size"] == st.st_size:
+            if abs(old["mtime"] - st.st_mtime) <= MTIME_TOLERANCE:
+                unchanged.append(old)
+                continue
+            if catalog.file_sha256(abs_path) == old["sha256"]:
+                unchanged.append({**old, "mtime": st.st_mtime})
+                continue
+        changed.append((abs_path, rel_path))
+    present = {rel_path.replace(os.sep, "/") for _, rel_path in members}
+    deleted = sorted(path for path in previous if path not in present)
+    return changed, unchanged, deleted
+
+def export_profile(storage_directory, folder_name, export_path, progress=None, cancel_event=None,
+                   workers=DEFAULT_WORKERS, base=None, manifest_path=None):
     """
     Export a profile folder (including all files and subfolders) as a zip file.
+    Media that is already compressed is stored as-is and the rest is deflated
+    in parallel. progress(done_bytes, total_bytes, done_files, total_files)
+    is called while writing; setting cancel_event raises ExportCancelled.
+
+    With base (a previous export of the profile, full or incremental, or its
+    saved manifest) only files added or changed since then are written; the
+    manifest lists the unchanged ones and the deleted paths, and names the
+    base it applies to. manifest_path additionally saves the manifest there,
+    so the next incremental export does not need this archive.
     """
     folder_path = os.path.join(storage_directory, folder_name)
     if not os.path.isdir(folder_path):
         raise FileNotFoundError(f"Profile folder '{folder_path}' not found.")
 
-    with zipfile.ZipFile(export_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                abs_path = os.path.join(root, file)
-                rel_path = os.path.relpath(abs_path, folder_path)
-                zipf.write(abs_path, arcname=rel_path)
+    members = _profile_members(folder_path)
+    extra = {"id": uuid.uuid4().hex}
+    if base is not None:
+        base_manifest = load_manifest(base)
+        members, unchanged, deleted = _diff_members(members, base_manifest)
+        extra.update(base=base_manifest.get("id"), unchanged=unchanged, deleted=deleted)
+    exporter = ZipExporter(export_path, progress=progress, cancel_event=cancel_event, workers=workers,
+                           manifest_extra=extra)
+    with span("transfer.export_profile", profile=folder_name, files=len(members), incremental=base is not None):
+        exporter.write_all(members)
+    if manifest_path:
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(exporter.manifest_data(), f, indent=1)
+        os.replace(tmp_path, manifest_path)
     return export_path
 
-def import_profile(storage_directory, import_zip_path, folder_name=None):
+def _archive_identity(zip_path):
+    st = os.stat(zip_path)
+    return {"archive": os.path.abspath(zip_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def _check_chain(chain, manifests):
+    if is_delta(manifests[0]):
+        raise ValueError(f"'{chain[0]}' is an incremental export; start the chain with a full export.")
+    for i in range(1, len(chain)):
+        manifest, previous = manifests[i], manifests[i - 1]
+        if not is_delta(manifest):
+            raise ValueError(f"'{chain[i]}' is a full export, not an incremental one.")
+        if manifest.get("base") and previous.get("id") and manifest["base"] != previous["id"]:
+            raise ValueError(f"'{chain[i]}' was not exported against '{chain[i - 1]}'.")
+
+def order_chain(zip_paths):
+    """
+    Sort a full export and its incremental exports into the order they
+    apply in, following the base each delta names.
+    """
+    manifests = {path: load_manifest(path) for path in zip_paths}
+    by_base = {manifest.get("base"): path for path, manifest in manifests.items() if is_delta(manifest)}
+    bases = [path for path, manifest in manifests.items() if not is_delta(manifest)]
+    if len(bases) != 1:
+        raise ValueError("Select exactly one full export and the incremental exports made after it.")
+    chain = bases
+    while manifests[chain[-1]].get("id") in by_base:
+        chain.append(by_base[manifests[chain[-1]]["id"]])
+    if len(chain) != len(zip_paths):
+        raise ValueError("Some of the incremental exports do not follow on from the others.")
+    return chain
+
+def _prune_empty_dirs(path, root):
+    parent = os.path.dirname(path)
+    while parent != root and os.path.isdir(parent) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+
+def _apply_delta(staging_dir, delta_dir, manifest):
+    """Move a delta's extracted files over the staged profile and drop its deleted paths."""
+    for path in manifest["deleted"]:
+        target = safe_member_path(staging_dir, path)
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+        _prune_empty_dirs(target, staging_dir)
+    for entry in manifest.get("files", []):
+        source = safe_member_path(delta_dir, entry["path"])
+        target = safe_member_path(staging_dir, entry["path"])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+    for entry in manifest.get("unchanged", []):
+        # Files whose mtime alone moved are only recorded in the manifest
+        target = safe_member_path(staging_dir, entry["path"])
+        if os.path.isfile(target) and abs(os.path.getmtime(target) - entry["mtime"]) > MTIME_TOLERANCE:
+            os.utime(target, (entry["mtime"], entry["mtime"]))
+    shutil.rmtree(delta_dir)
+
+def _import_chain(chain, staging_dir, progress, cancel_event, workers):
+    """
+    Extract a full export into staging_dir and apply each incremental export
+    on top of it. Progress covers the whole chain. Every applied archive is
+    recorded, so running the same chain again resumes after the last one.
+    """
+    manifests = [load_manifest(path) for path in chain]
+    _check_chain(chain, manifests)
+    identities = [_archive_identity(path) for path in chain]
+    journal_path = os.path.join(staging_dir, CHAIN_JOURNAL_NAME)
+    applied = 0
+    try:
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line, identity in zip(f, identities):
+                if not line.endswith("\n") or json.loads(line) != identity:
+                    break
+                applied += 1
+    except (OSError, ValueError):
+        applied = 0
+
+    sizes = [sum(entry["size"] for entry in manifest.get("files", [])) for manifest in manifests]
+    counts = [len(manifest.get("files", [])) for manifest in manifests]
+    total_bytes, total_files = sum(sizes), sum(counts)
+
+    for i in range(applied, len(chain)):
+        done_bytes, done_files = sum(sizes[:i]), sum(counts[:i])
+
+        def report(d_bytes, t_bytes, d_files, t_files, done_bytes=done_bytes, done_files=done_files):
+            progress(done_bytes + d_bytes, total_bytes, done_files + d_files, total_files)
+
+        if i == 0:
+            ZipImporter(chain[0], staging_dir, progress=report if progress else None, cancel_event=cancel_event,
+                        workers=workers).run()
+        else:
+            delta_dir = os.path.join(staging_dir, DELTA_STAGING_NAME)
+            ZipImporter(chain[i], delta_dir, progress=report if progress else None, cancel_event=cancel_event,
+                        workers=workers).run()
+            _apply_delta(staging_dir, delta_dir, manifests[i])
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(identities[i]) + "\n")
+    os.remove(journal_path)
+
+def import_profile(storage_directory, import_zip_path, folder_name=None, progress=None, cancel_event=None,
+                   workers=DEFAULT_IMPORT_WORKERS):
     """
     Import a profile from a zip file. If folder_name is not provided, use the zip filename.
+    The archive is validated and extracted into a staging folder, then renamed into place,
+    so a failed or cancelled import never leaves a half-imported profile behind. Running
+    the same import again resumes from the staging folder.
+
+    import_zip_path may also be a list: a full export followed by incremental exports
+    made against it, in order (see order_chain). The folder name then defaults to the
+    full export's name.
     """
-    if not os.path.isfile(import_zip_path):
-        raise FileNotFoundError(f"Zip file '{import_zip_path}' not found.")
+    chain = [import_zip_path] if isinstance(import_zip_path, (str, os.PathLike)) else list(import_zip_path)
+    for zip_path in chain:
+        if not os.path.isfile(zip_path):
+            raise FileNotFoundError(f"Zip file '{zip_path}' not found.")
 
     if folder_name is None:
-        folder_name = os.path.splitext(os.path.basename(import_zip_path))[0]
+        folder_name = os.path.splitext(os.path.basename(chain[0]))[0]
 
     dest_folder = os.path.join(storage_directory, folder_name)
     if os.path.exists(dest_folder):
         raise FileExistsError(f"Destination folder '{dest_folder}' already exists.")
 
-    os.makedirs(dest_folder, exist_ok=True)
-    with zipfile.ZipFile(import_zip_path, "r") as zipf:
-        zipf.extractall(dest_folder)
+    staging_dir = staging_path(storage_directory, folder_name)
+    with span("transfer.import_profile", profile=folder_name, archives=len(chain)):
+        if len(chain) > 1:
+            _import_chain(chain, staging_dir, progress, cancel_event, workers)
+        else:
+            with zipfile.ZipFile(chain[0], "r") as zipf:
+                if is_delta(read_manifest_data(zipf)):
+                    raise ValueError(f"'{chain[0]}' is an incremental export; import it together with its base.")
+            importer = ZipImporter(chain[0], staging_dir, progress=progress, cancel_event=cancel_event, workers=workers)
+            importer.run()
+    os.rename(staging_dir, dest_folder)
+    catalog.resync_profile(storage_directory, folder_name)
     return dest_folder
 
 def list_profiles(storage_directory):
@@ -43,5 +247,5 @@ def list_profiles(storage_directory):
     """
     return [
         name for name in os.listdir(storage_directory)
-        if os.path.isdir(os.path.join(storage_directory, name))
-    ]
\ No newline at end of file
+        if not name.startswith(".") and os.path.isdir(os.path.join(storage_directory, name))
+    ]
@@ -0,0 +1,72 @@
+import time
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class ProgressDialog(tk.Toplevel):
+    """
+    Small progress window for background jobs. report() may be called from
+    any thread; updates are marshalled to the Tk thread with master.after and
+    throttled so a fast job does not flood the event loop. Cancel sets
+    cancel_event, which the job is expected to poll.
+    """
+
+    def __init__(self, master, title, min_interval=0.1):
+        super().__init__(master)
+        self.title(title)
+        self.resizable(False, False)
+        self.transient(master)
+        self.cancel_event = threading.Event()
+        self.min_interval = min_interval
+        self._last_report = 0.0
+
+        self.status_var = tk.StringVar(value="Starting...")
+        tk.Label(self, textvariable=self.status_var, anchor="w", width=50).pack(fill="x", padx=10, pady=(10, 4))
+        self.progressbar = ttk.Progressbar(self, orient="horizontal", length=360, mode="determinate", maximum=1000)
+        self.progressbar.pack(padx=10, pady=4)
+        self.cancel_btn = tk.Button(self, text="Cancel", command=self.cancel)
+        self.cancel_btn.pack(pady=(4, 10))
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.status_var.set("Cancelling...")
+        self.cancel_btn.config(state="disabled")
+
+    def report(self, done, total, text=""):
+        """Thread-safe progress update; done and total are in any common unit."""
+        now = time.monotonic()
+        if done < total and now - self._last_report < self.min_interval:
+            return
+        self._last_report = now
+        try:
+            self.master.after(0, lambda: self._apply(done, total, text))
+        except RuntimeError:
+            pass  # main loop is gone
+
+    def report_transfer(self, done_bytes, total_bytes, done_files, total_files):
+        """Progress callback signature used by the transfer helpers."""
+        self.report(
+            done_bytes, total_bytes,
+            f"{done_files}/{total_files} files, {format_bytes(done_bytes)} of {format_bytes(total_bytes)}"
+        )
+
+    def _apply(self, done, total, text):
+        if not self.winfo_exists() or self.cancel_event.is_set():
+            return
+        self.progressbar["value"] = 1000 * done / total if total else 1000
+        if text:
+            self.status_var.set(text)
+
+    def close(self):
+        if self.winfo_exists():
+            self.destroy()
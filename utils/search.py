@@ -0,0 +1,276 @@
+import os
+import re
+import json
+import threading
+from bisect import bisect_left
+
+from utils import storage
+
+INDEX_FILE = ".search_index.json"
+INDEX_VERSION = 1
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(value):
+    """Split a field value into lowercase search tokens."""
+    if isinstance(value, (list, tuple)):
+        tokens = set()
+        for item in value:
+            tokens |= tokenize(item)
+        return tokens
+    text = str(value or "").lower()
+    tokens = set(TOKEN_RE.findall(text))
+    for word in text.split():
+        # Keep whole emails, handles and URLs searchable as one token too
+        word = word.strip(".,;:()[]<>\"'")
+        if word and not word.isalnum():
+            tokens.add(word)
+    digits = re.sub(r"\D", "", text)
+    if len(digits) >= 4:
+        tokens.add(digits)  # phone numbers match regardless of formatting
+    return tokens
+
+
+def _deletions(token):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _max_edits(term):
+    return 0 if len(term) < 4 else 1
+
+
+class ProfileSearchIndex:
+    """
+    Inverted index over the profile fields of storage.DEFAULT_DATA plus the folder
+    name. Terms match exact tokens, token prefixes and (for terms of four or
+    more characters) tokens one edit away, found through a deletion index.
+    The index is persisted under the storage directory together with each
+    data.json mtime, so syncing only re-reads profiles that changed.
+    """
+
+    def __init__(self, storage_directory):
+        self.storage_directory = storage_directory
+        self.path = os.path.join(storage_directory, INDEX_FILE)
+        self._lock = threading.RLock()
+        self._postings = {}   # token -> set of folder names
+        self._documents = {}  # folder name -> (data.json mtime, tokens)
+        self._deletes = {}    # deletion variant -> set of tokens
+        self._sorted_tokens = None
+        self._dirty = False
+        self.loaded = False
+
+    # --- Maintenance ------------------------------------------------------
+
+    def _add_document(self, folder_name, mtime, tokens):
+        self._remove_document(folder_name)
+        self._documents[folder_name] = (mtime, tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                self._sorted_tokens = None
+                if len(token) >= 4:
+                    for variant in _deletions(token):
+                        self._deletes.setdefault(variant, set()).add(token)
+            postings.add(folder_name)
+        self._dirty = True
+
+    def _remove_document(self, folder_name):
+        document = self._documents.pop(folder_name, None)
+        if document is None:
+            return
+        for token in document[1]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(folder_name)
+            if not postings:
+                del self._postings[token]
+                self._sorted_tokens = None
+                if len(token) >= 4:
+                    for variant in _deletions(token):
+                        variants = self._deletes.get(variant)
+                        if variants is not None:
+                            variants.discard(token)
+                            if not variants:
+                                del self._deletes[variant]
+        self._dirty = True
+
+    @staticmethod
+    def document_tokens(folder_name, data):
+        tokens = tokenize(folder_name)
+        for field in storage.DEFAULT_DATA:
+            tokens |= tokenize(data.get(field, ""))
+        return tokens
+
+    def update_profile(self, folder_name, data, mtime=None):
+        """Index (or re-index) one profile from its data.json contents."""
+        if mtime is None:
+            mtime = self._data_mtime(folder_name)
+        with self._lock:
+            self._add_document(folder_name, mtime, self.document_tokens(folder_name, data))
+
+    def remove_profile(self, folder_name):
+        with self._lock:
+            self._remove_document(folder_name)
+
+    def _data_mtime(self, folder_name):
+        try:
+            return os.stat(os.path.join(self.storage_directory, folder_name, "data.json")).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        """Load the persisted index, if any."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = None
+        with self._lock:
+            if stored and stored.get("version") == INDEX_VERSION:
+                for folder_name, (mtime, tokens) in stored["documents"].items():
+                    self._add_document(folder_name, mtime, set(tokens))
+            self._dirty = False
+            self.loaded = True
+
+    def sync(self, folders=None):
+        """
+        Bring the index up to date with disk: one stat per profile, and only
+        profiles whose data.json changed are read again.
+        """
+        if not self.loaded:
+            self.load()
+        if folders is None:
+            folders = storage.list_subfolders(self.storage_directory)
+        present = set(folders)
+        with self._lock:
+            for folder_name in [f for f in self._documents if f not in present]:
+                self._remove_document(folder_name)
+            known = {f: doc[0] for f, doc in self._documents.items()}
+        for folder_name in folders:
+            mtime = self._data_mtime(folder_name)
+            if folder_name in known and known[folder_name] == mtime:
+                continue
+            data = storage.read_data_json(self.storage_directory, folder_name) or {}
+            self.update_profile(folder_name, data, mtime)
+        self.save()
+
+    def refresh_profiles(self, folders):
+        """
+        Bring only the given profiles up to date, e.g. those a watcher saw
+        change: removed profiles are dropped and changed ones read again.
+        """
+        if not self.loaded:
+            self.load()
+        for folder_name in folders:
+            if not os.path.isdir(os.path.join(self.storage_directory, folder_name)):
+                self.remove_profile(folder_name)
+                continue
+            mtime = self._data_mtime(folder_name)
+            with self._lock:
+                document = self._documents.get(folder_name)
+            if document is not None and document[0] == mtime:
+                continue
+            data = storage.read_data_json(self.storage_directory, folder_name) or {}
+            self.update_profile(folder_name, data, mtime)
+        self.save()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            stored = {
+                "version": INDEX_VERSION,
+                "documents": {f: [mtime, sorted(tokens)] for f, (mtime, tokens) in self._documents.items()}
+            }
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(stored, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # the index is only a cache; it is rebuilt on the next sync
+
+    # --- Queries ----------------------------------------------------------
+
+    def _match_term(self, term):
+        """Return {folder name: score} for one query term."""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        scores = {}
+
+        def credit(token, score):
+            for folder_name in self._postings.get(token, ()):
+                if scores.get(folder_name, 0) < score:
+                    scores[folder_name] = score
+
+        credit(term, 3)
+        tokens = self._sorted_tokens
+        i = bisect_left(tokens, term)
+        while i < len(tokens) and tokens[i].startswith(term):
+            credit(tokens[i], 2)
+            i += 1
+        if _max_edits(term):
+            candidates = set(self._deletes.get(term, ()))
+            for variant in _deletions(term):
+                if variant in self._postings:
+                    candidates.add(variant)
+                candidates |= self._deletes.get(variant, set())
+            for token in candidates:
+                credit(token, 1)
+        return scores
+
+    def search(self, query, limit=None):
+        """
+        Return folder names matching every term of query, best matches first.
+        """
+        terms = [t for t in tokenize(query) if t]
+        if not terms:
+            return []
+        with self._lock:
+            results = None
+            for term in sorted(terms, key=len, reverse=True):
+                scores = self._match_term(term)
+                if results is None:
+                    results = scores
+                else:
+                    results = {f: s + scores[f] for f, s in results.items() if f in scores}
+                if not results:
+                    return []
+        ranked = sorted(results, key=lambda f: (-results[f], f.lower()))
+        return ranked[:limit] if limit else ranked
+
+
+def get_search_index(storage_directory):
+    """Return the shared search index for storage_directory (not yet synced)."""
+    key = os.path.abspath(storage_directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ProfileSearchIndex(storage_directory)
+        return index
+
+
+# --- Hooks used by utils.storage ------------------------------------------
+
+def _loaded_index(storage_directory):
+    with _indexes_lock:
+        index = _indexes.get(os.path.abspath(storage_directory))
+    return index if index is not None and index.loaded else None
+
+
+def record_profile(storage_directory, folder_name, data):
+    index = _loaded_index(storage_directory)
+    if index is not None:
+        index.update_profile(folder_name, data)
+
+
+def forget_profile(storage_directory, folder_name):
+    index = _loaded_index(storage_directory)
+    if index is not None:
+        index.remove_profile(folder_name)
@@ -0,0 +1,76 @@
+import sys
+import time
+import builtins
+from contextlib import contextmanager
+
+# Imports faster than this are left out of the report
+MIN_IMPORT_MS = 1.0
+# How many levels of nested imports to list under each phase
+IMPORT_DEPTH = 2
+
+
+class StartupProfiler:
+    """
+    Records how long each startup phase takes and which modules were
+    imported during it. Imports are timed by wrapping __import__; the time
+    of a module includes the modules it imports in turn, which are listed
+    below it down to IMPORT_DEPTH levels.
+    """
+
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.phases = []   # (name, ms, [(started, depth, module, ms)])
+        self.marks = []    # (name, ms since start)
+        self._imports = None
+        self._depth = 0
+        self._original_import = None
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, *args, **kwargs):
+        if name in sys.modules or self._imports is None:
+            return self._original_import(name, *args, **kwargs)
+        self._depth += 1
+        began = time.perf_counter()
+        try:
+            return self._original_import(name, *args, **kwargs)
+        finally:
+            self._depth -= 1
+            if self._depth < IMPORT_DEPTH:
+                self._imports.append((began, self._depth, name, (time.perf_counter() - began) * 1000))
+
+    @contextmanager
+    def phase(self, name):
+        outer = self._imports
+        self._imports = []
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - began) * 1000, self._imports))
+            self._imports = outer
+            self.mark(name)
+
+    def mark(self, name):
+        self.marks.append((name, (time.perf_counter() - self.start) * 1000))
+
+    def report(self, file=None):
+        file = file or sys.stderr
+        print("Startup profile (ms):", file=file)
+        for name, ms, imports in self.phases:
+            print(f"  {ms:8.1f}  {name}", file=file)
+            for _, depth, module, module_ms in sorted(imports):
+                if module_ms >= MIN_IMPORT_MS:
+                    print(f"  {module_ms:8.1f}  {'    ' * (depth + 1)}import {module}", file=file)
+        for name, ms in self.marks:
+            if not any(name == phase for phase, _, _ in self.phases):
+                print(f"  {ms:8.1f}  {name} (since start)", file=file)
+        print(f"  {(time.perf_counter() - self.start) * 1000:8.1f}  total", file=file)
+        file.flush()
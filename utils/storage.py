@@ -1,5 +1,10 @@
 import os
-import json
+from utils.thumbnails import invalidate_tree
+from utils import catalog, search
+from utils.blob_store import get_blob_store
+from utils.folder_scanner import folder_listing
+from utils.profile_store import get_profile_store
+from utils.instrumentation import span
 
 DEFAULT_DATA = {
     "displayname": "",
@@ -12,47 +17,44 @@ DEFAULT_DATA = {
 }
 
 def list_subfolders(storage_directory):
-    if not os.path.isdir(storage_directory):
-        return []
-    return [
-        name for name in os.listdir(storage_directory)
-        if os.path.isdir(os.path.join(storage_directory, name))
-    ]
+    # Cached until the storage directory's mtime changes
+    return folder_listing.list(storage_directory)
 
 def create_storage_folder(storage_directory, folder_name, initial_data=None):
     path = os.path.join(storage_directory, folder_name)
     os.makedirs(path, exist_ok=True)
-    data_path = os.path.join(path, "data.json")
     if initial_data is None:
         initial_data = {}
     # Merge defaults with any provided initial data
     data = {**DEFAULT_DATA, **initial_data}
-    with open(data_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    get_profile_store(storage_directory).write(folder_name, data)
     return path
 
 def delete_storage_folder(storage_directory, folder_name):
     import shutil
     path = os.path.join(storage_directory, folder_name)
     if os.path.isdir(path):
-        shutil.rmtree(path)
+        invalidate_tree(storage_directory, path)
+        store = get_blob_store(storage_directory)
+        if store is not None:
+            store.unlink_tree(path)
+        else:
+            shutil.rmtree(path)
+        get_profile_store(storage_directory).forget(folder_name)
+        catalog.forget_profile(storage_directory, folder_name)
+        search.forget_profile(storage_directory, folder_name)
         return True
     return False
 
 def read_data_json(storage_directory, folder_name):
-    data_path = os.path.join(storage_directory, folder_name, "data.json")
-    if not os.path.isfile(data_path):
-        return None
-    with open(data_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with span("storage.read_data_json", profile=folder_name):
+        return get_profile_store(storage_directory).get(folder_name)
 
 def update_data_json(storage_directory, folder_name, updates):
-    data_path = os.path.join(storage_directory, folder_name, "data.json")
-    data = {}
-    if os.path.isfile(data_path):
-        with open(data_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    data.update(updates)
-    with open(data_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
-    return data
\ No newline at end of file
+    """
+    Merge updates into the profile's data.json. Inside
+    get_profile_store(storage_directory).batch() the write is deferred until
+    the batch ends, so many updates cost one write per profile.
+    """
+    with span("storage.update_data_json", profile=folder_name):
+        return get_profile_store(storage_directory).update(folder_name, updates)
\ No newline at end of file
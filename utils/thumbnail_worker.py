@@ -0,0 +1,97 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+# Poster frames each start a video decoder, so far fewer run at once
+DEFAULT_VIDEO_WORKERS = 2
+
+
+class ThumbnailLoader:
+    """
+    Decodes thumbnails on a worker pool and hands the results back to the Tk
+    thread through master.after. Every request belongs to a generation;
+    cancel_pending() starts a new one so results for an album that is no
+    longer shown are dropped instead of delivered, and tells the cancel
+    listeners so views can request what they still show again.
+    """
+
+    def __init__(self, master, cache, max_workers=DEFAULT_WORKERS, video_workers=DEFAULT_VIDEO_WORKERS):
+        self.master = master
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+        # Separate pool so slow video extraction never holds up image thumbnails
+        self._video_executor = ThreadPoolExecutor(max_workers=video_workers, thread_name_prefix="poster-frame")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._futures = []
+        self._cancel_listeners = []
+
+    def add_cancel_listener(self, listener):
+        """Call listener() on the Tk thread after every cancel_pending()."""
+        self._cancel_listeners.append(listener)
+
+    def remove_cancel_listener(self, listener):
+        if listener in self._cancel_listeners:
+            self._cancel_listeners.remove(listener)
+
+    def request(self, file_path, callback, decode=None):
+        """
+        Queue file_path for decoding. callback(image, error) runs on the Tk
+        thread with a PIL image, or with None and the exception on failure.
+        decode(file_path) overrides the default cache lookup.
+        """
+        return self._submit(self._executor, file_path, callback, decode or self.cache.get_or_create)
+
+    def request_poster_frame(self, file_path, callback):
+        """Like request(), for a video: its poster frame is extracted once and cached."""
+        from utils.video_frames import extract_poster_frame
+
+        return self._submit(
+            self._video_executor, file_path, callback,
+            lambda path: self.cache.get_or_create(path, open_image=extract_poster_frame)
+        )
+
+    def _submit(self, executor, file_path, callback, decode):
+        with self._lock:
+            generation = self._generation
+            future = executor.submit(self._run, generation, file_path, decode, callback)
+            self._futures.append(future)
+        return future
+
+    def _run(self, generation, file_path, decode, callback):
+        if generation != self._generation:
+            return
+        try:
+            image, error = decode(file_path), None
+        except Exception as e:
+            image, error = None, e
+        if generation != self._generation:
+            return
+        try:
+            self.master.after(0, lambda: self._deliver(generation, callback, image, error))
+        except RuntimeError:
+            pass  # main loop is gone
+
+    def _deliver(self, generation, callback, image, error):
+        if generation != self._generation:
+            return
+        try:
+            callback(image, error)
+        except Exception:
+            pass  # the target widget was destroyed in the meantime
+
+    def cancel_pending(self):
+        """Drop all queued jobs and ignore results of jobs already running."""
+        with self._lock:
+            self._generation += 1
+            for future in self._futures:
+                future.cancel()
+            self._futures = []
+        for listener in list(self._cancel_listeners):
+            listener()
+
+    def shutdown(self):
+        self.cancel_pending()
+        self._executor.shutdown(wait=False)
+        self._video_executor.shutdown(wait=False)
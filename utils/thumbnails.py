@@ -0,0 +1,208 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from utils.instrumentation import span, count
+
+CACHE_FOLDER = ".thumbnails"
+THUMBNAIL_SIZE = (100, 100)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _load_pil():
+    """Import Pillow on first use; it is slow to import and not needed to start the app."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def _path_key(file_path):
+    path = os.path.normcase(os.path.abspath(file_path))
+    return hashlib.sha1(path.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+class ThumbnailCache:
+    """
+    On-disk thumbnail cache. Entries are named "<path hash>-<mtime>-<size>.png",
+    so a changed file simply misses and its stale entry is replaced. The total
+    size is capped and the least recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, size=THUMBNAIL_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.size = size
+        self._lock = threading.RLock()
+        self._entries = None  # OrderedDict name -> bytes, oldest first
+        self._by_path = {}    # path hash -> name
+        self._total = 0
+
+    def _load_index(self):
+        if self._entries is not None:
+            return
+        found = []
+        if os.path.isdir(self.cache_dir):
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".png"):
+                        st = entry.stat()
+                        found.append((st.st_mtime, entry.name, st.st_size))
+        found.sort()
+        self._entries = OrderedDict()
+        self._by_path = {}
+        self._total = 0
+        for _, name, size in found:
+            self._entries[name] = size
+            self._by_path[name.split("-", 1)[0]] = name
+            self._total += size
+
+    def _entry_name(self, file_path):
+        st = os.stat(file_path)
+        return f"{_path_key(file_path)}-{st.st_mtime_ns}-{st.st_size}.png"
+
+    def _remove_entry(self, name):
+        size = self._entries.pop(name, None)
+        if size is None:
+            return
+        self._total -= size
+        path_key = name.split("-", 1)[0]
+        if self._by_path.get(path_key) == name:
+            del self._by_path[path_key]
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove_entry(oldest)
+
+    def get(self, file_path):
+        """Return the cached thumbnail for file_path, or None on a miss."""
+        Image = _load_pil()
+        if Image is None:
+            return None
+        try:
+            name = self._entry_name(file_path)
+        except OSError:
+            return None
+        with self._lock:
+            self._load_index()
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        cached_path = os.path.join(self.cache_dir, name)
+        try:
+            os.utime(cached_path)
+            with Image.open(cached_path) as img:
+                img.load()
+                return img.copy()
+        except OSError:
+            with self._lock:
+                self._remove_entry(name)
+            return None
+
+    def put(self, file_path, image):
+        """Store a thumbnail for file_path, replacing any stale entry."""
+        try:
+            name = self._entry_name(file_path)
+        except OSError:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cached_path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{cached_path}.{threading.get_ident()}.tmp"
+        try:
+            if image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                image = image.convert("RGBA")
+            image.save(tmp_path, "PNG")
+            os.replace(tmp_path, cached_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._load_index()
+            path_key = name.split("-", 1)[0]
+            stale = self._by_path.get(path_key)
+            if stale and stale != name:
+                self._remove_entry(stale)
+            if name in self._entries:
+                self._total -= self._entries[name]
+            self._entries[name] = os.path.getsize(cached_path)
+            self._entries.move_to_end(name)
+            self._by_path[path_key] = name
+            self._total += self._entries[name]
+            self._evict()
+
+    def get_or_create(self, file_path, open_image=None):
+        """
+        Return a thumbnail for file_path, decoding the original only on a miss.
+        open_image(file_path) returns the full-size PIL image for files Pillow
+        cannot open itself, such as a video's poster frame.
+        """
+        img = self.get(file_path)
+        if img is not None:
+            count("thumbnail.cache_hit")
+            return img
+        count("thumbnail.cache_miss")
+        with span("thumbnail.decode", ext=os.path.splitext(file_path)[1].lower()):
+            with (open_image or _load_pil().open)(file_path) as img:
+                img.thumbnail(self.size)
+                thumb = img.copy()
+        self.put(file_path, thumb)
+        return thumb
+
+    def invalidate(self, file_path):
+        """Drop any cached thumbnail for file_path."""
+        with self._lock:
+            self._load_index()
+            name = self._by_path.get(_path_key(file_path))
+            if name:
+                self._remove_entry(name)
+
+    def invalidate_tree(self, dir_path):
+        """Drop cached thumbnails for every file below dir_path."""
+        if not os.path.isdir(dir_path):
+            return
+        for root, dirs, files in os.walk(dir_path):
+            for file in files:
+                self.invalidate(os.path.join(root, file))
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for name in list(self._entries):
+                self._remove_entry(name)
+
+
+def get_thumbnail_cache(storage_directory, max_bytes=None):
+    """Return the shared thumbnail cache stored under storage_directory."""
+    cache_dir = os.path.abspath(os.path.join(storage_directory, CACHE_FOLDER))
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = ThumbnailCache(cache_dir, max_bytes=max_bytes or DEFAULT_MAX_BYTES)
+            _caches[cache_dir] = cache
+        elif max_bytes:
+            cache.max_bytes = max_bytes
+        return cache
+
+
+def invalidate(storage_directory, file_path):
+    """Drop the cached thumbnail for file_path, if a cache exists."""
+    if os.path.isdir(os.path.join(storage_directory, CACHE_FOLDER)):
+        get_thumbnail_cache(storage_directory).invalidate(file_path)
+
+
+def invalidate_tree(storage_directory, dir_path):
+    """Drop cached thumbnails for every file below dir_path, if a cache exists."""
+    if os.path.isdir(os.path.join(storage_directory, CACHE_FOLDER)):
+        get_thumbnail_cache(storage_directory).invalidate_tree(dir_path)
@@ -0,0 +1,163 @@
+import os
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Seconds into the video to take the poster frame from; the very first
+# frame is often black. Videos shorter than this fall back to the start.
+POSTER_OFFSET = 1.0
+SNAPSHOT_TIMEOUT = 10.0
+POLL_INTERVAL = 0.05
+
+_extractors = []
+_extractors_lock = threading.Lock()
+_failed = set()  # (path, mtime_ns, size) of videos no extractor could handle
+
+_local = threading.local()
+_scene_instances = []  # (vlc instance, output folder) of every thread that extracted a frame
+_scene_instances_lock = threading.Lock()
+
+
+def register_extractor(extractor, first=False):
+    """
+    Add a poster-frame extractor. extractor(file_path) returns a PIL image,
+    or None if it cannot handle the file. Extractors are tried in order;
+    first=True puts this one ahead of the built-in ones.
+    """
+    with _extractors_lock:
+        if first:
+            _extractors.insert(0, extractor)
+        else:
+            _extractors.append(extractor)
+
+
+def extract_poster_frame(file_path):
+    """
+    Return a PIL image of a frame near the start of the video at file_path.
+    Raises ValueError if no extractor could produce one; such videos are
+    remembered until they change so they are not retried on every visit.
+    """
+    st = os.stat(file_path)
+    key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+    if key in _failed:
+        raise ValueError(f"No poster frame available for '{file_path}'.")
+    with _extractors_lock:
+        extractors = list(_extractors)
+    for extractor in extractors:
+        try:
+            img = extractor(file_path)
+        except Exception:
+            img = None
+        if img is not None:
+            return img
+    _failed.add(key)
+    raise ValueError(f"No poster frame available for '{file_path}'.")
+
+
+def _read_snapshot(path):
+    try:
+        with Image.open(path) as img:
+            img.load()
+            return img.copy()
+    except OSError:
+        return None  # still being written
+
+
+def vlc_extractor(file_path):
+    """
+    Grab a frame with libvlc's scene filter, decoding without a window or
+    audio output. Returns None when python-vlc or Pillow is not installed.
+    """
+    if Image is None:
+        return None
+    try:
+        import vlc  # pip install python-vlc
+    except ImportError:
+        return None
+
+    scene = _scene_instance(vlc)
+    if scene is None:
+        return None
+    instance, tmp_dir = scene
+    snapshot = os.path.join(tmp_dir, "poster.png")
+    for offset in (POSTER_OFFSET, 0):
+        try:
+            os.remove(snapshot)  # left over from the previous video
+        except OSError:
+            pass
+        img = _vlc_snapshot(vlc, instance, file_path, offset, snapshot)
+        if img is not None:
+            return img
+    return None
+
+
+def _scene_instance(vlc):
+    """
+    Return this thread's (instance, output folder) for the scene filter,
+    creating them on first use. The filter's options are global to an
+    instance, so threads cannot share one, but each worker thread reuses its
+    own instead of loading libvlc's plugins for every video.
+    """
+    scene = getattr(_local, "scene", None)
+    if scene is not None:
+        return scene
+    tmp_dir = tempfile.mkdtemp(prefix="poster-")
+    instance = vlc.Instance(
+        "--intf=dummy", "--vout=dummy", "--no-audio", "--no-video-title-show",
+        "--avcodec-hw=none", "--video-filter=scene", "--scene-format=png",
+        "--scene-replace", "--scene-prefix=poster", f"--scene-path={tmp_dir}",
+        "--scene-ratio=100000",
+    )
+    if instance is None:  # libvlc failed to start
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+    scene = _local.scene = (instance, tmp_dir)
+    with _scene_instances_lock:
+        if not _scene_instances:
+            atexit.register(release_scene_instances)
+        _scene_instances.append(scene)
+    return scene
+
+
+def release_scene_instances():
+    """Release every thread's scene-filter instance and remove its output folder."""
+    with _scene_instances_lock:
+        scenes = list(_scene_instances)
+        _scene_instances.clear()
+    for instance, tmp_dir in scenes:
+        instance.release()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _vlc_snapshot(vlc, instance, file_path, offset, snapshot):
+    media = instance.media_new(file_path)
+    if offset:
+        media.add_option(f":start-time={offset}")
+    player = instance.media_player_new()
+    player.set_media(media)
+    try:
+        player.play()
+        deadline = time.monotonic() + SNAPSHOT_TIMEOUT
+        while time.monotonic() < deadline:
+            if os.path.exists(snapshot):
+                img = _read_snapshot(snapshot)
+                if img is not None:
+                    return img
+            if player.get_state() in (vlc.State.Ended, vlc.State.Error):
+                break
+            time.sleep(POLL_INTERVAL)
+        return _read_snapshot(snapshot) if os.path.exists(snapshot) else None
+    finally:
+        player.stop()
+        player.release()
+        media.release()
+
+
+register_extractor(vlc_extractor)
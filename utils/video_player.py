@@ -0,0 +1,77 @@
+import os
+import atexit
+import threading
+
+# Idle media players kept around for the next preview; more than this are released
+MAX_IDLE_PLAYERS = 2
+VLC_ARGS = ("--no-video-title-show", "--avcodec-hw=none")
+
+_instance = None
+_idle_players = []
+_lock = threading.Lock()
+
+
+def get_instance():
+    """
+    Return the process-wide libvlc instance, creating it on first use.
+    Creating an instance scans VLC's plugins, which is the slow part of
+    opening a video, so it is only paid once. Raises ImportError when
+    python-vlc is not installed.
+    """
+    global _instance
+    with _lock:
+        if _instance is None:
+            import vlc  # pip install python-vlc
+            _instance = vlc.Instance(*VLC_ARGS)
+        return _instance
+
+
+def acquire_player():
+    """Return an idle media player from the pool, or a new one."""
+    instance = get_instance()
+    with _lock:
+        if _idle_players:
+            return _idle_players.pop()
+    return instance.media_player_new()
+
+
+def attach_window(player, window_id):
+    """Render the player's video into the native window window_id."""
+    if os.name == "nt":
+        player.set_hwnd(window_id)
+    elif os.name == "posix":
+        player.set_xwindow(window_id)
+    elif os.name == "darwin":
+        player.set_nsobject(window_id)
+
+
+def release_player(player):
+    """
+    Stop player, detach it from its media and window, and return it to the
+    pool. Must be called before the window it renders into is destroyed.
+    """
+    try:
+        player.stop()
+        player.set_media(None)
+        attach_window(player, 0)
+    except Exception:
+        player.release()  # leave a player in an unknown state out of the pool
+        return
+    with _lock:
+        if len(_idle_players) < MAX_IDLE_PLAYERS:
+            _idle_players.append(player)
+            return
+    player.release()
+
+
+@atexit.register
+def shutdown():
+    """Release pooled players and the shared instance."""
+    global _instance
+    with _lock:
+        players, _idle_players[:] = list(_idle_players), []
+        instance, _instance = _instance, None
+    for player in players:
+        player.release()
+    if instance is not None:
+        instance.release()
@@ -0,0 +1,342 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+
+DEFAULT_POLL_INTERVAL = 5.0
+# Every this many polls, files are re-stat'ed even in directories whose mtime
+# did not change, to catch files rewritten in place
+FULL_SCAN_EVERY = 12
+# inotify events arriving within this window are delivered as one batch
+COALESCE_SECONDS = 0.1
+MAX_BATCH_SECONDS = 1.0
+IGNORED_SUFFIXES = (".tmp", ".part", ".partial")
+
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+RESCAN = "rescan"
+
+
+class WatchEvent:
+    """
+    One change below the storage directory. scope is "profile" (a profile
+    folder or its data.json), "album" (an album folder or a folder inside one)
+    or "file" (a file inside an album). album is the album's path relative to
+    the profile, e.g. "album1/subfolder1". A RESCAN event with scope "storage"
+    means changes were lost and everything should be reloaded.
+    """
+
+    __slots__ = ("kind", "scope", "profile", "album", "name", "path")
+
+    def __init__(self, kind, scope, profile=None, album=None, name=None, path=None):
+        self.kind = kind
+        self.scope = scope
+        self.profile = profile
+        self.album = album
+        self.name = name
+        self.path = path
+
+    def __repr__(self):
+        return f"WatchEvent({self.kind!r}, {self.scope!r}, profile={self.profile!r}, album={self.album!r}, name={self.name!r})"
+
+
+def classify(root, path, kind, is_dir):
+    """Map a change at path to a WatchEvent, or None for paths the app does not show."""
+    rel = os.path.relpath(path, root)
+    parts = rel.split(os.sep)
+    if rel == "." or any(part.startswith(".") or part == ".." for part in parts):
+        return None
+    if parts[-1].endswith(IGNORED_SUFFIXES):
+        return None
+    if len(parts) == 1:
+        return WatchEvent(kind, "profile", parts[0], path=path) if is_dir else None
+    if len(parts) == 2 and not is_dir:
+        if parts[1] != "data.json":
+            return None
+        return WatchEvent(MODIFIED if kind == ADDED else kind, "profile", parts[0], path=path)
+    if is_dir:
+        return WatchEvent(kind, "album", parts[0], os.path.join(*parts[1:]), path=path)
+    return WatchEvent(kind, "file", parts[0], os.path.join(*parts[1:-1]), parts[-1], path=path)
+
+
+class _BaseWatcher:
+    def __init__(self, root, callback):
+        self.root = os.path.abspath(root)
+        self.callback = callback
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"{type(self).__name__}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _emit(self, events):
+        events = [event for event in events if event is not None]
+        if events:
+            try:
+                self.callback(events)
+            except Exception:
+                pass  # a failing consumer must not kill the watcher
+
+
+class PollingWatcher(_BaseWatcher):
+    """
+    Portable watcher that compares scandir snapshots. Each poll stats every
+    directory and re-lists only those whose mtime changed, so an idle tree
+    costs one stat per directory (plus each profile's data.json). Files
+    rewritten in place do not touch their directory's mtime; they are caught
+    by a full re-stat every FULL_SCAN_EVERY polls. This is also the backend
+    to use on network shares, where inotify does not see remote changes.
+    """
+
+    def __init__(self, root, callback, interval=DEFAULT_POLL_INTERVAL):
+        super().__init__(root, callback)
+        self.interval = interval
+        self._dirs = {}  # dir path -> (mtime_ns, {name: (is_dir, size, mtime_ns)})
+
+    @staticmethod
+    def _list(dir_path):
+        entries = {}
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries[entry.name] = (is_dir, None if is_dir else st.st_size, None if is_dir else st.st_mtime_ns)
+        return entries
+
+    def snapshot(self):
+        """Take the initial snapshot without emitting events."""
+        self._dirs = {}
+        stack = [self.root]
+        while stack:
+            dir_path = stack.pop()
+            try:
+                mtime = os.stat(dir_path).st_mtime_ns
+                entries = self._list(dir_path)
+            except OSError:
+                continue
+            self._dirs[dir_path] = (mtime, entries)
+            stack.extend(os.path.join(dir_path, name) for name, info in entries.items() if info[0])
+
+    def poll(self, full=False):
+        """Compare the tree against the last snapshot and return the changes."""
+        events = []
+        stack = [self.root]
+        seen = set()
+        while stack:
+            dir_path = stack.pop()
+            seen.add(dir_path)
+            old_mtime, old_entries = self._dirs.get(dir_path, (None, {}))
+            try:
+                mtime = os.stat(dir_path).st_mtime_ns
+                changed = full or mtime != old_mtime
+                entries = self._list(dir_path) if changed else old_entries
+            except OSError:
+                continue
+            if changed:
+                self._dirs[dir_path] = (mtime, entries)
+                for name in old_entries.keys() - entries.keys():
+                    self._removed(os.path.join(dir_path, name), old_entries[name][0], events)
+                for name, info in entries.items():
+                    old = old_entries.get(name)
+                    path = os.path.join(dir_path, name)
+                    if old is None or old[0] != info[0]:
+                        events.append(classify(self.root, path, ADDED, info[0]))
+                    elif not info[0] and old != info:
+                        events.append(classify(self.root, path, MODIFIED, False))
+            elif dir_path != self.root and os.path.dirname(dir_path) == self.root:
+                # data.json is written in place, which leaves the profile folder's mtime alone
+                data_path = os.path.join(dir_path, "data.json")
+                old = old_entries.get("data.json")
+                try:
+                    st = os.stat(data_path)
+                    info = (False, st.st_size, st.st_mtime_ns)
+                except OSError:
+                    info = None
+                if old is not None and info is not None and old != info:
+                    entries["data.json"] = info
+                    events.append(classify(self.root, data_path, MODIFIED, False))
+            stack.extend(os.path.join(dir_path, name) for name, info in entries.items() if info[0])
+        for dir_path in [d for d in self._dirs if d not in seen]:
+            del self._dirs[dir_path]  # removed along with a parent, already reported
+        return events
+
+    def _removed(self, path, is_dir, events):
+        events.append(classify(self.root, path, REMOVED, is_dir))
+        if is_dir:
+            self._dirs.pop(path, None)
+
+    def _run(self):
+        self.snapshot()
+        polls = 0
+        while not self._stop.wait(self.interval):
+            polls += 1
+            self._emit(self.poll(full=polls % FULL_SCAN_EVERY == 0))
+
+
+class InotifyWatcher(_BaseWatcher):
+    """
+    Linux watcher on inotify (through ctypes, no extra dependency). Every
+    directory of the tree gets a watch; folders that appear later are
+    watched as they are created, and whatever they already contain is
+    reported as added. A queue overflow is reported as a RESCAN event.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+    HEADER = struct.Struct("iIII")
+
+    def __init__(self, root, callback):
+        super().__init__(root, callback)
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._ctypes = ctypes
+        self._paths = {}  # watch descriptor -> dir path
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        try:
+            self.watch_tree(self.root)
+        except OSError:
+            for fd in (self._fd, self._wakeup_r, self._wakeup_w):
+                os.close(fd)
+            raise
+
+    def _add_watch(self, dir_path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), self.WATCH_MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached (fs.inotify.max_user_watches)")
+            return  # e.g. removed again before it could be watched
+        self._paths[wd] = dir_path
+
+    def watch_tree(self, dir_path, events=None):
+        """Watch dir_path and every folder below it; list their contents into events."""
+        stack = [dir_path]
+        while stack:
+            current = stack.pop()
+            self._add_watch(current)
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.name.startswith("."):
+                            continue
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if events is not None:
+                            events.append(classify(self.root, entry.path, ADDED, is_dir))
+                        if is_dir:
+                            stack.append(entry.path)
+            except OSError:
+                continue
+
+    def _forget_tree(self, dir_path):
+        prefix = dir_path + os.sep
+        for wd, path in list(self._paths.items()):
+            if path == dir_path or path.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._paths[wd]
+
+    def _read_events(self, events):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.HEADER.unpack_from(data, offset)
+            offset += self.HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                events.append(WatchEvent(RESCAN, "storage"))
+                continue
+            if mask & self.IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            dir_path = self._paths.get(wd)
+            if dir_path is None or not name:
+                continue
+            path = os.path.join(dir_path, name)
+            is_dir = bool(mask & self.IN_ISDIR)
+            if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                events.append(classify(self.root, path, ADDED, is_dir))
+                if is_dir and not name.startswith("."):
+                    self.watch_tree(path, events)
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                events.append(classify(self.root, path, REMOVED, is_dir))
+                if is_dir:
+                    self._forget_tree(path)
+            elif mask & self.IN_CLOSE_WRITE:
+                events.append(classify(self.root, path, MODIFIED, False))
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd, self._wakeup_r], [], [])
+                if self._wakeup_r in ready:
+                    break
+                events = []
+                self._read_events(events)
+                # Let a burst (e.g. a bulk upload) settle into one batch
+                deadline = time.monotonic() + MAX_BATCH_SECONDS
+                while time.monotonic() < deadline:
+                    ready, _, _ = select.select([self._fd], [], [], COALESCE_SECONDS)
+                    if not ready:
+                        break
+                    self._read_events(events)
+                self._emit(events)
+        finally:
+            os.close(self._fd)
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
+
+    def stop(self):
+        super().stop()
+        try:
+            os.write(self._wakeup_w, b"x")
+        except OSError:
+            pass
+
+
+def start_watcher(root, callback, backend="auto", interval=DEFAULT_POLL_INTERVAL):
+    """
+    Watch the storage directory root and call callback(events) from a
+    background thread with batches of WatchEvents. backend is "inotify",
+    "poll" or "auto" (inotify on Linux, polling elsewhere or when inotify
+    cannot be set up). Returns the running watcher; call stop() to end it.
+    """
+    if backend in ("auto", "inotify") and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, callback).start()
+        except (OSError, AttributeError):
+            if backend == "inotify":
+                raise
+    return PollingWatcher(root, callback, interval).start()
@@ -0,0 +1,204 @@
+import os
+import json
+import zlib
+import hashlib
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_SIZE = 1024 * 1024
+COMPRESS_LEVEL = 6
+# Below this many deflatable bytes a process pool costs more than it saves
+PARALLEL_THRESHOLD = 8 * 1024 * 1024
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MANIFEST_NAME = ".codex-manifest.json"
+MANIFEST_VERSION = 1
+
+# Formats that are already compressed; deflating them again only burns CPU
+STORED_EXTENSIONS = {
+    "jpg", "jpeg", "png", "gif", "webp", "heic", "avif",
+    "mp4", "m4v", "mov", "avi", "wmv", "webm", "mkv",
+    "mp3", "m4a", "aac", "ogg", "opus", "flac",
+    "zip", "gz", "bz2", "xz", "7z", "rar", "zst",
+    "docx", "xlsx", "pptx", "odt", "pdf",
+}
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled through its cancel event."""
+
+
+def is_stored_format(filename):
+    return os.path.splitext(filename)[1][1:].lower() in STORED_EXTENSIONS
+
+
+def deflate_chunk(data, final, level=COMPRESS_LEVEL):
+    """
+    Raw-deflate one chunk. Non-final chunks end on a byte-aligned sync flush,
+    so independently compressed chunks concatenate into one valid stream.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    out = compressor.compress(data)
+    return out + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class ZipExporter:
+    """
+    Streams files into a zip archive. Already-compressed formats are written
+    with ZIP_STORED; everything else is deflated in CHUNK_SIZE pieces, on a
+    process pool when there is enough data to be worth it. At most a few
+    chunks per worker are in flight, so memory stays bounded regardless of
+    file size.
+
+    progress(done_bytes, total_bytes, done_files, total_files) is called from
+    the exporting thread; setting cancel_event aborts with ExportCancelled.
+    A manifest with the size, mtime and SHA-256 of every member is appended
+    as MANIFEST_NAME so imports can verify the archive; manifest_extra adds
+    further top-level keys to it.
+    """
+
+    def __init__(self, zip_path, progress=None, cancel_event=None, workers=DEFAULT_WORKERS,
+                 level=COMPRESS_LEVEL, manifest_extra=None):
+        self.zip_path = zip_path
+        self.manifest_extra = manifest_extra or {}
+        self.progress = progress
+        self.cancel_event = cancel_event or threading.Event()
+        self.workers = max(1, workers)
+        self.level = level
+        self.total_bytes = 0
+        self.total_files = 0
+        self.done_bytes = 0
+        self.done_files = 0
+        self.manifest = []
+
+    def _check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise ExportCancelled("Export cancelled.")
+
+    def _report(self):
+        if self.progress:
+            self.progress(self.done_bytes, self.total_bytes, self.done_files, self.total_files)
+
+    def write_all(self, members, extra=None):
+        """
+        Write members, a list of (absolute path, arcname) pairs, to zip_path.
+        extra is an optional list of (arcname, bytes) written after them.
+        The archive is built under a temporary name and renamed into place
+        once complete; a cancelled or failed export leaves nothing behind.
+        """
+        sizes = [os.path.getsize(path) for path, _ in members]
+        self.total_bytes = sum(sizes)
+        self.total_files = len(members)
+        deflatable = sum(size for size, (path, _) in zip(sizes, members) if not is_stored_format(path))
+        tmp_path = self.zip_path + ".part"
+        executor = None
+        try:
+            if self.workers > 1 and deflatable >= PARALLEL_THRESHOLD:
+                executor = ProcessPoolExecutor(max_workers=self.workers)
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zipf:
+                self._report()
+                for (path, arcname), size in zip(members, sizes):
+                    self._check_cancelled()
+                    if is_stored_format(path):
+                        digest = self._write_stored(zipf, path, arcname, size)
+                    else:
+                        digest = self._write_deflated(zipf, path, arcname, size, executor)
+                    self.manifest.append({
+                        "path": arcname.replace(os.sep, "/"),
+                        "size": size,
+                        "mtime": os.path.getmtime(path),
+                        "sha256": digest
+                    })
+                    self.done_files += 1
+                    self._report()
+                for arcname, data in extra or ():
+                    zipf.writestr(arcname, data)
+                zipf.writestr(MANIFEST_NAME, json.dumps(self.manifest_data(), indent=1))
+            os.replace(tmp_path, self.zip_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+        return self.zip_path
+
+    def manifest_data(self):
+        return {"version": MANIFEST_VERSION, **self.manifest_extra, "files": self.manifest}
+
+    def _write_stored(self, zipf, path, arcname, size):
+        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.file_size = size
+        digest = hashlib.sha256()
+        with open(path, "rb") as src, zipf.open(zinfo, "w", force_zip64=size > zipfile.ZIP64_LIMIT) as dest:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                self._check_cancelled()
+                dest.write(chunk)
+                digest.update(chunk)
+                self.done_bytes += len(chunk)
+                self._report()
+        return digest.hexdigest()
+
+    def _write_deflated(self, zipf, path, arcname, size, executor):
+        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.file_size = size
+        zinfo.CRC = 0
+        zinfo.compress_size = 0
+        zip64 = size * 1.05 > zipfile.ZIP64_LIMIT
+        fp = zipf.fp
+        zinfo.header_offset = fp.tell()
+        fp.write(zinfo.FileHeader(zip64))
+
+        crc = 0
+        digest = hashlib.sha256()
+        compress_size = 0
+        in_flight = deque()
+        max_in_flight = self.workers * 2
+
+        def drain(count):
+            nonlocal compress_size
+            while len(in_flight) > count:
+                job, length = in_flight.popleft()
+                data = job.result() if executor is not None else job
+                fp.write(data)
+                compress_size += len(data)
+                self.done_bytes += length
+                self._report()
+
+        with open(path, "rb") as src:
+            offset = 0
+            while True:
+                self._check_cancelled()
+                chunk = src.read(CHUNK_SIZE)
+                offset += len(chunk)
+                final = offset >= size or len(chunk) < CHUNK_SIZE
+                crc = zlib.crc32(chunk, crc)
+                digest.update(chunk)
+                if executor is not None:
+                    in_flight.append((executor.submit(deflate_chunk, chunk, final, self.level), len(chunk)))
+                else:
+                    in_flight.append((deflate_chunk(chunk, final, self.level), len(chunk)))
+                drain(max_in_flight)
+                if final:
+                    break
+        drain(0)
+
+        if offset != size:
+            raise OSError(f"File '{path}' changed size while being exported.")
+        zinfo.CRC = crc
+        zinfo.compress_size = compress_size
+        # Rewrite the local header now that CRC and sizes are known, the same
+        # way zipfile finalizes entries written through ZipFile.open()
+        zipf.start_dir = fp.tell()
+        fp.seek(zinfo.header_offset)
+        fp.write(zinfo.FileHeader(zip64))
+        fp.seek(zipf.start_dir)
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+        return digest.hexdigest()
@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.zip_export import MANIFEST_NAME, CHUNK_SIZE
+
+STAGING_PREFIX = ".import-"
+JOURNAL_NAME = ".import-journal"
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class ImportCancelled(Exception):
+    """Raised when an import is cancelled through its cancel event."""
+
+
+class UnsafeArchiveError(ValueError):
+    """Raised when an archive member would be extracted outside its target folder."""
+
+
+def safe_member_path(target_dir, member_name):
+    """
+    Map an archive member name to a path inside target_dir, rejecting
+    absolute paths, drive letters and ".." components (zip-slip).
+    """
+    name = member_name.replace("\\", "/")
+    if name.startswith("/") or re.match(r"^[A-Za-z]:", name):
+        raise UnsafeArchiveError(f"Archive member '{member_name}' has an absolute path.")
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if not parts or ".." in parts:
+        raise UnsafeArchiveError(f"Archive member '{member_name}' escapes the profile folder.")
+    path = os.path.join(target_dir, *parts)
+    root = os.path.realpath(target_dir)
+    if not os.path.realpath(path).startswith(root + os.sep):
+        raise UnsafeArchiveError(f"Archive member '{member_name}' escapes the profile folder.")
+    return path
+
+
+def read_manifest_data(zipf):
+    """Return the whole manifest of an exported archive, or None for older archives."""
+    try:
+        return json.loads(zipf.read(MANIFEST_NAME).decode("utf-8"))
+    except KeyError:
+        return None
+
+
+def read_manifest(zipf):
+    """Return {member path: manifest entry} from an exported archive, or {} for older archives."""
+    data = read_manifest_data(zipf) or {}
+    return {entry["path"]: entry for entry in data.get("files", [])}
+
+
+class ZipImporter:
+    """
+    Extracts an archive into a staging directory. Members are streamed in
+    CHUNK_SIZE pieces by a thread pool (each thread with its own ZipFile
+    handle), checked against their zip CRC and, when the archive carries a
+    manifest, against its size and SHA-256. Every finished member is written
+    under a temporary name, renamed, and appended to a journal, so a later run
+    on the same staging directory resumes where an interrupted one stopped.
+    """
+
+    def __init__(self, zip_path, staging_dir, progress=None, cancel_event=None, workers=DEFAULT_WORKERS):
+        self.zip_path = zip_path
+        self.staging_dir = staging_dir
+        self.progress = progress
+        self.cancel_event = cancel_event or threading.Event()
+        self.workers = max(1, workers)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._handles = []
+        self.total_bytes = 0
+        self.total_files = 0
+        self.done_bytes = 0
+        self.done_files = 0
+
+    def _archive_identity(self):
+        st = os.stat(self.zip_path)
+        return {"archive": os.path.abspath(self.zip_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _journal_path(self):
+        return os.path.join(self.staging_dir, JOURNAL_NAME)
+
+    def _load_journal(self, identity):
+        """Return names already extracted by an earlier run, resetting stale staging."""
+        try:
+            with open(self._journal_path(), "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if header == identity:
+                    return {line.rstrip("\n") for line in f if line.endswith("\n")}
+        except (OSError, ValueError):
+            pass
+        if os.path.isdir(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+        os.makedirs(self.staging_dir)
+        with open(self._journal_path(), "w", encoding="utf-8") as f:
+            f.write(json.dumps(identity) + "\n")
+        return set()
+
+    def _zip_handle(self):
+        zipf = getattr(self._local, "zipf", None)
+        if zipf is None:
+            zipf = self._local.zipf = zipfile.ZipFile(self.zip_path, "r")
+            with self._lock:
+                self._handles.append(zipf)
+        return zipf
+
+    def _report(self):
+        if self.progress:
+            self.progress(self.done_bytes, self.total_bytes, self.done_files, self.total_files)
+
+    def _check_cancelled(self):
+        if self.cancel_event.is_set() or self._stop.is_set():
+            raise ImportCancelled("Import cancelled.")
+
+    def _extract(self, info, target, expected, journal):
+        self._check_cancelled()
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = target + ".partial"
+        digest = hashlib.sha256()
+        written = 0
+        with self._zip_handle().open(info, "r") as src, open(tmp_path, "wb") as dest:
+            # ZipExtFile raises BadZipFile on a CRC mismatch at end of stream
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                self._check_cancelled()
+                dest.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+                with self._lock:
+                    self.done_bytes += len(chunk)
+                    self._report()
+        if expected is not None:
+            if written != expected["size"] or digest.hexdigest() != expected["sha256"]:
+                os.remove(tmp_path)
+                raise zipfile.BadZipFile(f"Checksum mismatch for '{info.filename}'.")
+        os.replace(tmp_path, target)
+        if expected is not None and expected.get("mtime"):
+            os.utime(target, (expected["mtime"], expected["mtime"]))
+        with self._lock:
+            journal.write(info.filename + "\n")
+            journal.flush()
+            self.done_files += 1
+            self._report()
+
+    def run(self):
+        """Extract (or finish extracting) the archive into staging_dir."""
+        identity = self._archive_identity()
+        with zipfile.ZipFile(self.zip_path, "r") as zipf:
+            manifest = read_manifest(zipf)
+            members = []
+            for info in zipf.infolist():
+                if info.filename == MANIFEST_NAME:
+                    continue
+                members.append((info, safe_member_path(self.staging_dir, info.filename)))
+
+        completed = self._load_journal(identity)
+        todo = []
+        for info, target in members:
+            if info.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+            self.total_files += 1
+            self.total_bytes += info.file_size
+            if info.filename in completed and os.path.isfile(target) and os.path.getsize(target) == info.file_size:
+                self.done_files += 1
+                self.done_bytes += info.file_size
+            else:
+                todo.append((info, target))
+        self._report()
+
+        try:
+            with open(self._journal_path(), "a", encoding="utf-8") as journal:
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    futures = [
+                        executor.submit(self._extract, info, target, manifest.get(info.filename), journal)
+                        for info, target in todo
+                    ]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except BaseException:
+                        self._stop.set()  # stop the other workers early
+                        for future in futures:
+                            future.cancel()
+                        raise
+        finally:
+            for zipf in self._handles:
+                zipf.close()
+        os.remove(self._journal_path())
+        return self.staging_dir
+
+
+def staging_path(storage_directory, folder_name):
+    return os.path.join(storage_directory, STAGING_PREFIX + folder_name)